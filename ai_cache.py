@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI生成结果缓存
+以 (模型, 提示词模板版本, 生成参数, 输入) 的哈希为键，把生成结果持久化到SQLite
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from config import config
+from media_utils import get_cache_dir
+
+# 每写入多少条结果检查一次淘汰
+EVICT_CHECK_INTERVAL = 100
+
+
+class GenerationCache:
+    """AI生成结果缓存
+
+    - 相同模型、模板版本、参数和输入的请求直接返回上次的结果，不再调用Ollama
+    - 超过保留天数的条目过期；条目数超过上限时淘汰最久未使用的条目
+    - 命中/未命中次数按进程统计，用于显示缓存命中率
+
+    可在多个线程中共用（内部加锁）。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 5000, max_age_days: float = 30):
+        self.db_path = db_path or os.path.join(get_cache_dir('ai'), 'generations.db')
+        self.max_entries = max(1, int(max_entries))
+        self.max_age = float(max_age_days) * 86400
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS generations (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_accessed ON generations (accessed_at)")
+        self.conn.commit()
+        self.evict()
+
+    @classmethod
+    def from_config(cls) -> Optional['GenerationCache']:
+        """按配置创建缓存，未启用或无法创建时返回None"""
+        cache_config = config.get_ai_cache_config()
+        if not cache_config.get('enabled', True):
+            return None
+        try:
+            return cls(db_path=cache_config.get('path') or None,
+                       max_entries=cache_config.get('max_entries', 5000),
+                       max_age_days=cache_config.get('max_age_days', 30))
+        except Exception as e:
+            print(f"⚠️ AI结果缓存不可用: {e}")
+            return None
+
+    @staticmethod
+    def make_key(model: str, template_version, options: Dict, prompt: str) -> str:
+        """计算缓存键"""
+        raw = json.dumps([model, template_version, options, prompt], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存结果，未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result, created_at FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE generations SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, result: str, model: str = ''):
+        """写入（或覆盖）缓存结果"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO generations (key, model, result, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, model, result, now, now))
+            self.conn.commit()
+            self._puts += 1
+            check = self._puts % EVICT_CHECK_INTERVAL == 0
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """删除过期条目，并把条目数限制在上限内，返回删除的条目数"""
+        with self._lock:
+            cursor = self.conn.execute("DELETE FROM generations WHERE created_at < ?",
+                                       (time.time() - self.max_age,))
+            removed = cursor.rowcount
+            cursor = self.conn.execute('''
+                DELETE FROM generations WHERE key IN (
+                    SELECT key FROM generations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            removed += cursor.rowcount
+            self.conn.commit()
+        return removed
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.conn.execute("DELETE FROM generations")
+            self.conn.commit()
+
+    def stats(self) -> Dict:
+        """缓存统计：命中、未命中、命中率和条目数"""
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': entries
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self.conn.close()
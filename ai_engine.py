@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发AI生成引擎
+以有界并发调用Ollama，生成结果由调用线程分批提交到数据库
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+from typing import Callable, Dict, List, Optional
+
+from ai_metrics import percentile
+from ai_resilience import OllamaUnavailableError
+from ai_singleflight import RequestCancelledError
+from config import config
+from video_store import VideoStore, AI_STATUS_PENDING
+
+# Ollama未配置并发数时的默认值
+DEFAULT_NUM_PARALLEL = 2
+
+
+def get_num_parallel() -> int:
+    """并发数：优先使用配置 ai.num_parallel，其次环境变量 OLLAMA_NUM_PARALLEL"""
+    configured = config.get('ai.num_parallel', 0)
+    if configured and int(configured) > 0:
+        return int(configured)
+    try:
+        return max(1, int(os.environ.get('OLLAMA_NUM_PARALLEL', DEFAULT_NUM_PARALLEL)))
+    except ValueError:
+        return DEFAULT_NUM_PARALLEL
+
+
+class AIMDConcurrencyController:
+    """AIMD（加性增、乘性减）并发控制
+
+    - 基准延迟为最近 baseline_window 个请求延迟的低分位数（p10），至少有 min_samples 个样本后才开始调整
+    - 请求延迟接近基准延迟时，每完成一轮（约 limit 个请求）并发数加1
+    - 延迟超过基准延迟的 latency_tolerance 倍（请求开始在服务端排队）或请求出错时，
+      并发数乘以 decrease_factor，每 decrease_interval 秒内最多减一次
+    - 没有实际发送请求的任务（缓存命中、共享其他请求的结果）只归还名额，不参与调整
+    - 记录最近 window 秒内完成的请求数，用于计算吞吐量
+
+    可在多个线程中共用。
+    """
+
+    def __init__(self, initial: int = DEFAULT_NUM_PARALLEL, minimum: int = 1, maximum: int = 8,
+                 latency_tolerance: float = 2.0, decrease_factor: float = 0.7, window: float = 60.0,
+                 baseline_window: int = 50, min_samples: int = 5, decrease_interval: float = 5.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.window = window
+        self.min_samples = max(1, min_samples)
+        self.decrease_interval = decrease_interval
+
+        self.in_flight = 0
+        self.base_latency = None
+        self.last_latency = None
+        self._last_decrease = None
+        self._samples = deque(maxlen=max(self.min_samples, baseline_window))
+        self._completions = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, initial: Optional[int] = None, cap: Optional[int] = None) -> 'AIMDConcurrencyController':
+        """按配置创建，未启用自适应时并发数固定为初始值
+
+        cap 为硬上限（客户端调度器的名额数），初始值和自适应上限都不超过它，
+        否则超出名额的任务只会在调度器中排队，控制器看到的延迟也失去意义。
+        """
+        initial = initial or get_num_parallel()
+        maximum = int(config.get('ai.max_parallel', 8))
+        if cap:
+            initial = min(initial, cap)
+            maximum = min(maximum, cap)
+        if not config.get('ai.adaptive_concurrency', True):
+            return cls(initial, minimum=initial, maximum=initial)
+        return cls(initial, maximum=max(initial, maximum))
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def try_acquire(self) -> bool:
+        """占用一个并发名额，已达上限时返回False"""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: Optional[float], error: bool = False, cancelled: bool = False):
+        """归还名额，并根据本次请求的延迟和结果调整并发数
+
+        请求被取消、或成功但没有延迟样本（latency 为None，如缓存命中）时只归还名额。
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight -= 1
+            if cancelled:
+                return
+            if error:
+                self._decrease(now)
+                return
+            self._completions.append(now)
+            if latency is None:
+                return
+
+            self.last_latency = latency
+            self._samples.append(latency)
+            if len(self._samples) < self.min_samples:
+                return
+            # 基准取最近样本的低分位数，个别特别快的请求不会拉低基准，负载的长期变化随窗口更新
+            self.base_latency = percentile(sorted(self._samples), 0.1)
+
+            if latency > self.base_latency * self.latency_tolerance:
+                self._decrease(now)
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def _decrease(self, now: float):
+        if self._last_decrease is not None and now - self._last_decrease < self.decrease_interval:
+            return
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        self._last_decrease = now
+
+    def throughput(self) -> float:
+        """最近 window 秒内的吞吐量（个/分钟）"""
+        now = time.monotonic()
+        with self._lock:
+            while self._completions and now - self._completions[0] > self.window:
+                self._completions.popleft()
+            count = len(self._completions)
+        return count * 60.0 / self.window
+
+    def snapshot(self) -> Dict:
+        """当前并发数、在途请求数、吞吐量和延迟，用于状态栏显示"""
+        throughput = self.throughput()
+        with self._lock:
+            return {
+                'concurrency': int(self.limit),
+                'in_flight': self.in_flight,
+                'throughput': round(throughput, 1),
+                'latency': round(self.last_latency, 2) if self.last_latency is not None else None
+            }
+
+
+class AIGenerationEngine:
+    """并发AI生成引擎
+
+    - 并发数由AIMD控制器根据请求延迟和错误率自适应调整（初始值与 OLLAMA_NUM_PARALLEL 一致）
+    - 在途任务数受控制器限制（背压），不会一次性把整个批次提交给线程池
+    - 数据库写入集中在调用线程，按条数或时间间隔批量提交
+    - 已删除的视频不再发送请求，进行中的请求结果直接丢弃
+    """
+
+    def __init__(self, generate: Callable[[Dict], tuple], num_workers: Optional[int] = None,
+                 controller: Optional[AIMDConcurrencyController] = None, commit_batch_size: int = 20,
+                 commit_interval: float = 2.0, cancellation=None, metrics=None,
+                 prepare: Optional[Callable[[Dict], Future]] = None, prepare_timeout: Optional[float] = None):
+        """
+        Args:
+            generate: 生成函数，接收视频信息字典，返回 (名称, 描述)，在工作线程中调用
+            num_workers: 初始并发数，为None时按配置/环境变量确定
+            controller: 并发控制器，为None时按配置创建
+            commit_batch_size: 累计多少条结果提交一次
+            commit_interval: 距上次提交超过多少秒时提交
+            cancellation: 提供 is_cancelled(video_id) 的对象（如 SingleFlight），记录已删除的视频
+            metrics: 提供 thread_usage() 的对象（如 AIMetrics）；提供时并发控制只使用生成过程中实际发送的
+                请求的平均延迟，缓存命中、共享其他请求结果的任务不参与调整；为None时使用整个生成函数的耗时
+            prepare: 生成前的准备（如视频内容提取），接收视频信息字典，返回 Future；
+                在占用并发名额之前等待其完成，等待期间不占用名额，generate 中可直接读取准备好的结果
+            prepare_timeout: 等待 prepare 的最长秒数，超时后不再等待（为None时一直等待）
+        """
+        self.generate = generate
+        self.cancellation = cancellation
+        self.metrics = metrics
+        self.prepare = prepare
+        self.prepare_timeout = prepare_timeout
+        self.controller = controller or AIMDConcurrencyController.from_config(num_workers)
+        self.commit_batch_size = commit_batch_size
+        self.commit_interval = commit_interval
+
+    def run(self, store: VideoStore, video_ids: List[int],
+            on_item_start: Optional[Callable[[int], None]] = None,
+            progress_callback: Optional[Callable] = None,
+            should_stop: Optional[Callable[[], bool]] = None,
+            stats_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        为一批视频生成内容并写入数据库
+
+        Args:
+            store: 视频数据库（只在调用线程中使用）
+            video_ids: 视频ID列表
+            on_item_start: 任务提交时的回调，接收参数：(video_id)
+            progress_callback: 进度回调函数，接收参数：
+                (current, total, success_count, failed_count, video_id, result)
+            should_stop: 返回True时停止提交新任务（已提交的任务仍会完成）
+            stats_callback: 每个结果处理前调用，接收并发控制器的 snapshot()
+
+        Returns:
+            Dict: 生成结果统计
+        """
+        total = len(video_ids)
+        stats = {"success": 0, "failed": 0, "cancelled": 0, "done": 0, "received": 0, "unavailable": False}
+        results = queue.Queue()
+        controller = self.controller
+        uncommitted = 0
+        last_commit = time.monotonic()
+
+        def is_cancelled(video_id):
+            return self.cancellation is not None and self.cancellation.is_cancelled(video_id)
+
+        def worker(video):
+            start = time.monotonic()
+            usage = self.metrics.thread_usage() if self.metrics is not None else None
+            try:
+                # 在线程池中排队期间视频可能已被删除
+                if is_cancelled(video['id']):
+                    raise RequestCancelledError(f"视频已删除，取消AI请求: {video['id']}")
+                result = self.generate(video)
+                if usage is None:
+                    latency = time.monotonic() - start
+                else:
+                    requests, seconds = self.metrics.thread_usage()
+                    requests -= usage[0]
+                    latency = (seconds - usage[1]) / requests if requests else None
+                results.put((video['id'], result, None, latency))
+            except Exception as e:
+                results.put((video['id'], None, e, None))
+
+        def handle_result(video_id, result, error):
+            nonlocal uncommitted, last_commit
+            if error is None and is_cancelled(video_id):
+                error = RequestCancelledError(f"视频已删除，丢弃生成结果: {video_id}")
+            if isinstance(error, RequestCancelledError):
+                # 已删除的视频不计为失败，也不放回AI队列
+                stats["cancelled"] += 1
+                error = None
+                result = None
+            elif error is None:
+                try:
+                    # generate 可额外返回生成使用的模型
+                    model = result[2] if len(result) > 2 else None
+                    store.update_ai_result(video_id, result[0], result[1], model=model, commit=False)
+                    uncommitted += 1
+                    stats["success"] += 1
+                except Exception as e:
+                    error = e
+            if error is not None:
+                print(f"处理视频 {video_id} 时出错: {error}")
+                stats["failed"] += 1
+                result = None
+                # 失败的视频保留在AI队列中，稍后重试，不写入占位内容
+                store.set_ai_status([video_id], AI_STATUS_PENDING, commit=False)
+                if isinstance(error, OllamaUnavailableError):
+                    stats["unavailable"] = True
+            stats["done"] += 1
+
+            if uncommitted and (uncommitted >= self.commit_batch_size or
+                                time.monotonic() - last_commit >= self.commit_interval):
+                store.conn.commit()
+                uncommitted = 0
+                last_commit = time.monotonic()
+
+            if progress_callback:
+                progress_callback(stats["done"], total, stats["success"], stats["failed"], video_id, result)
+
+        def drain(block: bool):
+            while True:
+                try:
+                    item = results.get(timeout=0.2) if block else results.get_nowait()
+                except queue.Empty:
+                    return
+                stats["received"] += 1
+                video_id, result, error, latency = item
+                cancelled = isinstance(error, RequestCancelledError)
+                controller.release(latency, error=error is not None and not cancelled, cancelled=cancelled)
+                if stats_callback:
+                    stats_callback(controller.snapshot())
+                handle_result(video_id, result, error)
+                block = False
+
+        def wait_prepared(future):
+            # 等待期间继续处理已完成的结果，没有在途任务时直接等待
+            deadline = None if self.prepare_timeout is None else time.monotonic() + self.prepare_timeout
+            while not future.done():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return
+                if stats["received"] < submitted:
+                    drain(block=True)
+                else:
+                    futures_wait([future], timeout=remaining)
+
+        submitted = 0
+        skipped = []
+        try:
+            with ThreadPoolExecutor(max_workers=controller.maximum, thread_name_prefix='ai') as executor:
+                for index, video_id in enumerate(video_ids):
+                    if should_stop and should_stop():
+                        break
+                    if stats["unavailable"]:
+                        # Ollama持续不可用（熔断等待超时），剩余视频直接留在AI队列中
+                        skipped = video_ids[index:]
+                        break
+
+                    video = None if is_cancelled(video_id) else store.get_video(video_id)
+                    if video is None:
+                        handle_result(video_id, None, RequestCancelledError(f"视频已删除: {video_id}"))
+                        continue
+
+                    if self.prepare is not None:
+                        wait_prepared(self.prepare(video))
+
+                    # 背压：在途任务达到当前并发上限时等待已完成的结果
+                    while not controller.try_acquire():
+                        drain(block=True)
+
+                    if on_item_start:
+                        on_item_start(video_id)
+                    executor.submit(worker, video)
+                    submitted += 1
+                    drain(block=False)
+
+                # 等待所有已提交任务的结果
+                while stats["received"] < submitted:
+                    drain(block=True)
+        finally:
+            drain(block=False)
+            if skipped:
+                store.set_ai_status(skipped, AI_STATUS_PENDING, commit=False)
+            store.conn.commit()
+
+        summary = {"success": stats["success"], "failed": stats["failed"], "total": total}
+        if stats["cancelled"]:
+            summary["cancelled"] = stats["cancelled"]
+        if stats["unavailable"]:
+            summary["error"] = f"Ollama服务不可用，{stats['failed'] + len(skipped)} 个视频已保留在AI队列中"
+            summary["skipped"] = len(skipped)
+        return summary
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI请求指标
+记录每次生成请求的延迟和Ollama返回的token统计，计算滚动分位数和生成速度，可导出供监控采集
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+
+# Ollama报告的加载时间超过该秒数时，视为本次请求重新加载了模型
+MODEL_LOAD_THRESHOLD = 0.5
+
+# Prometheus指标名前缀
+METRIC_PREFIX = 'douyin_ai'
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """已排序数据的分位数（最近秩法），没有数据时返回None"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _seconds(nanoseconds) -> Optional[float]:
+    return nanoseconds / 1e9 if nanoseconds else None
+
+
+class AIMetrics:
+    """AI请求指标
+
+    - 每次请求记录一条：模型、优先级、排队与请求耗时，以及Ollama返回的 eval_count、eval_duration、
+      prompt_eval_count、prompt_eval_duration、load_duration
+    - 分位数和生成速度按最近 window 条记录计算；请求数、token数、模型加载次数等累计值从启动开始计数
+
+    可在多个线程中共用。
+    """
+
+    def __init__(self, window: int = 500, export_path: str = ''):
+        """
+        Args:
+            window: 计算分位数和速度使用的最近记录数
+            export_path: 导出文件路径，.prom 后缀导出Prometheus文本格式，其他导出JSON，为空时不导出
+        """
+        self.export_path = export_path
+        self._records = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+        # 当前线程累计的请求数和请求秒数，见 thread_usage()
+        self._local = threading.local()
+        self._started = time.time()
+        self._totals = {'requests': 0, 'errors': 0, 'incomplete': 0, 'eval_tokens': 0, 'prompt_tokens': 0,
+                        'model_loads': 0, 'eval_seconds': 0.0, 'request_seconds': 0.0}
+
+    @classmethod
+    def from_config(cls) -> 'AIMetrics':
+        metrics_config = config.get_ai_metrics_config()
+        return cls(window=metrics_config['window'], export_path=metrics_config['export_path'])
+
+    def record(self, model: str, latency: float, response: Optional[Dict] = None,
+               priority: str = 'interactive', queue_wait: float = 0.0, stream: bool = False):
+        """记录一次成功的请求（模型输出完毕）
+
+        Args:
+            model: 模型名称
+            latency: 请求耗时（秒，不含排队）
+            response: Ollama最后一条响应（含 eval_count 等统计）
+            priority: 请求优先级名称（interactive/batch）
+            queue_wait: 在客户端排队等待名额的秒数
+            stream: 是否为流式请求
+        """
+        response = response or {}
+        item = {
+            'time': time.time(),
+            'model': model,
+            'priority': priority,
+            'stream': stream,
+            'latency': latency,
+            'queue_wait': queue_wait,
+            'eval_count': response.get('eval_count'),
+            'eval_duration': _seconds(response.get('eval_duration')),
+            'prompt_eval_count': response.get('prompt_eval_count'),
+            'prompt_eval_duration': _seconds(response.get('prompt_eval_duration')),
+            'load_duration': _seconds(response.get('load_duration')),
+        }
+        self._local.requests = getattr(self._local, 'requests', 0) + 1
+        self._local.seconds = getattr(self._local, 'seconds', 0.0) + latency
+        with self._lock:
+            self._records.append(item)
+            self._totals['requests'] += 1
+            self._totals['request_seconds'] += latency
+            self._totals['eval_tokens'] += item['eval_count'] or 0
+            self._totals['prompt_tokens'] += item['prompt_eval_count'] or 0
+            self._totals['eval_seconds'] += item['eval_duration'] or 0.0
+            if (item['load_duration'] or 0.0) >= MODEL_LOAD_THRESHOLD:
+                self._totals['model_loads'] += 1
+
+    def thread_usage(self) -> Tuple[int, float]:
+        """当前线程累计发送的请求数和请求秒数（不含排队），前后两次调用之差即一段代码中实际发送的请求"""
+        return getattr(self._local, 'requests', 0), getattr(self._local, 'seconds', 0.0)
+
+    def recent_latency(self, model: str, priority: Optional[str] = None, count: int = 20, since: float = 0.0,
+                       minimum: int = 1) -> Optional[float]:
+        """某个模型最近 count 次请求（可按优先级筛选，只取 since 之后的记录）的p95延迟，样本不足时返回None"""
+        with self._lock:
+            latencies = []
+            for item in reversed(self._records):
+                if len(latencies) >= count or item['time'] < since:
+                    break
+                if item['model'] == model and (priority is None or item['priority'] == priority):
+                    latencies.append(item['latency'])
+        if len(latencies) < minimum:
+            return None
+        return percentile(sorted(latencies), 0.95)
+
+    def record_error(self, model: str):
+        """记录一次失败的请求（已重试）"""
+        with self._lock:
+            self._totals['errors'] += 1
+
+    def record_incomplete(self, model: str):
+        """记录一次提前结束的流式请求（调用方停止读取），只计数，不计入延迟和速度统计"""
+        with self._lock:
+            self._totals['incomplete'] += 1
+
+    @staticmethod
+    def _aggregate(records: List[Dict]) -> Dict:
+        """一组记录的分位数与速度"""
+        latencies = sorted(item['latency'] for item in records)
+        waits = sorted(item['queue_wait'] for item in records)
+        eval_tokens = sum(item['eval_count'] or 0 for item in records if item['eval_duration'])
+        eval_seconds = sum(item['eval_duration'] or 0.0 for item in records)
+        prompt_tokens = sum(item['prompt_eval_count'] or 0 for item in records if item['prompt_eval_duration'])
+        prompt_seconds = sum(item['prompt_eval_duration'] or 0.0 for item in records)
+        loads = [item['load_duration'] for item in records
+                 if (item['load_duration'] or 0.0) >= MODEL_LOAD_THRESHOLD]
+        counted = [item['eval_count'] for item in records if item['eval_count'] is not None]
+
+        def rounded(value, digits=3):
+            return round(value, digits) if value is not None else None
+
+        return {
+            'requests': len(records),
+            'latency_p50': rounded(percentile(latencies, 0.5)),
+            'latency_p95': rounded(percentile(latencies, 0.95)),
+            'queue_wait_p95': rounded(percentile(waits, 0.95)),
+            'tokens_per_second': rounded(eval_tokens / eval_seconds, 1) if eval_seconds else None,
+            'prompt_tokens_per_second': rounded(prompt_tokens / prompt_seconds, 1) if prompt_seconds else None,
+            'avg_eval_tokens': rounded(sum(counted) / len(counted), 1) if counted else None,
+            'model_loads': len(loads),
+            'avg_load_seconds': rounded(sum(loads) / len(loads)) if loads else None,
+        }
+
+    def summary(self) -> Dict:
+        """最近记录的统计（总体、按优先级、按模型）与累计值"""
+        with self._lock:
+            records = list(self._records)
+            totals = dict(self._totals)
+
+        result = self._aggregate(records)
+        for field, values in (('by_priority', 'priority'), ('by_model', 'model')):
+            groups = {}
+            for item in records:
+                groups.setdefault(item[values], []).append(item)
+            result[field] = {name: self._aggregate(items) for name, items in groups.items()}
+        result['totals'] = totals
+        result['uptime'] = round(time.time() - self._started)
+        return result
+
+    def format_summary(self) -> str:
+        """界面显示用的统计文本"""
+        summary = self.summary()
+        totals = summary['totals']
+        if not totals['requests'] and not totals['errors'] and not totals['incomplete']:
+            return "暂无AI请求记录"
+
+        def seconds(value):
+            return f"{value:.2f} 秒" if value is not None else "-"
+
+        def rate(value):
+            return f"{value:.1f} token/秒" if value is not None else "-"
+
+        lines = [
+            f"累计请求: {totals['requests']}，失败: {totals['errors']}，提前结束: {totals['incomplete']}，"
+            f"模型加载: {totals['model_loads']} 次",
+            f"累计生成token: {totals['eval_tokens']}，提示词token: {totals['prompt_tokens']}",
+            "",
+            f"最近 {summary['requests']} 次请求:",
+            f"  延迟 p50 {seconds(summary['latency_p50'])}，p95 {seconds(summary['latency_p95'])}，"
+            f"排队 p95 {seconds(summary['queue_wait_p95'])}",
+            f"  生成速度 {rate(summary['tokens_per_second'])}，提示词处理 {rate(summary['prompt_tokens_per_second'])}",
+            f"  平均输出 {summary['avg_eval_tokens'] or '-'} token，模型加载 {summary['model_loads']} 次"
+            f"（平均 {seconds(summary['avg_load_seconds'])}）",
+        ]
+        for title, field in (("按优先级", 'by_priority'), ("按模型", 'by_model')):
+            if len(summary[field]) > 1 or field == 'by_model':
+                lines.append("")
+                lines.append(f"{title}:")
+                for name, stats in summary[field].items():
+                    lines.append(f"  {name}: {stats['requests']} 次，p50 {seconds(stats['latency_p50'])}，"
+                                 f"p95 {seconds(stats['latency_p95'])}，{rate(stats['tokens_per_second'])}")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """Prometheus文本格式（可由 node_exporter 的 textfile collector 采集）"""
+        summary = self.summary()
+        totals = summary['totals']
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                             else f"{METRIC_PREFIX}_{name} {value}")
+
+        metric('requests_total', 'counter', 'Generation requests sent to Ollama', [({}, totals['requests'])])
+        metric('errors_total', 'counter', 'Generation requests that failed after retries', [({}, totals['errors'])])
+        metric('incomplete_total', 'counter', 'Streaming requests stopped before the model finished',
+               [({}, totals['incomplete'])])
+        metric('eval_tokens_total', 'counter', 'Tokens generated', [({}, totals['eval_tokens'])])
+        metric('prompt_tokens_total', 'counter', 'Prompt tokens evaluated', [({}, totals['prompt_tokens'])])
+        metric('model_loads_total', 'counter', 'Requests that had to load the model', [({}, totals['model_loads'])])
+
+        latency_samples = []
+        speed_samples = []
+        for model, stats in summary['by_model'].items():
+            for quantile, field in (('0.5', 'latency_p50'), ('0.95', 'latency_p95')):
+                latency_samples.append(({'model': model, 'quantile': quantile}, stats[field]))
+            speed_samples.append(({'model': model}, stats['tokens_per_second']))
+        for priority, stats in summary['by_priority'].items():
+            for quantile, field in (('0.5', 'latency_p50'), ('0.95', 'latency_p95')):
+                latency_samples.append(({'priority': priority, 'quantile': quantile}, stats[field]))
+        metric('request_latency_seconds', 'gauge', 'Recent request latency (excluding client queueing)',
+               latency_samples)
+        metric('tokens_per_second', 'gauge', 'Recent generation speed', speed_samples)
+        metric('queue_wait_seconds', 'gauge', 'Recent p95 wait for a request slot',
+               [({'quantile': '0.95'}, summary['queue_wait_p95'])])
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Optional[str] = None) -> Optional[str]:
+        """导出指标到文件（先写临时文件再替换，采集方不会读到写了一半的文件），返回导出的路径"""
+        path = path or self.export_path
+        if not path:
+            return None
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.summary(), ensure_ascii=False, indent=2)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+        return path
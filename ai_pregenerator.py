@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入库后台AI预生成
+新视频入库后加入AI队列，在用户空闲时以批量优先级预先生成名称和描述，发布前标题已经就绪
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from batch_tasks import run_ai_batch
+from config import config
+from video_store import VideoStore, AI_STATUS_PENDING
+
+# 生成失败的视频首次等待多少秒后重试，之后每次失败翻倍，最长 RETRY_MAX_DELAY 秒
+RETRY_BASE_DELAY = 60.0
+RETRY_MAX_DELAY = 3600.0
+
+
+class AIPregenerator:
+    """后台AI预生成
+
+    - 入库时以 AI_STATUS_PENDING 写入新视频并调用 notify()，后台线程随后处理AI队列
+    - 只在最近 idle_seconds 秒内没有交互请求（编辑窗口）、且没有手动批量任务时开始下一小批
+    - 每小批 batch_size 个视频，生成完成的视频标记为 AI_STATUS_READY，失败的保留在队列中，
+      按失败次数指数退避后再重试，期间先处理队列中的其他视频
+    - 处理队列期间保持模型加载，队列清空后按会话配置释放
+    """
+
+    def __init__(self, db_path: str, session, enricher=None, batch_size: int = 4, idle_seconds: float = 10.0,
+                 poll_interval: float = 60.0,
+                 progress_callback: Optional[Callable] = None,
+                 done_callback: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            db_path: 数据库路径（后台线程使用独立的连接）
+            session: OllamaSession
+            enricher: 视频内容提取器，为None时只根据文件名生成
+            batch_size: 每小批处理的视频数，越小越能及时让出给手动任务
+            idle_seconds: 最近一次交互请求之后至少空闲的秒数
+            poll_interval: 没有通知时检查AI队列的间隔秒数（处理其他途径加入队列的视频）
+            progress_callback: 每个视频完成时的回调，参数同 run_ai_batch 的 progress_callback
+            done_callback: 每小批完成时的回调，接收参数：{done, remaining}
+        """
+        self.db_path = db_path
+        self.session = session
+        self.enricher = enricher
+        self.batch_size = max(1, batch_size)
+        self.idle_seconds = idle_seconds
+        self.poll_interval = poll_interval
+        self.progress_callback = progress_callback
+        self.done_callback = done_callback
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._paused = 0
+        self._thread = None
+        # 生成失败的视频 -> (连续失败次数, 可以重试的时间)，只在后台线程中使用
+        self._failures = {}
+
+    @classmethod
+    def from_config(cls, db_path: str, session, enricher=None, **callbacks) -> Optional['AIPregenerator']:
+        """根据配置创建预生成器，未启用时返回None"""
+        pregenerate_config = config.get_pregenerate_config()
+        if not pregenerate_config['enabled']:
+            return None
+        return cls(db_path, session, enricher, batch_size=pregenerate_config['batch_size'],
+                   idle_seconds=pregenerate_config['idle_seconds'], **callbacks)
+
+    def start(self):
+        """启动后台线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ai-pregenerate', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止后台线程（进行中的一小批会先完成）"""
+        self._stop.set()
+        self._wake.set()
+
+    def notify(self):
+        """有新视频加入AI队列"""
+        self._wake.set()
+
+    def pause(self):
+        """暂停开始新的小批（可嵌套，与 resume 成对调用）"""
+        with self._lock:
+            self._paused += 1
+
+    def resume(self):
+        with self._lock:
+            self._paused = max(0, self._paused - 1)
+        self._wake.set()
+
+    def _idle(self) -> bool:
+        """没有手动批量任务，且最近没有交互请求"""
+        with self._lock:
+            if self._paused:
+                return False
+        scheduler = getattr(self.session.client, 'scheduler', None)
+        return scheduler is None or scheduler.interactive_idle_seconds() >= self.idle_seconds
+
+    def _wait_idle(self) -> bool:
+        """等待空闲，停止时返回False"""
+        while not self._idle():
+            if self._stop.wait(1.0):
+                return False
+        return not self._stop.is_set()
+
+    def _next_ids(self, store: VideoStore, limit: int) -> List[int]:
+        """AI队列中按入库顺序的下一批视频，跳过退避中的失败视频"""
+        now = time.monotonic()
+        waiting = [video_id for video_id, (_, retry_at) in self._failures.items() if retry_at > now]
+        return store.get_ids_by_ai_status(AI_STATUS_PENDING, limit=limit, exclude=waiting)
+
+    def _on_progress(self, current, total, success_count, failed_count, video_id, result):
+        """记录每个视频的结果，失败的视频按连续失败次数退避"""
+        if result is None:
+            failures = self._failures.get(video_id, (0, 0.0))[0] + 1
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (failures - 1))
+            self._failures[video_id] = (failures, time.monotonic() + delay)
+        else:
+            self._failures.pop(video_id, None)
+        if self.progress_callback:
+            self.progress_callback(current, total, success_count, failed_count, video_id, result)
+
+    def _run(self):
+        store = VideoStore(self.db_path)
+        try:
+            while not self._stop.is_set():
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                try:
+                    if self._next_ids(store, 1) and self.session.is_available():
+                        # 队列处理期间模型保持加载，每小批不重复预热和释放
+                        with self.session.batch():
+                            self._drain(store)
+                except Exception as e:
+                    print(f"⚠️ 后台AI预生成出错: {e}")
+        finally:
+            store.close()
+
+    def _drain(self, store: VideoStore):
+        """空闲时逐小批处理AI队列，直到队列为空、AI不可用或停止"""
+        done = 0
+        while self._wait_idle():
+            # 按入库顺序处理，退避中的失败视频不会挡住后面的视频
+            video_ids = self._next_ids(store, self.batch_size)
+            if not video_ids:
+                break
+            backlog = store.status_counts()['ai_pending'] - len(video_ids)
+            result = run_ai_batch(store, self.session.client, video_ids, ai_enabled=True,
+                                  progress_callback=self._on_progress, session=self.session,
+                                  backlog=backlog, enricher=self.enricher)
+            done += result['success']
+            if self.done_callback:
+                self.done_callback({'done': done, 'remaining': store.status_counts()['ai_pending']})
+            # Ollama不可用时 run_ai_batch 的结果包含 error
+            if result.get('error') or not result['success']:
+                # AI不可用或整批失败时等下一次通知或轮询再试
+                break
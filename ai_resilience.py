@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ollama请求的重试与熔断
+带随机抖动的指数退避重试；连续失败时熔断，暂停所有请求直到服务恢复
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from config import config
+
+
+class OllamaError(Exception):
+    """Ollama请求失败（已重试）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        # 服务端返回的HTTP状态码，连接错误等没有响应时为None
+        self.status_code = status_code
+
+
+class OllamaUnavailableError(OllamaError):
+    """Ollama服务持续不可用，熔断暂停超过最长等待时间"""
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """第 attempt 次重试前的等待秒数（full jitter：0 到指数上限之间的随机值）"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """熔断器
+
+    - 关闭：正常请求，连续失败达到 failure_threshold 次后打开
+    - 打开：所有请求等待，reset_timeout 秒后放行一个探测请求（半开）
+    - 探测成功则关闭并唤醒等待的请求；失败则重新打开，等待时间翻倍（不超过 max_reset_timeout）
+    - 探测请求没有得出结论就结束（被取消、出现连接错误以外的异常）时由 abandon_probe() 重新打开，
+      reset_timeout 秒后放行下一个探测请求，熔断不会停留在半开状态
+
+    可在多个线程中共用。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0, max_reset_timeout: float = 120.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self._reopen_at = 0.0
+        # 探测请求所在线程，没有进行中的探测请求时为None
+        self._probe = None
+        self._condition = threading.Condition()
+
+    def wait_until_closed(self, timeout: Optional[float] = None) -> bool:
+        """等待可以发送请求，熔断超过 timeout 秒仍未恢复时返回False
+
+        熔断打开超过 reset_timeout 后，只有一个调用者作为探测请求被放行，
+        它必须在请求结束后调用 record_success()、record_failure() 或 abandon_probe()。
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while True:
+                if self.state == self.CLOSED:
+                    return True
+                now = time.monotonic()
+                if self.state == self.OPEN and now >= self._reopen_at:
+                    self.state = self.HALF_OPEN
+                    self._probe = threading.get_ident()
+                    return True
+
+                if deadline is not None and now >= deadline:
+                    return False
+                wait = self._reopen_at - now if self.state == self.OPEN else self.reset_timeout
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                self._condition.wait(max(0.05, wait))
+
+    def record_success(self):
+        """请求成功，关闭熔断"""
+        with self._condition:
+            if self.state != self.CLOSED:
+                print("✅ Ollama服务已恢复，继续处理")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self._probe = None
+            self._condition.notify_all()
+
+    def record_failure(self):
+        """请求失败（连接错误、超时、服务端错误）"""
+        with self._condition:
+            self.failures += 1
+            self._probe = None
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            elif self.state == self.CLOSED and self.failures < self.failure_threshold:
+                return
+            elif self.state == self.OPEN:
+                return
+            self.state = self.OPEN
+            self._reopen_at = time.monotonic() + self.reset_timeout
+            print(f"⛔ Ollama连续请求失败，暂停 {self.reset_timeout:.0f} 秒后重试")
+            self._condition.notify_all()
+
+    def abandon_probe(self):
+        """一次请求尝试结束时调用：当前线程的探测请求没有记录成功或失败时重新打开熔断
+
+        等待时间不变，reset_timeout 秒后放行下一个探测请求；当前线程不是探测请求时不做任何事。
+        """
+        with self._condition:
+            if self.state != self.HALF_OPEN or self._probe != threading.get_ident():
+                return
+            self._probe = None
+            self.state = self.OPEN
+            self._reopen_at = time.monotonic() + self.reset_timeout
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict:
+        """当前熔断状态"""
+        with self._condition:
+            return {'state': self.state, 'failures': self.failures}
+
+    @classmethod
+    def from_config(cls) -> 'CircuitBreaker':
+        resilience_config = config.get_ai_resilience_config()
+        return cls(failure_threshold=resilience_config['circuit_failure_threshold'],
+                   reset_timeout=resilience_config['circuit_reset_timeout'])
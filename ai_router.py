@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI模型路由
+批量任务积压较多或主模型延迟超过目标时，批量请求改用配置的小模型；交互请求始终使用主模型
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from ai_scheduler import PRIORITY_INTERACTIVE
+from config import config
+
+# 按延迟切换到小模型后，至少经过多少秒再试探主模型
+LATENCY_COOLDOWN = 60.0
+# 判断主模型延迟时参考的最近请求数，至少有 MIN_LATENCY_SAMPLES 个才判断
+LATENCY_SAMPLES = 20
+MIN_LATENCY_SAMPLES = 5
+
+
+class ModelRouter:
+    """批量请求的模型选择
+
+    - 交互请求（编辑窗口）始终使用主模型
+    - 批量队列积压达到 queue_depth 时改用小模型，积压降到一半以下后恢复主模型
+    - 主模型最近批量请求的p95延迟超过 latency_target 时改用小模型，冷却期后试探主模型
+    - 小模型未安装时停用路由，只使用主模型
+
+    可在多个线程中共用。
+    """
+
+    def __init__(self, primary: str, bulk_model: str = '', queue_depth: int = 20, latency_target: float = 0.0,
+                 metrics=None, list_models: Optional[Callable[[], Optional[list]]] = None):
+        """
+        Args:
+            primary: 主模型
+            bulk_model: 批量任务使用的小模型，为空时不路由
+            queue_depth: 批量队列积压达到该数量时改用小模型，0表示不按积压切换
+            latency_target: 主模型批量请求p95延迟（秒）超过该值时改用小模型，0表示不按延迟切换
+            metrics: AIMetrics，用于读取主模型的最近延迟
+            list_models: 返回已安装模型列表的函数，首次使用小模型前检查
+        """
+        self.primary = primary
+        self.bulk_model = bulk_model if bulk_model != primary else ''
+        self.queue_depth_threshold = queue_depth
+        self.latency_target = latency_target
+        self.metrics = metrics
+        self.list_models = list_models
+        # 批量请求选用小模型时调用，接收模型名称（每次选择都会调用，如 OllamaSession 据此预热和释放小模型）
+        self.on_bulk_model = None
+
+        self._lock = threading.Lock()
+        self._queue_depth = 0
+        self._using_bulk = False
+        self._reason = ''
+        self._latency_until = 0.0
+        self._latency_since = 0.0
+        self._bulk_checked = False
+
+    @classmethod
+    def from_config(cls, primary: str, metrics=None, list_models=None) -> 'ModelRouter':
+        routing_config = config.get_model_routing_config()
+        return cls(primary, bulk_model=routing_config['bulk_model'], queue_depth=routing_config['queue_depth'],
+                   latency_target=routing_config['latency_target'], metrics=metrics, list_models=list_models)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.bulk_model)
+
+    def set_queue_depth(self, depth: int):
+        """更新批量队列积压数（尚未处理的视频数）"""
+        with self._lock:
+            self._queue_depth = max(0, depth)
+
+    def choose(self, priority: int) -> str:
+        """为一次请求选择模型"""
+        if not self.enabled or priority <= PRIORITY_INTERACTIVE:
+            return self.primary
+
+        with self._lock:
+            reason = self._bulk_reason()
+            switched = bool(reason) != self._using_bulk
+            self._using_bulk = bool(reason)
+            self._reason = reason
+            depth = self._queue_depth
+
+        if reason and not self._bulk_available():
+            return self.primary
+        if switched:
+            if reason:
+                print(f"🔀 {reason}，批量任务改用模型 {self.bulk_model}")
+            else:
+                print(f"🔀 批量任务恢复使用模型 {self.primary}（队列积压 {depth} 个）")
+        if reason and self.on_bulk_model is not None:
+            self.on_bulk_model(self.bulk_model)
+        return self.bulk_model if reason else self.primary
+
+    def _bulk_reason(self) -> str:
+        """需要使用小模型的原因，不需要时返回空字符串（调用方需持有锁）"""
+        threshold = self.queue_depth_threshold
+        if threshold:
+            # 因积压切换后，积压降到阈值一半以下才恢复，避免在阈值附近来回切换
+            limit = max(1, threshold // 2) if self._reason.startswith('队列') else threshold
+            if self._queue_depth >= limit:
+                return f"队列积压 {self._queue_depth} 个"
+
+        if self.latency_target and self.metrics is not None:
+            now = time.time()
+            if now < self._latency_until:
+                return f"{self.primary} 延迟超过 {self.latency_target:.0f} 秒"
+            # 冷却期结束后只参考之后的新请求，主模型重新积累足够样本前先恢复使用主模型
+            p95 = self.metrics.recent_latency(self.primary, 'batch', LATENCY_SAMPLES, since=self._latency_since,
+                                              minimum=MIN_LATENCY_SAMPLES)
+            if p95 is not None and p95 > self.latency_target:
+                self._latency_until = now + LATENCY_COOLDOWN
+                self._latency_since = self._latency_until
+                return f"{self.primary} 延迟超过 {self.latency_target:.0f} 秒（批量请求p95 {p95:.1f} 秒）"
+        return ''
+
+    def _bulk_available(self) -> bool:
+        """首次使用小模型前检查是否已安装，未安装时停用路由"""
+        if self._bulk_checked or self.list_models is None:
+            return self.enabled
+        models = self.list_models()
+        with self._lock:
+            if models is None:
+                # 服务暂时不可用，下次再检查
+                return True
+            self._bulk_checked = True
+            if self.bulk_model not in models:
+                print(f"⚠️ 小模型 {self.bulk_model} 未安装，批量任务继续使用 {self.primary}")
+                self.bulk_model = ''
+        return self.enabled
+
+    def snapshot(self) -> Dict:
+        """当前路由状态"""
+        with self._lock:
+            return {'model': self.bulk_model if self._using_bulk and self.bulk_model else self.primary,
+                    'reason': self._reason, 'queue_depth': self._queue_depth}
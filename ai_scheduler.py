@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI请求优先级调度
+所有生成请求共用与Ollama并行数相同的请求名额，名额空出时交互请求（编辑窗口）优先于批量任务
+"""
+
+import contextlib
+import itertools
+import threading
+import time
+from typing import Dict, Optional
+
+from config import config
+
+# 数值越小优先级越高
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BATCH: 'batch'}
+
+
+class _Waiter:
+    """排队等待名额的请求"""
+
+    def __init__(self, priority: int, seq: int, key: Optional[str]):
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.granted = False
+
+
+class AIScheduler:
+    """优先级请求名额
+
+    - 名额数与Ollama同时处理的请求数一致，多出的请求在客户端排队，而不是在服务端按先来后到排队
+    - 名额空出时分配给优先级最高（同优先级先到）的请求，批量任务因此把名额让给交互请求
+    - 请求的优先级取自当前线程（priority() 上下文），未设置时为交互优先级
+
+    可在多个线程中共用。
+    """
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self._in_use = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        # 最近一次交互请求的时间，后台预生成据此判断用户是否空闲
+        self._last_interactive = None
+        self._stats = {name: {'requests': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+                       for name in PRIORITY_NAMES.values()}
+
+    @classmethod
+    def from_config(cls) -> 'AIScheduler':
+        """名额数：配置 ai.scheduler_slots，为0时与 OLLAMA_NUM_PARALLEL 一致"""
+        slots = config.get('ai.scheduler_slots', 0)
+        if not slots:
+            from ai_engine import get_num_parallel
+            slots = get_num_parallel()
+        return cls(int(slots))
+
+    def current_priority(self) -> int:
+        """当前线程的请求优先级"""
+        return getattr(self._local, 'priority', PRIORITY_INTERACTIVE)
+
+    @contextlib.contextmanager
+    def priority(self, priority: int):
+        """在上下文中以指定优先级发送请求（只影响当前线程）"""
+        previous = self.current_priority()
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def acquire(self, priority: Optional[int] = None, key: Optional[str] = None) -> float:
+        """等待一个名额，返回排队秒数
+
+        Args:
+            priority: 优先级，为None时使用当前线程的优先级
+            key: 请求键，用于 promote() 提升排队中请求的优先级
+        """
+        if priority is None:
+            priority = self.current_priority()
+        start = time.monotonic()
+        with self._condition:
+            if priority <= PRIORITY_INTERACTIVE:
+                self._last_interactive = start
+            waiter = _Waiter(priority, next(self._seq), key)
+            self._waiters.append(waiter)
+            self._grant()
+            while not waiter.granted:
+                self._condition.wait()
+        wait = time.monotonic() - start
+
+        with self._condition:
+            stats = self._stats[PRIORITY_NAMES.get(waiter.priority, 'batch')]
+            stats['requests'] += 1
+            stats['total_wait'] += wait
+            stats['max_wait'] = max(stats['max_wait'], wait)
+        return wait
+
+    def release(self):
+        """归还名额"""
+        with self._condition:
+            self._in_use -= 1
+            self._grant()
+
+    def _grant(self):
+        """把空闲名额分配给优先级最高的等待者（调用方需持有锁）"""
+        granted = False
+        while self._waiters and self._in_use < self.slots:
+            waiter = min(self._waiters, key=lambda item: (item.priority, item.seq))
+            self._waiters.remove(waiter)
+            waiter.granted = True
+            self._in_use += 1
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, key: Optional[str] = None):
+        """占用一个名额发送请求，上下文的值为排队秒数"""
+        wait = self.acquire(key=key)
+        try:
+            yield wait
+        finally:
+            self.release()
+
+    def interactive_idle_seconds(self) -> float:
+        """距最近一次交互请求的秒数，有交互请求在排队时为0，从未有交互请求时为无穷大"""
+        with self._condition:
+            if any(waiter.priority <= PRIORITY_INTERACTIVE for waiter in self._waiters):
+                return 0.0
+            if self._last_interactive is None:
+                return float('inf')
+            return time.monotonic() - self._last_interactive
+
+    def promote(self, key: str, priority: Optional[int] = None):
+        """提升排队中请求的优先级（如交互请求等待批量任务中相同的请求时）"""
+        if priority is None:
+            priority = self.current_priority()
+        with self._condition:
+            if priority <= PRIORITY_INTERACTIVE:
+                self._last_interactive = time.monotonic()
+            for waiter in self._waiters:
+                if waiter.key == key and priority < waiter.priority:
+                    waiter.priority = priority
+
+    def stats(self) -> Dict:
+        """各优先级的请求数、平均/最长排队秒数，以及当前占用和排队的请求数"""
+        with self._condition:
+            result = {'slots': self.slots, 'in_use': self._in_use, 'waiting': len(self._waiters)}
+            for name, stats in self._stats.items():
+                result[name] = {
+                    'requests': stats['requests'],
+                    'avg_wait': round(stats['total_wait'] / stats['requests'], 3) if stats['requests'] else 0.0,
+                    'max_wait': round(stats['max_wait'], 3)
+                }
+            return result
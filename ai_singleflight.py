@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI请求合并与取消
+相同的请求同时进行时只调用一次Ollama，所有调用方共享结果；已删除视频的排队请求不再发送
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+class RequestCancelledError(Exception):
+    """视频已删除，排队中的AI请求被取消"""
+
+
+class _Call:
+    """一次进行中的请求"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """相同请求合并（single-flight）
+
+    - 同一个键的请求进行中时，后来的调用方等待并共享第一个请求的结果或异常
+    - 请求结束后立即移除，之后的调用重新请求（结果复用由生成结果缓存负责）
+    - cancel() 记录已删除的视频，这些视频尚未发送的请求抛出 RequestCancelledError
+
+    可在多个线程中共用。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._cancelled = set()
+        self._stats = {'calls': 0, 'shared': 0}
+
+    def begin(self, key: str) -> Tuple[_Call, bool]:
+        """开始或加入一个请求，返回 (请求, 是否由调用方负责发送)
+
+        返回True时调用方必须在结束后调用 finish()，否则调用 wait() 等待结果。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self._stats['shared'] += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self._stats['calls'] += 1
+            return call, True
+
+    def finish(self, key: str, call: _Call, result: Any = None, error: Optional[BaseException] = None):
+        """结束请求，唤醒所有等待的调用方"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    @staticmethod
+    def wait(call: _Call) -> Any:
+        """等待请求结束，返回结果或抛出请求的异常"""
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key: str, fn: Callable[[], Any], on_join: Optional[Callable[[], None]] = None) -> Any:
+        """执行 fn，相同键的请求进行中时直接等待其结果（等待前调用 on_join）"""
+        call, leader = self.begin(key)
+        if not leader:
+            if on_join:
+                on_join()
+            return self.wait(call)
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result
+
+    def join(self, key: str) -> Optional[_Call]:
+        """相同键的请求进行中时加入并返回该请求，否则返回None（不发起新请求）"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self._stats['shared'] += 1
+            return call
+
+    def cancel(self, video_ids: Iterable[int]):
+        """取消视频尚未发送的AI请求（视频ID不会复用，记录保留到进程结束）"""
+        with self._lock:
+            self._cancelled.update(video_ids)
+
+    def is_cancelled(self, video_id: int) -> bool:
+        with self._lock:
+            return video_id in self._cancelled
+
+    def check(self, video_id: Optional[int]):
+        """视频已删除时抛出 RequestCancelledError"""
+        if video_id is not None and self.is_cancelled(video_id):
+            raise RequestCancelledError(f"视频已删除，取消AI请求: {video_id}")
+
+    def stats(self) -> Dict:
+        """请求统计：实际发送的请求数、共享结果的调用数、进行中的请求数"""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
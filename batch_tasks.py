@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量任务
+批量AI生成与批量发布的核心流程，GUI与命令行/守护进程共用，不依赖tkinter
+"""
+
+import asyncio
+import contextlib
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ai_engine import AIGenerationEngine, AIMDConcurrencyController
+from ai_resilience import OllamaError
+from ai_scheduler import PRIORITY_BATCH
+from config import config
+from ollama_session import OllamaSession
+from video_store import VideoStore, AI_STATUS_PENDING, STATUS_PUBLISHED, STATUS_FAILED
+
+
+def placeholder_title(filename: str) -> str:
+    """AI不可用时的标题"""
+    return f"AI生成标题_{filename}"
+
+
+def placeholder_description(filename: str) -> str:
+    """AI不可用时的描述"""
+    return f"这是一个关于{filename}的精彩视频，内容有趣，值得观看。"
+
+
+def generate_ai_content(ollama_client, filename: str, ai_enabled: bool,
+                        regenerate: bool = False, context: str = '') -> Tuple[str, str, Optional[str]]:
+    """为单个视频生成名称、描述，并返回生成使用的模型，AI不可用时使用占位内容（模型为None）
+
+    context 为视频内容（画面描述、语音转写），为空时只根据文件名生成。
+    AI请求失败（已重试）时抛出 OllamaError，由调用方把视频保留在AI队列中，而不是写入占位内容。
+    """
+    if not ai_enabled:
+        return placeholder_title(filename), placeholder_description(filename), None
+
+    if config.get('ai.combined_generation', True):
+        # 一次请求生成标题、描述和话题标签，节省一半的提示词处理开销
+        content = ollama_client.generate_video_content(filename, regenerate=regenerate, context=context)
+        return (content['title'], ollama_client.append_hashtags(content['description'], content['hashtags']),
+                content.get('model'))
+
+    # 标题和描述使用同一个模型
+    model = ollama_client.select_model()
+    ai_name = ollama_client.generate_video_title(filename, regenerate=regenerate, model=model, context=context)
+    ai_desc = ollama_client.generate_video_description(filename, regenerate=regenerate, model=model,
+                                                       context=context)
+    return ai_name, ai_desc, model
+
+
+def batch_priority(ollama_client):
+    """以批量优先级发送请求的上下文（只影响当前线程），名额空出时让交互请求先用"""
+    scheduler = getattr(ollama_client, 'scheduler', None)
+    if scheduler is None:
+        return contextlib.nullcontext()
+    return scheduler.priority(PRIORITY_BATCH)
+
+
+def attach_metrics(ollama_client, result: Dict):
+    """把最近请求的延迟和生成速度加入结果，并按配置导出指标文件"""
+    metrics = getattr(ollama_client, 'metrics', None)
+    if metrics is None:
+        return
+    summary = metrics.summary()
+    result['metrics'] = {key: summary[key] for key in
+                         ('latency_p50', 'latency_p95', 'tokens_per_second', 'model_loads')}
+    try:
+        metrics.export()
+    except OSError as e:
+        print(f"⚠️ 导出AI指标失败: {e}")
+
+
+def set_queue_depth(ollama_client, depth: int):
+    """告知模型路由当前批量队列的积压数"""
+    router = getattr(ollama_client, 'router', None)
+    if router is not None:
+        router.set_queue_depth(depth)
+
+
+def model_session(ollama_client, session: Optional[OllamaSession] = None, ai_enabled: bool = True):
+    """批量生成期间保持模型加载的上下文，AI不可用时不做任何事"""
+    if not ai_enabled:
+        return contextlib.nullcontext()
+    return (session or OllamaSession(ollama_client)).batch()
+
+
+def run_ai_batch(store: VideoStore, ollama_client, video_ids: List[int], ai_enabled: bool = True,
+                 on_item_start: Optional[Callable[[int], None]] = None,
+                 progress_callback: Optional[Callable] = None,
+                 num_workers: Optional[int] = None, regenerate: bool = False,
+                 session: Optional[OllamaSession] = None,
+                 stats_callback: Optional[Callable[[Dict], None]] = None, backlog: int = 0,
+                 enricher=None) -> Dict:
+    """
+    批量为视频生成AI名称和描述（多个视频并发生成，结果分批提交）
+
+    Args:
+        store: 视频数据库
+        ollama_client: Ollama客户端
+        video_ids: 视频ID列表
+        ai_enabled: AI是否可用，不可用时写入占位内容
+        on_item_start: 开始处理某个视频时的回调，接收参数：(video_id)
+        progress_callback: 进度回调函数，接收参数：
+            (current, total, success_count, failed_count, video_id, result)
+            result 为 (名称, 描述, 模型)，失败时为 None
+        num_workers: 初始并发数，为None时与Ollama的 OLLAMA_NUM_PARALLEL 配置一致，之后根据延迟自适应调整
+        regenerate: 跳过AI结果缓存，重新生成
+        session: Ollama会话，用于批量前预热模型、结束后释放，为None时临时创建
+        stats_callback: 并发统计回调，接收参数：{concurrency, in_flight, throughput, latency}
+        backlog: 本批之外仍在AI队列中等待的视频数，与本批剩余数一起决定是否改用小模型
+        enricher: 视频内容提取器（ContentEnricher），提取结果作为生成的参考，为None时只根据文件名生成
+
+    Returns:
+        Dict: 生成结果统计，启用缓存时包含缓存统计 cache，AI可用时包含请求指标 metrics
+    """
+    def generate(video):
+        # 在工作线程中调用，每个线程各自设置优先级；视频内容已在占用并发名额前等待过（prepare），这里不再等待
+        context = enricher.get_context(video['file_path'], timeout=0) if enricher else ''
+        with batch_priority(ollama_client):
+            return generate_ai_content(ollama_client, video['filename'], ai_enabled, regenerate, context)
+
+    if not ai_enabled:
+        enricher = None
+    if enricher is not None:
+        # 提前提交所有视频，提取在独立的有界线程池中进行，生成时只等待本视频的结果
+        enricher.prefetch(video['file_path'] for video in store.get_videos(video_ids))
+
+    if ai_enabled:
+        # 并发上限由客户端调度器的名额数决定，控制器只在其范围内根据延迟调整
+        scheduler = getattr(ollama_client, 'scheduler', None)
+        controller = AIMDConcurrencyController.from_config(num_workers, cap=scheduler.slots if scheduler else None)
+    else:
+        # AI不可用时只写入占位内容，不需要并发
+        controller = AIMDConcurrencyController(1, minimum=1, maximum=1)
+    engine = AIGenerationEngine(
+        generate,
+        controller=controller,
+        # 界面中删除的视频记录在客户端的请求合并器中，排队中的请求随之取消
+        cancellation=getattr(ollama_client, 'singleflight', None),
+        # 只用实际发送的请求延迟调整并发，缓存命中不会拉低基准延迟
+        metrics=getattr(ollama_client, 'metrics', None),
+        # 等待视频内容提取时不占用并发名额
+        prepare=(lambda video: enricher.submit(video['file_path'])) if enricher else None,
+        prepare_timeout=enricher.wait_timeout if enricher else None
+    )
+    def on_progress(current, total, *args):
+        set_queue_depth(ollama_client, total - current + backlog)
+        if progress_callback:
+            progress_callback(current, total, *args)
+
+    set_queue_depth(ollama_client, len(video_ids) + backlog)
+    try:
+        with model_session(ollama_client, session, ai_enabled):
+            result = engine.run(store, video_ids, on_item_start=on_item_start, progress_callback=on_progress,
+                                stats_callback=stats_callback)
+    finally:
+        set_queue_depth(ollama_client, 0)
+    result['concurrency'] = engine.controller.snapshot()
+
+    cache_stats = ollama_client.cache_stats() if ai_enabled else None
+    if cache_stats:
+        result['cache'] = cache_stats
+    if ai_enabled:
+        attach_metrics(ollama_client, result)
+    return result
+
+
+def run_title_batch(store: VideoStore, ollama_client, video_ids: List[int],
+                    progress_callback: Optional[Callable] = None,
+                    regenerate: bool = False, commit_batch_size: int = 50,
+                    session: Optional[OllamaSession] = None) -> Dict:
+    """
+    批量生成视频标题（只更新显示名称），多个文件名合并到一次请求中，适合大批量重命名
+
+    AI请求失败（已重试）时停止，已生成的标题保留，没有生成标题的视频放回AI队列稍后重试，不写入占位标题。
+
+    Args:
+        store: 视频数据库
+        ollama_client: Ollama客户端
+        video_ids: 视频ID列表
+        progress_callback: 进度回调函数，接收参数：(current, total, video_id, title)
+        regenerate: 跳过AI结果缓存，重新生成
+        commit_batch_size: 累计多少条结果提交一次
+        session: Ollama会话，用于批量前预热模型、结束后释放，为None时临时创建
+
+    Returns:
+        Dict: 生成结果统计，请求失败时包含 error
+    """
+    videos = store.get_videos(video_ids)
+    total = len(videos)
+    done = [0]
+    titled = set()
+    error = None
+
+    def on_result(index, title):
+        store.update_display_name(videos[index]['id'], title, model=model, commit=False)
+        titled.add(videos[index]['id'])
+        done[0] += 1
+        set_queue_depth(ollama_client, total - done[0])
+        if done[0] % commit_batch_size == 0:
+            store.conn.commit()
+        if progress_callback:
+            progress_callback(done[0], total, videos[index]['id'], title)
+
+    set_queue_depth(ollama_client, total)
+    try:
+        with model_session(ollama_client, session), batch_priority(ollama_client):
+            # 整批标题使用同一个模型，开始时按积压选择
+            model = ollama_client.select_model()
+            ollama_client.generate_video_titles([video['filename'] for video in videos],
+                                                on_result=on_result, regenerate=regenerate, model=model)
+    except OllamaError as e:
+        error = e
+    finally:
+        failed_ids = [video['id'] for video in videos if video['id'] not in titled]
+        if failed_ids:
+            store.set_ai_status(failed_ids, AI_STATUS_PENDING, commit=False)
+        set_queue_depth(ollama_client, 0)
+        store.conn.commit()
+
+    result = {"success": done[0], "failed": len(video_ids) - done[0], "total": len(video_ids)}
+    if error is not None:
+        result['error'] = f"AI请求失败: {error}，{len(failed_ids)} 个视频已保留在AI队列中"
+    cache_stats = ollama_client.cache_stats()
+    if cache_stats:
+        result['cache'] = cache_stats
+    attach_metrics(ollama_client, result)
+    return result
+
+
+def run_publish_batch(store: VideoStore, video_ids: List[int], publisher=None, handle_login: bool = True,
+                      progress_callback: Optional[Callable] = None, ollama_client=None) -> Dict:
+    """
+    批量发布视频到抖音，并把每个视频的发布结果写入数据库
+
+    Args:
+        store: 视频数据库
+        video_ids: 视频ID列表
+        publisher: 抖音发布器，为None时创建默认发布器
+        handle_login: cookie失效时是否打开浏览器扫码登录（无显示环境应为False）
+        progress_callback: 进度回调函数，接收参数：
+            (current, total, success_count, failed_count, video_id, current_success)
+        ollama_client: 创建默认发布器时用于标签推荐的Ollama客户端（会话共用的客户端）
+
+    Returns:
+        Dict: 发布结果统计，初始化失败时包含 error
+    """
+    from douyin_publisher import DouyinPublisher
+
+    owns_publisher = publisher is None
+    if owns_publisher:
+        publisher = DouyinPublisher(ollama_client=ollama_client)
+
+    try:
+        # 获取选中的视频信息
+        videos = []
+        missing_count = 0
+        for video in store.get_videos(video_ids):
+            # 检查文件是否存在；文件不存在的视频标记为发布失败，否则会一直留在发布队列中，
+            # 守护进程每轮都会先取到它们
+            if not os.path.exists(video['file_path']):
+                print(f"❌ 视频文件不存在: {video['file_path']}")
+                store.update_status(video['id'], STATUS_FAILED)
+                missing_count += 1
+                continue
+            videos.append(video)
+
+        if not videos:
+            return {"success": 0, "failed": missing_count, "total": len(video_ids),
+                    "error": "没有找到有效的视频文件"}
+
+        # 初始化发布器
+        if not asyncio.run(publisher.initialize(handle=handle_login)):
+            return {"success": 0, "failed": missing_count, "total": len(video_ids),
+                    "error": "抖音发布器初始化失败"}
+
+        def on_progress(current, total, success_count, failed_count, current_success):
+            video_id = videos[current - 1]['id']
+            store.update_status(video_id, STATUS_PUBLISHED if current_success else STATUS_FAILED)
+            if progress_callback:
+                progress_callback(current, total, success_count, failed_count, video_id, current_success)
+
+        # 描述中没有话题标签的视频一次批量推荐标签，发布信息（标签、封面）在发布到该视频时才创建
+        publisher.suggest_tags(videos)
+        result = publisher.publish_videos_batch(videos, on_progress, build_info=publisher.create_publish_info)
+        result["failed"] += missing_count
+        result["total"] = len(video_ids)
+        return result
+    finally:
+        if owns_publisher:
+            publisher.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI批量生成吞吐量基准测试
+
+用法: python benchmarks/bench_ai_throughput.py [--videos 200] [--parallel 4] [--latency 0.05]
+
+使用本地Ollama替身服务（benchmarks/fake_ollama.py），不需要真实模型。工作目录切换到临时目录，
+不会改动项目中的数据库、配置和缓存。测量内容：
+1. 批量生成名称和描述：并发数固定为1、固定为服务端并行数、自适应并发时的吞吐量
+2. 批量生成标题：多个文件名合并请求时的吞吐量
+3. 界面响应：批量任务在后台线程运行时，主线程定时器（每16ms一次）的延迟
+4. 交互请求：批量任务进行中，编辑窗口单独生成标题的延迟（有无优先级调度对比）
+"""
+
+import argparse
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+# 配置文件和缓存按当前目录读写，先切换到临时目录再导入项目模块
+WORKDIR = tempfile.mkdtemp(prefix="bench_ai_")
+os.chdir(WORKDIR)
+atexit.register(shutil.rmtree, WORKDIR, True)
+
+from fake_ollama import FakeOllamaServer  # noqa: E402
+from ai_engine import AIGenerationEngine, AIMDConcurrencyController  # noqa: E402
+from ai_scheduler import AIScheduler  # noqa: E402
+from batch_tasks import generate_ai_content, run_ai_batch, run_title_batch  # noqa: E402
+from ollama_client import OllamaClient  # noqa: E402
+from video_store import VideoStore  # noqa: E402
+
+FRAME_INTERVAL = 0.016
+
+
+def create_store(count: int) -> VideoStore:
+    """创建临时数据库，写入 count 个视频（AI生成不需要真实文件）"""
+    db_path = os.path.join(WORKDIR, f"bench_{time.time_ns()}.db")
+    store = VideoStore(db_path)
+    store.conn.executemany(
+        "INSERT INTO videos (filename, display_name, file_path, description) VALUES (?, ?, ?, ?)",
+        [(f"吉他伴奏_{i:05d}.mp4", f"吉他伴奏_{i:05d}", f"/videos/吉他伴奏_{i:05d}.mp4", "")
+         for i in range(count)]
+    )
+    store.conn.commit()
+    return store
+
+
+def measure_ui_lag(stop_event: threading.Event) -> list:
+    """模拟界面主循环：每16ms唤醒一次，记录实际唤醒比预期晚了多少"""
+    lags = []
+    while not stop_event.is_set():
+        expected = time.perf_counter() + FRAME_INTERVAL
+        time.sleep(FRAME_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+    return lags
+
+
+def run_scenario(name: str, job) -> dict:
+    """在后台线程运行批量任务，主线程测量界面延迟"""
+    stop_event = threading.Event()
+    outcome = {}
+
+    def worker():
+        start = time.perf_counter()
+        outcome["result"] = job()
+        outcome["seconds"] = time.perf_counter() - start
+        stop_event.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    lags = measure_ui_lag(stop_event)
+    thread.join()
+
+    lags.sort()
+    result = outcome["result"]
+    print(f"{name}: {result['success']}/{result['total']} 个, {outcome['seconds']:.2f} 秒, "
+          f"{result['success'] / outcome['seconds']:.1f} 个/秒 | 界面延迟 p50 {statistics.median(lags) * 1000:.1f} ms, "
+          f"p95 {lags[int(len(lags) * 0.95)] * 1000:.1f} ms, 最大 {lags[-1] * 1000:.1f} ms")
+    return outcome
+
+
+def measure_interactive(client: OllamaClient, videos: int, interval: float = 0.2) -> list:
+    """批量任务运行期间每隔 interval 秒发送一个交互请求（生成标题），返回各请求的延迟"""
+    latencies = []
+    done = threading.Event()
+
+    def batch():
+        store = create_store(videos)
+        try:
+            run_ai_batch(store, client, store.get_ids_by_status("未发布"), ai_enabled=True)
+        finally:
+            store.close()
+            done.set()
+
+    thread = threading.Thread(target=batch)
+    thread.start()
+    # 等批量任务占满请求名额后再开始测量
+    time.sleep(1.0)
+    index = 0
+    while not done.is_set():
+        start = time.perf_counter()
+        client.generate_video_title(f"交互_{index}.mp4")
+        latencies.append(time.perf_counter() - start)
+        index += 1
+        time.sleep(interval)
+    thread.join()
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI批量生成吞吐量基准测试")
+    parser.add_argument("--videos", type=int, default=200, help="视频数量")
+    parser.add_argument("--parallel", type=int, default=4, help="替身服务同时处理的请求数")
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=400, help="每秒输出的token数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500错误的比例")
+    args = parser.parse_args()
+
+    with FakeOllamaServer(latency=args.latency, token_rate=args.token_rate, parallel=args.parallel,
+                          error_rate=args.error_rate) as server:
+        client = OllamaClient(server.url, cache=None)
+        client.retry_base_delay = 0.05
+        # 请求名额与替身服务的并行数一致（相当于正确设置了 OLLAMA_NUM_PARALLEL）
+        client.scheduler = AIScheduler(args.parallel)
+        print(f"替身服务: {server.url}，并行 {args.parallel}，延迟 {args.latency}s，"
+              f"{args.token_rate} token/s，错误率 {args.error_rate:.0%}，视频 {args.videos} 个")
+
+        scenarios = [
+            ("名称+描述 并发1", AIMDConcurrencyController(1, minimum=1, maximum=1)),
+            (f"名称+描述 并发{args.parallel}",
+             AIMDConcurrencyController(args.parallel, minimum=args.parallel, maximum=args.parallel)),
+            ("名称+描述 自适应", AIMDConcurrencyController(2, maximum=args.parallel * 2)),
+        ]
+        for name, controller in scenarios:
+            engine = AIGenerationEngine(
+                lambda video: generate_ai_content(client, video["filename"], True), controller=controller)
+
+            def job(engine=engine):
+                # SQLite连接只能在创建它的线程中使用
+                store = create_store(args.videos)
+                try:
+                    return engine.run(store, store.get_ids_by_status("未发布"))
+                finally:
+                    store.close()
+
+            run_scenario(name, job)
+            print(f"  最终并发 {controller.current_limit}，服务端最大并发 {server.stats['max_concurrent']}")
+            server.stats["max_concurrent"] = 0
+
+        def title_job():
+            store = create_store(args.videos)
+            try:
+                return run_title_batch(store, client, store.get_ids_by_status("未发布"))
+            finally:
+                store.close()
+
+        run_scenario("批量标题（多文件名合并请求）", title_job)
+
+        # 名额数远大于服务端并行数时，请求全部在服务端按先来后到排队，相当于没有优先级调度
+        for name, slots in (("无优先级调度", 64), ("交互优先", args.parallel)):
+            client.scheduler = AIScheduler(slots)
+            latencies = measure_interactive(client, args.videos)
+            if latencies:
+                print(f"批量期间的交互请求（{name}）: {len(latencies)} 个，延迟 p50 "
+                      f"{statistics.median(latencies) * 1000:.0f} ms，最大 {latencies[-1] * 1000:.0f} ms")
+        print(f"替身服务统计: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动时间基准测试
+
+用法: python benchmarks/bench_startup.py [--runs 5]
+
+每次测量都在新的子进程中进行（冷启动），工作目录为临时目录，不会改动项目中的数据库和配置：
+1. 导入 video_manager_improved 的耗时，以及导入后是否已加载 Playwright
+2. 从创建 VideoManager 到窗口首次绘制完成的耗时（需要图形环境）
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import video_manager_improved
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "playwright_loaded": "playwright" in sys.modules}))
+"""
+
+WINDOW_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from video_manager_improved import VideoManager
+app = VideoManager()
+app.root.update()
+elapsed = time.perf_counter() - start
+app.root.destroy()
+print(json.dumps({"seconds": elapsed}))
+"""
+
+
+def run_child(script: str, workdir: str) -> dict:
+    """在子进程中运行测量脚本"""
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    result = subprocess.run([sys.executable, "-c", script], cwd=workdir, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", errors="replace").strip())
+    # 只取最后一行，前面可能有模块打印的日志
+    return json.loads(result.stdout.decode("utf-8").strip().splitlines()[-1])
+
+
+def has_display() -> bool:
+    """是否有可用的图形环境"""
+    return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY"))
+
+
+def report(name: str, samples: list):
+    print(f"{name}: 中位数 {statistics.median(samples) * 1000:.1f} ms, "
+          f"最小 {min(samples) * 1000:.1f} ms, 最大 {max(samples) * 1000:.1f} ms ({len(samples)} 次)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动时间基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每项测量的次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        samples = []
+        playwright_loaded = False
+        for _ in range(args.runs):
+            result = run_child(IMPORT_SCRIPT, workdir)
+            samples.append(result["seconds"])
+            playwright_loaded = playwright_loaded or result["playwright_loaded"]
+        report("导入 video_manager_improved", samples)
+        print(f"导入后已加载 Playwright: {'是' if playwright_loaded else '否'}")
+
+        if not has_display():
+            print("没有图形环境，跳过窗口显示耗时测量")
+            return
+
+        samples = [run_child(WINDOW_SCRIPT, workdir)["seconds"] for _ in range(args.runs)]
+        report("创建窗口到首次绘制", samples)
+
+
+if __name__ == "__main__":
+    main()
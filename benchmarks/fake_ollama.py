@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地Ollama替身服务
+
+实现 /api/tags、/api/generate（流式与非流式）和 /api/embed，不需要模型即可测试和压测AI相关代码：
+- 延迟：每个请求的固定延迟（模拟提示词处理）加按 token_rate 输出的生成时间
+- 并行槽位：同时处理的请求数（对应 OLLAMA_NUM_PARALLEL），多出的请求排队
+- 错误注入：按比例返回500错误
+- <think> 输出：在回答前输出一段思考内容
+- 嵌入向量：按字符二元组哈希到固定维度，字面相近的文本向量相近
+
+用法:
+    python benchmarks/fake_ollama.py --port 11434 --latency 0.2 --token-rate 50
+也可以在代码中使用:
+    with FakeOllamaServer(latency=0.1) as server:
+        client = OllamaClient(server.url)
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_MODEL = "qwen3:8b"
+EMBEDDING_MODEL = "nomic-embed-text"
+EMBEDDING_DIM = 64
+
+
+class FakeOllamaServer:
+    """Ollama替身服务，在后台线程中运行"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, models: Optional[List[str]] = None,
+                 latency: float = 0.05, token_rate: float = 200.0, parallel: int = 4,
+                 error_rate: float = 0.0, think: bool = False, load_time: float = 0.0):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示随机端口
+            models: /api/tags 返回的模型列表
+            latency: 每个请求的固定延迟（秒）
+            token_rate: 每秒输出的token数，每个字符按一个token计算
+            parallel: 同时处理的请求数，多出的请求排队等待
+            error_rate: 返回500错误的比例（0-1）
+            think: 回答前是否输出 <think>…</think>
+            load_time: 模型未加载时首个请求额外的加载时间（秒）
+        """
+        self.models = models or [DEFAULT_MODEL, EMBEDDING_MODEL]
+        self.latency = latency
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.think = think
+        self.load_time = load_time
+
+        self.slots = threading.Semaphore(max(1, parallel))
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.stats = {"requests": 0, "errors": 0, "generated": 0, "max_concurrent": 0}
+        self._active = 0
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeOllamaServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def answer(self, payload: Dict) -> str:
+        """根据提示词生成固定格式的回答"""
+        prompt = payload.get("prompt", "")
+        # 批量标题提示词中的编号文件名列表
+        block = re.search(r"视频文件名：\n(.+?)\n\n", prompt, re.S)
+        filenames = re.findall(r"^(\d+)\. (.+)$", block.group(1), re.M) if block else []
+        match = re.search(r"视频文件名：(.+)", prompt)
+        filename = match.group(1).strip() if match else "视频"
+        name = filename.rsplit(".", 1)[0][:12]
+
+        if payload.get("format") == "json":
+            if "titles" in prompt and filenames:
+                return json.dumps({"titles": [{"id": int(index), "title": f"精彩{value[:12]}"}
+                                              for index, value in filenames]}, ensure_ascii=False)
+            return json.dumps({"title": f"精彩{name}", "description": f"这是关于{name}的精彩视频，快来看看吧。",
+                               "hashtags": ["短视频", name]}, ensure_ascii=False)
+        if "标题" in prompt:
+            return f"精彩{name}"
+        return f"这是关于{name}的精彩视频，内容有趣，值得一看。"
+
+    @staticmethod
+    def embedding(text: str) -> List[float]:
+        """字符二元组哈希向量（未归一化）"""
+        vector = [0.0] * EMBEDDING_DIM
+        for i in range(max(1, len(text) - 1)):
+            digest = hashlib.md5(text[i:i + 2].encode("utf-8")).digest()
+            vector[digest[0] % EMBEDDING_DIM] += 1.0 if digest[1] & 1 else -1.0
+        return vector
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头与响应体分开发送，关闭Nagle算法避免每个请求多出约40ms的延迟确认等待
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status: int, data: Dict):
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self.send_json(200, {"models": [{"name": name} for name in server.models]})
+                else:
+                    self.send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path not in ("/api/generate", "/api/embed"):
+                    self.send_json(404, {"error": "not found"})
+                    return
+                if payload.get("model") not in server.models:
+                    self.send_json(404, {"error": f"model '{payload.get('model')}' not found"})
+                    return
+
+                with server.lock:
+                    server.stats["requests"] += 1
+                    inject_error = random.random() < server.error_rate
+                    if inject_error:
+                        server.stats["errors"] += 1
+                if inject_error:
+                    self.send_json(500, {"error": "injected error"})
+                    return
+
+                if self.path == "/api/embed":
+                    texts = payload.get("input", [])
+                    if isinstance(texts, str):
+                        texts = [texts]
+                    self.send_json(200, {"model": payload["model"],
+                                         "embeddings": [server.embedding(text) for text in texts]})
+                    return
+
+                with server.slots:
+                    with server.lock:
+                        server._active += 1
+                        server.stats["max_concurrent"] = max(server.stats["max_concurrent"], server._active)
+                    try:
+                        self.generate(payload)
+                    finally:
+                        with server.lock:
+                            server._active -= 1
+
+            def generate(self, payload: Dict):
+                # keep_alive 为0且没有提示词：释放模型
+                if payload.get("keep_alive") == 0 and "prompt" not in payload:
+                    server.loaded = False
+                    self.send_json(200, {"model": payload["model"], "response": "", "done": True})
+                    return
+
+                load_duration = 0.0
+                if not server.loaded:
+                    load_duration = server.load_time
+                    time.sleep(load_duration)
+                    server.loaded = True
+
+                # 只有 keep_alive 而没有提示词：只加载模型
+                if "prompt" not in payload:
+                    self.send_json(200, {"model": payload["model"], "response": "", "done": True})
+                    return
+
+                time.sleep(server.latency)
+                text = server.answer(payload)
+                if server.think:
+                    text = "<think>\n先分析文件名，再给出结果。\n</think>\n\n" + text
+                metrics = {
+                    "prompt_eval_count": len(payload.get("prompt", "")),
+                    "prompt_eval_duration": int(server.latency * 1e9),
+                    "load_duration": int(load_duration * 1e9),
+                }
+
+                if not payload.get("stream", True):
+                    time.sleep(len(text) / server.token_rate)
+                    with server.lock:
+                        server.stats["generated"] += 1
+                    self.send_json(200, dict(metrics, model=payload["model"], response=text, done=True,
+                                             eval_count=len(text),
+                                             eval_duration=int(len(text) / server.token_rate * 1e9)))
+                    return
+
+                # 流式输出：每个字符一行JSON，客户端提前断开时停止生成
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for char in text:
+                        time.sleep(1.0 / server.token_rate)
+                        self.write_chunk({"model": payload["model"], "response": char, "done": False})
+                    self.write_chunk(dict(metrics, model=payload["model"], response="", done=True,
+                                          eval_count=len(text),
+                                          eval_duration=int(len(text) / server.token_rate * 1e9)))
+                    self.wfile.write(b"0\r\n\r\n")
+                    with server.lock:
+                        server.stats["generated"] += 1
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def write_chunk(self, data: Dict):
+                line = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地Ollama替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", action="append", help="可用模型（可多次指定）")
+    parser.add_argument("--latency", type=float, default=0.2, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=50, help="每秒输出的token数")
+    parser.add_argument("--parallel", type=int, default=2, help="同时处理的请求数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500错误的比例")
+    parser.add_argument("--think", action="store_true", help="回答前输出<think>内容")
+    parser.add_argument("--load-time", type=float, default=0.0, help="模型加载时间（秒）")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, models=args.model, latency=args.latency,
+                              token_rate=args.token_rate, parallel=args.parallel,
+                              error_rate=args.error_rate, think=args.think, load_time=args.load_time)
+    print(f"Ollama替身服务已启动: {server.url}（Ctrl+C 退出）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
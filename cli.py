@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行与守护进程模式
+无显示环境（服务器、cron、systemd）下使用，不依赖tkinter
+
+用法示例:
+    python run.py import /data/videos
+    python run.py ai-describe --queue 12 13 14
+    python run.py publish --queue --all
+    python run.py index-tags
+    python run.py --json status
+    python run.py daemon --interval 60
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import threading
+from typing import Dict, List
+
+from video_store import (
+    VideoStore, STATUS_UNPUBLISHED, STATUS_QUEUED, AI_STATUS_NONE, AI_STATUS_PENDING, SORT_COLUMNS, DEFAULT_SORT
+)
+from batch_tasks import run_ai_batch, run_publish_batch, run_title_batch
+from config import config
+
+# 守护进程各轮之间共用的Ollama会话（健康状态按TTL缓存）
+_ollama_session = None
+# 视频内容提取器，未启用时为None
+_content_enricher = None
+_enricher_created = False
+
+
+def get_ollama_session():
+    """获取Ollama会话，首次调用时创建客户端"""
+    global _ollama_session
+    if _ollama_session is None:
+        from ollama_client import OllamaClient
+        from ollama_session import OllamaSession
+        _ollama_session = OllamaSession(OllamaClient())
+    return _ollama_session
+
+
+def get_content_enricher():
+    """按配置获取视频内容提取器，未启用时返回None"""
+    global _content_enricher, _enricher_created
+    if not _enricher_created:
+        from content_enricher import ContentEnricher
+        _content_enricher = ContentEnricher.from_config(get_ollama_session().client)
+        _enricher_created = True
+    return _content_enricher
+
+
+def resolve_ids(store: VideoStore, args, default_status: str) -> List[int]:
+    """根据命令行参数确定要处理的视频ID"""
+    if args.ids:
+        return args.ids
+    if args.all:
+        return [video['id'] for video in reversed(store.list_videos(status=default_status))]
+    return []
+
+
+def cmd_import(store: VideoStore, args) -> Dict:
+    """添加视频文件或文件夹"""
+    file_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            file_paths.extend(VideoStore.scan_folder(os.path.abspath(path)))
+        else:
+            file_paths.append(os.path.abspath(path))
+
+    # --ai 或启用了入库预生成（ai.pregenerate）时新视频直接进入AI队列，由守护进程处理
+    queue_ai = args.ai or config.get_pregenerate_config()['enabled']
+    return store.add_videos(file_paths, ai_status=AI_STATUS_PENDING if queue_ai else AI_STATUS_NONE)
+
+
+def cmd_scan(store: VideoStore, args) -> Dict:
+    """扫描文件夹，列出尚未入库的视频（不写入数据库）"""
+    video_files = VideoStore.scan_folder(os.path.abspath(args.folder))
+    cursor = store.conn.cursor()
+    new_files = []
+    for file_path in video_files:
+        cursor.execute("SELECT 1 FROM videos WHERE file_path = ?", (file_path,))
+        if cursor.fetchone() is None:
+            new_files.append(file_path)
+    return {'found': len(video_files), 'new': len(new_files), 'new_paths': new_files}
+
+
+def cmd_ai_describe(store: VideoStore, args) -> Dict:
+    """批量生成AI名称和描述，或加入AI队列"""
+    video_ids = resolve_ids(store, args, STATUS_UNPUBLISHED)
+    if not video_ids:
+        return {'error': '没有指定视频，请提供视频ID或使用 --all'}
+
+    if args.queue:
+        store.set_ai_status(video_ids, AI_STATUS_PENDING)
+        return {'queued': len(video_ids)}
+
+    session = get_ollama_session()
+    if not session.is_available():
+        # 命令行模式下不写入占位内容，避免覆盖数据
+        return {'error': 'AI功能不可用，请检查Ollama服务'}
+    return run_ai_batch(store, session.client, video_ids, ai_enabled=True, regenerate=args.regenerate,
+                        session=session, enricher=get_content_enricher())
+
+
+def cmd_ai_title(store: VideoStore, args) -> Dict:
+    """批量生成AI标题（多个文件名合并请求）"""
+    video_ids = resolve_ids(store, args, STATUS_UNPUBLISHED)
+    if not video_ids:
+        return {'error': '没有指定视频，请提供视频ID或使用 --all'}
+
+    session = get_ollama_session()
+    if not session.is_available():
+        return {'error': 'AI功能不可用，请检查Ollama服务'}
+    return run_title_batch(store, session.client, video_ids, regenerate=args.regenerate, session=session)
+
+
+def cmd_publish(store: VideoStore, args) -> Dict:
+    """批量发布视频，或加入发布队列"""
+    video_ids = resolve_ids(store, args, STATUS_UNPUBLISHED)
+    if not video_ids:
+        return {'error': '没有指定视频，请提供视频ID或使用 --all'}
+
+    if args.queue:
+        store.set_status(video_ids, STATUS_QUEUED)
+        return {'queued': len(video_ids)}
+
+    return run_publish_batch(store, video_ids, handle_login=args.login, ollama_client=get_ollama_session().client)
+
+
+def cmd_index_tags(store: VideoStore, args) -> Dict:
+    """把描述中带话题标签的视频加入标签索引（已索引的跳过，--rebuild 时全部重新计算）"""
+    from prompt_templates import extract_hashtags
+    from tag_recommender import TagRecommender, video_text
+
+    recommender = TagRecommender.from_config(get_ollama_session().client)
+    if recommender is None:
+        return {'error': '话题标签推荐未启用（配置 tags.enabled）或未安装numpy'}
+
+    items = []
+    for video in store.list_videos():
+        tags = extract_hashtags(video.get('description'))
+        if tags and (args.rebuild or not recommender.contains(video['id'])):
+            items.append((video['id'], video_text(video['display_name'], video['description']), tags))
+
+    try:
+        indexed = recommender.add_many(items)
+    except Exception as e:
+        return {'error': f'计算嵌入向量失败: {e}'}
+    recommender.save()
+    return {'indexed': indexed, 'total': recommender.size}
+
+
+def cmd_status(store: VideoStore, args) -> Dict:
+    """查看视频统计与列表"""
+    result = store.status_counts()
+    if args.list or args.status:
+        result['videos'] = store.list_videos(status=args.status, limit=args.limit, sort=args.sort,
+                                             descending=not args.asc)
+    return result
+
+
+def work_queues_once(store: VideoStore, batch_size: int, handle_login: bool = False) -> Dict:
+    """处理一轮AI队列和发布队列"""
+    summary = {}
+
+    ai_ids = store.get_ids_by_ai_status(AI_STATUS_PENDING, limit=batch_size)
+    if ai_ids:
+        session = get_ollama_session()
+        if session.is_available():
+            # 本轮之外仍在排队的视频也计入积压，积压较多时批量任务改用小模型
+            backlog = store.status_counts()['ai_pending'] - len(ai_ids)
+            summary['ai'] = run_ai_batch(store, session.client, ai_ids, ai_enabled=True, session=session,
+                                         backlog=backlog, enricher=get_content_enricher())
+        else:
+            # AI不可用时保留队列，下一轮再试
+            summary['ai'] = {'skipped': len(ai_ids), 'error': 'AI功能不可用'}
+
+    publish_ids = store.get_ids_by_status(STATUS_QUEUED, limit=batch_size)
+    if publish_ids:
+        summary['publish'] = run_publish_batch(store, publish_ids, handle_login=handle_login,
+                                               ollama_client=get_ollama_session().client)
+
+    return summary
+
+
+def cmd_daemon(store: VideoStore, args) -> Dict:
+    """常驻进程，定期处理AI队列和发布队列"""
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        print(f"收到信号 {signum}，处理完当前批次后退出", file=sys.stderr)
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    rounds = 0
+    while not stop_event.is_set():
+        try:
+            summary = work_queues_once(store, args.batch_size, handle_login=args.login)
+        except Exception as e:
+            # 单轮出错不退出守护进程，下一轮重试
+            print(f"处理队列时出错: {e}", file=sys.stderr)
+            summary = {'error': str(e)}
+        rounds += 1
+        if summary:
+            emit(args, {'round': rounds, **summary}, stream=sys.__stdout__)
+        if args.once:
+            break
+        stop_event.wait(args.interval)
+
+    return {'rounds': rounds, 'stopped': True}
+
+
+def emit(args, data: Dict, stream=None):
+    """输出结果，--json 时输出单行JSON，便于cron/监控采集"""
+    stream = stream or sys.stdout
+    if args.json:
+        print(json.dumps(data, ensure_ascii=False, default=str), file=stream, flush=True)
+        return
+
+    for key, value in data.items():
+        if key == 'videos':
+            for video in value:
+                print(f"  [{video['id']}] {video['display_name']} | {video['status']} | "
+                      f"AI:{video['ai_status'] or '-'} | {video['file_path']}", file=stream)
+        elif isinstance(value, list):
+            print(f"{key}:", file=stream)
+            for item in value:
+                print(f"  {item}", file=stream)
+        else:
+            print(f"{key}: {value}", file=stream)
+    stream.flush()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='run.py', description='抖音自动发布工具（命令行模式）')
+    parser.add_argument('--db', default='videos.db', help='数据库路径（默认 videos.db）')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='添加视频文件或文件夹')
+    import_parser.add_argument('paths', nargs='+', help='视频文件或文件夹路径')
+    import_parser.add_argument('--ai', action='store_true', help='将新视频加入AI生成队列')
+
+    scan_parser = subparsers.add_parser('scan', help='扫描文件夹中尚未添加的视频')
+    scan_parser.add_argument('folder', help='文件夹路径')
+
+    for name, help_text in (('ai-describe', '批量生成AI名称和描述'), ('publish', '批量发布到抖音')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('ids', nargs='*', type=int, help='视频ID')
+        sub.add_argument('--all', action='store_true', help='处理所有未发布视频')
+        sub.add_argument('--queue', action='store_true', help='只加入队列，由守护进程处理')
+        if name == 'publish':
+            sub.add_argument('--login', action='store_true', help='cookie失效时打开浏览器扫码登录')
+        else:
+            sub.add_argument('--regenerate', action='store_true', help='不使用AI结果缓存，重新生成')
+
+    title_parser = subparsers.add_parser('ai-title', help='批量生成AI标题（多个视频合并请求，适合大批量重命名）')
+    title_parser.add_argument('ids', nargs='*', type=int, help='视频ID')
+    title_parser.add_argument('--all', action='store_true', help='处理所有未发布视频')
+    title_parser.add_argument('--regenerate', action='store_true', help='不使用AI结果缓存，重新生成')
+
+    tags_parser = subparsers.add_parser('index-tags', help='用带话题标签的视频建立标签推荐索引')
+    tags_parser.add_argument('--rebuild', action='store_true', help='重新计算所有视频的嵌入向量')
+
+    status_parser = subparsers.add_parser('status', help='查看视频统计')
+    status_parser.add_argument('--status', help='按发布状态筛选并列出视频')
+    status_parser.add_argument('--list', action='store_true', help='列出视频')
+    status_parser.add_argument('--limit', type=int, default=50, help='列出的最大数量')
+    status_parser.add_argument('--sort', choices=list(SORT_COLUMNS), default=DEFAULT_SORT, help='排序列')
+    status_parser.add_argument('--asc', action='store_true', help='升序排列（默认倒序）')
+
+    daemon_parser = subparsers.add_parser('daemon', help='常驻处理AI队列和发布队列')
+    daemon_parser.add_argument('--interval', type=float, default=60, help='轮询间隔（秒）')
+    daemon_parser.add_argument('--batch-size', type=int, default=20, help='每轮每个队列最多处理的视频数')
+    daemon_parser.add_argument('--once', action='store_true', help='只处理一轮后退出（适合cron）')
+    daemon_parser.add_argument('--login', action='store_true', help='cookie失效时打开浏览器扫码登录')
+
+    return parser
+
+
+HANDLERS = {
+    'import': cmd_import,
+    'scan': cmd_scan,
+    'ai-describe': cmd_ai_describe,
+    'ai-title': cmd_ai_title,
+    'publish': cmd_publish,
+    'index-tags': cmd_index_tags,
+    'status': cmd_status,
+    'daemon': cmd_daemon,
+}
+
+
+def main(argv=None) -> int:
+    """命令行入口，返回进程退出码"""
+    args = build_parser().parse_args(argv)
+    store = VideoStore(args.db)
+    try:
+        # 各模块的过程日志输出到stderr，stdout只保留结果
+        with contextlib.redirect_stdout(sys.stderr):
+            result = HANDLERS[args.command](store, args)
+    finally:
+        store.close()
+        if _ollama_session is not None:
+            # 退出前释放等待空闲释放的模型
+            _ollama_session.close()
+
+    emit(args, result)
+    return 1 if result.get('error') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,12 +21,58 @@ class Config:
             'ui': {
                 'window_size': '1200x800',
                 'theme': 'default',
-                'language': 'zh_CN'
+                'language': 'zh_CN',
+                'show_thumbnails': False,
+                'thumbnail_cache_size': 300,  # 内存中最多保留的缩略图数量
+                'refresh_fps': 20,  # 后台任务界面更新的每秒刷新次数
+                'page_size': 500  # 视频列表每页加载的行数，滚动到底部时加载下一页
             },
             'ai': {
                 'ollama_url': 'http://localhost:11434',
                 'model': 'llama2',
-                'enabled': False
+                'enabled': False,
+                'num_parallel': 0,  # 初始并发请求数，0表示使用环境变量OLLAMA_NUM_PARALLEL（默认2）
+                'adaptive_concurrency': True,  # 根据请求延迟和错误率自动调整并发数
+                'max_parallel': 8,  # 自动调整时的并发上限（不超过 scheduler_slots）
+                'scheduler_slots': 0,  # 同时发送给Ollama的生成请求数（交互请求优先），0表示与OLLAMA_NUM_PARALLEL一致
+                'bulk_model': '',  # 批量任务积压较多或主模型过慢时改用的小模型（需已安装），为空表示不切换
+                'routing_queue_depth': 20,  # 批量队列积压达到该数量时改用小模型，0表示不按积压切换
+                'routing_latency_target': 0,  # 主模型批量请求p95延迟（秒）超过该值时改用小模型，0表示不按延迟切换
+                'pregenerate': False,  # 新视频入库后在空闲时自动生成名称和描述
+                'pregenerate_batch_size': 4,  # 后台预生成每小批的视频数
+                'pregenerate_idle_seconds': 10,  # 最近一次交互请求后空闲多少秒才开始预生成
+                'combined_generation': True,  # 一次请求生成标题、描述和话题标签
+                'context_window': 2048,  # 模型上下文长度（token），限制批量标题每批的数量
+                'health_ttl': 30,  # Ollama健康状态缓存秒数
+                'keep_alive': '10m',  # 批量生成期间模型保持加载的时间
+                'release_after_batch': True,  # 批量生成结束后释放模型显存
+                'release_idle_seconds': 300,  # 批量结束后空闲多少秒再释放（期间的新批次直接使用已加载的模型），0表示立即释放
+                'max_retries': 3,  # 生成请求失败后的重试次数（指数退避）
+                'retry_base_delay': 1.0,  # 首次重试的最长等待秒数
+                'circuit_failure_threshold': 5,  # 连续失败多少次后暂停所有请求
+                'circuit_reset_timeout': 10,  # 暂停多少秒后试探服务是否恢复
+                'max_pause': 300  # 服务持续不可用时最多等待的秒数，超过后本次请求失败
+            },
+            'ai_cache': {
+                'enabled': True,
+                'path': '',  # 为空时使用 cache/ai/generations.db
+                'max_entries': 5000,
+                'max_age_days': 30
+            },
+            'ai_metrics': {
+                'window': 500,  # 计算分位数和生成速度使用的最近请求数
+                'export_path': ''  # 批量生成后导出指标的文件，.prom 为Prometheus文本格式，其他为JSON；为空时不导出
+            },
+            'prompts': {
+                'platform': 'douyin',  # 生成内容的目标平台：douyin（抖音）、channels（视频号）、xhs（小红书）
+                'versions': {}  # 指定提示词模板版本做对比，如 {"title": 2} 或 {"douyin/title": 2}，未指定时使用最新版本
+            },
+            'tags': {
+                'enabled': False,  # 描述中没有话题标签时，按相似的已发布视频推荐标签
+                'embedding_model': 'nomic-embed-text',
+                'top_k': 10,  # 推荐时参考的最相似视频数
+                'min_similarity': 0.3,
+                'suggest_timeout': 3  # 发布时推荐标签最多等待的秒数（只请求一次，不重试），超时不推荐
             },
             'publish': {
                 'douyin': {
@@ -45,6 +91,32 @@ class Config:
                 'max_file_size': 1024 * 1024 * 1024,  # 1GB
                 'auto_generate_description': True,
                 'auto_generate_name': False
+            },
+            'media': {
+                'ffmpeg_path': '',
+                'ffprobe_path': '',
+                'cache_root': 'cache'
+            },
+            'preprocess': {
+                'enabled': False,
+                'mode': 'remux',  # remux: 仅转封装为faststart MP4; transcode: 按平台参数转码
+                'platform': 'douyin',
+                'max_workers': 2,
+                'wait_timeout': 600  # 发布时等待单个视频预处理的最长秒数，超时后上传原文件
+            },
+            'cover': {
+                'enabled': False,
+                'candidates': 8,  # 每个视频采样的候选帧数
+                'max_workers': 2
+            },
+            'enrich': {
+                'enabled': False,  # 提取视频内容作为AI生成的参考
+                'mode': 'frames',  # frames: 多模态模型描述关键帧；transcript: 语音转文字（需 faster-whisper）；both
+                'vision_model': 'qwen2.5vl:3b',  # Ollama中的多模态模型
+                'frames': 3,  # 每个视频描述的关键帧数
+                'whisper_model': 'small',  # faster-whisper模型名称或路径
+                'max_workers': 1,  # 同时提取的视频数
+                'wait_timeout': 120  # 批量生成时等待单个视频提取的最长秒数，超时后不使用视频内容
             }
         }
         self.config = self.load_config()
@@ -131,6 +203,104 @@ class Config:
         """获取发布平台配置"""
         return self.get(f'publish.{platform}', {})
     
+    def get_preprocess_config(self):
+        """获取发布前视频预处理配置"""
+        return {
+            'enabled': self.get('preprocess.enabled', False),
+            'mode': self.get('preprocess.mode', 'remux'),
+            'platform': self.get('preprocess.platform', 'douyin'),
+            'max_workers': self.get('preprocess.max_workers', 2),
+            'wait_timeout': self.get('preprocess.wait_timeout', 600)
+        }
+    
+    def get_cover_config(self):
+        """获取自动封面提取配置"""
+        return {
+            'enabled': self.get('cover.enabled', False),
+            'candidates': self.get('cover.candidates', 8),
+            'max_workers': self.get('cover.max_workers', 2)
+        }
+    
+    def get_enrich_config(self):
+        """获取视频内容提取配置"""
+        return {
+            'enabled': self.get('enrich.enabled', False),
+            'mode': self.get('enrich.mode', 'frames'),
+            'vision_model': self.get('enrich.vision_model', 'qwen2.5vl:3b'),
+            'frames': self.get('enrich.frames', 3),
+            'whisper_model': self.get('enrich.whisper_model', 'small'),
+            'max_workers': self.get('enrich.max_workers', 1),
+            'wait_timeout': self.get('enrich.wait_timeout', 120)
+        }
+    
+    def get_ai_cache_config(self):
+        """获取AI生成结果缓存配置"""
+        return {
+            'enabled': self.get('ai_cache.enabled', True),
+            'path': self.get('ai_cache.path', ''),
+            'max_entries': self.get('ai_cache.max_entries', 5000),
+            'max_age_days': self.get('ai_cache.max_age_days', 30)
+        }
+    
+    def get_ollama_session_config(self):
+        """获取Ollama会话（健康检查缓存、模型预热与释放）配置"""
+        return {
+            'health_ttl': self.get('ai.health_ttl', 30),
+            'keep_alive': self.get('ai.keep_alive', '10m'),
+            'release_after_batch': self.get('ai.release_after_batch', True),
+            'release_idle_seconds': self.get('ai.release_idle_seconds', 300)
+        }
+    
+    def get_ai_resilience_config(self):
+        """获取AI请求重试与熔断配置"""
+        return {
+            'max_retries': self.get('ai.max_retries', 3),
+            'retry_base_delay': self.get('ai.retry_base_delay', 1.0),
+            'circuit_failure_threshold': self.get('ai.circuit_failure_threshold', 5),
+            'circuit_reset_timeout': self.get('ai.circuit_reset_timeout', 10),
+            'max_pause': self.get('ai.max_pause', 300)
+        }
+    
+    def get_ai_metrics_config(self):
+        """获取AI请求指标配置"""
+        return {
+            'window': self.get('ai_metrics.window', 500),
+            'export_path': self.get('ai_metrics.export_path', '')
+        }
+    
+    def get_pregenerate_config(self):
+        """获取入库后台AI预生成配置"""
+        return {
+            'enabled': self.get('ai.pregenerate', False),
+            'batch_size': self.get('ai.pregenerate_batch_size', 4),
+            'idle_seconds': self.get('ai.pregenerate_idle_seconds', 10)
+        }
+    
+    def get_model_routing_config(self):
+        """获取批量任务模型路由配置"""
+        return {
+            'bulk_model': self.get('ai.bulk_model', ''),
+            'queue_depth': self.get('ai.routing_queue_depth', 20),
+            'latency_target': self.get('ai.routing_latency_target', 0)
+        }
+    
+    def get_prompt_config(self):
+        """获取提示词模板配置"""
+        return {
+            'platform': self.get('prompts.platform', 'douyin'),
+            'versions': self.get('prompts.versions', {}) or {}
+        }
+    
+    def get_tags_config(self):
+        """获取话题标签推荐配置"""
+        return {
+            'enabled': self.get('tags.enabled', False),
+            'embedding_model': self.get('tags.embedding_model', 'nomic-embed-text'),
+            'top_k': self.get('tags.top_k', 10),
+            'min_similarity': self.get('tags.min_similarity', 0.3),
+            'suggest_timeout': self.get('tags.suggest_timeout', 3)
+        }
+    
     def update_ui_config(self, window_size=None, theme=None):
         """更新UI配置"""
         if window_size:
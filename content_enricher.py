@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频内容理解
+为AI生成提供视频内容：用本地多模态模型（Ollama）描述几张关键帧，或用本地语音识别转写开头的语音，
+结果按内容指纹缓存到磁盘，重新生成标题和描述时直接复用
+"""
+
+import base64
+import contextlib
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Iterable, List, Optional
+
+from ai_resilience import OllamaError
+from ai_scheduler import PRIORITY_BATCH
+from config import config
+from media_utils import cached_fingerprint, find_executable, get_cache_dir, load_numpy, probe_duration
+
+# faster-whisper（可选依赖）在首次转写时才导入
+WhisperModel = None
+
+
+def _load_whisper() -> bool:
+    """按需导入faster-whisper，不可用时返回False"""
+    global WhisperModel
+    if WhisperModel is None:
+        try:
+            from faster_whisper import WhisperModel as model_class
+            WhisperModel = model_class
+        except ImportError:
+            WhisperModel = False
+    return WhisperModel is not False
+
+MODE_FRAMES = 'frames'
+MODE_TRANSCRIPT = 'transcript'
+MODE_BOTH = 'both'
+
+# 发送给多模态模型的关键帧宽度
+FRAME_WIDTH = 512
+CAPTION_PROMPT = "用一句中文描述这张视频截图的画面内容（人物、场景、动作），不超过30字，不要思考，直接输出。"
+CAPTION_MAX_TOKENS = 60
+
+# 只转写视频开头的语音，短视频的主题通常在开头说明
+TRANSCRIPT_SECONDS = 120
+TRANSCRIPT_MAX_LENGTH = 200
+SAMPLE_RATE = 16000
+# 引导Whisper输出简体中文
+TRANSCRIPT_PROMPT = "以下是普通话的句子。"
+
+# 作为生成上下文的最大字数
+CONTEXT_MAX_LENGTH = 300
+
+
+def format_context(info: Optional[Dict]) -> str:
+    """把缓存的画面描述和语音转写整理成提示词中的视频内容"""
+    if not info:
+        return ''
+    parts = []
+    if info.get('captions'):
+        parts.append('画面：' + '；'.join(info['captions']))
+    if info.get('transcript'):
+        parts.append('语音：' + info['transcript'])
+    return '\n'.join(parts)[:CONTEXT_MAX_LENGTH]
+
+
+class ContentEnricher:
+    """视频内容提取器
+
+    - 每个视频只提取一次，结果按内容指纹缓存在 cache/context/ 下，更换多模态或语音模型后重新提取对应部分
+    - 提取在有界线程池中进行，请求Ollama时使用批量优先级，不影响编辑窗口的交互请求
+    - 批量生成前通过 prefetch 提前提交，生成时用 get_context 等待结果；编辑窗口只读取已有缓存
+    """
+
+    def __init__(self, client, mode: str = MODE_FRAMES, vision_model: str = 'qwen2.5vl:3b', frames: int = 3,
+                 whisper_model: str = 'small', max_workers: int = 1, wait_timeout: float = 120.0,
+                 cache_dir: Optional[str] = None):
+        """
+        Args:
+            client: OllamaClient，用于请求多模态模型
+            mode: frames（关键帧画面描述）、transcript（语音转写）或 both
+            vision_model: Ollama中的多模态模型
+            frames: 每个视频描述的关键帧数
+            whisper_model: faster-whisper模型名称或路径
+            max_workers: 同时提取的视频数
+            wait_timeout: get_context 最多等待的秒数，超时后本次生成不使用视频内容（提取继续在后台进行）
+            cache_dir: 缓存目录，为None时使用 cache/context
+        """
+        self.client = client
+        self.mode = mode
+        self.vision_model = vision_model
+        self.frames = max(1, int(frames))
+        self.whisper_model = whisper_model
+        self.max_workers = max(1, int(max_workers))
+        self.wait_timeout = wait_timeout
+        self.cache_dir = cache_dir or get_cache_dir('context')
+        self.ffmpeg = find_executable('ffmpeg')
+
+        self.use_frames = mode in (MODE_FRAMES, MODE_BOTH)
+        self.use_transcript = mode in (MODE_TRANSCRIPT, MODE_BOTH)
+        if self.use_transcript and not _load_whisper():
+            print("⚠️ 未安装faster-whisper，不转写语音（pip install faster-whisper）")
+            self.use_transcript = False
+        elif self.use_transcript and load_numpy() is None:
+            # 音频数据需要numpy转换后交给Whisper
+            print("⚠️ 未安装numpy，不转写语音（pip install numpy）")
+            self.use_transcript = False
+
+        self._executor = None
+        self._lock = threading.Lock()
+        # 指纹 -> Future，避免同一视频重复提取
+        self._pending = {}
+        self._whisper = None
+        self._whisper_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, client) -> Optional['ContentEnricher']:
+        """根据配置创建内容提取器，未启用时返回None"""
+        enrich_config = config.get_enrich_config()
+        if not enrich_config['enabled']:
+            return None
+        return cls(client, mode=enrich_config['mode'], vision_model=enrich_config['vision_model'],
+                   frames=enrich_config['frames'], whisper_model=enrich_config['whisper_model'],
+                   max_workers=enrich_config['max_workers'], wait_timeout=enrich_config['wait_timeout'])
+
+    @property
+    def available(self) -> bool:
+        """ffmpeg可用且至少启用了一种提取方式"""
+        return self.ffmpeg is not None and (self.use_frames or self.use_transcript)
+
+    def get_cache_path(self, fingerprint: str) -> str:
+        """内容缓存路径"""
+        return os.path.join(self.cache_dir, f"{fingerprint}.json")
+
+    def _read_cache(self, cache_path: str) -> Dict:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            return info if isinstance(info, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _missing(self, info: Dict) -> bool:
+        """缓存中是否缺少当前配置需要的部分"""
+        if self.use_frames and info.get('vision_model') != self.vision_model:
+            return True
+        if self.use_transcript and info.get('whisper_model') != self.whisper_model:
+            return True
+        return False
+
+    def get_cached(self, file_path: str) -> Optional[Dict]:
+        """读取已提取的内容，不存在时返回None（不会触发提取）"""
+        try:
+            info = self._read_cache(self.get_cache_path(cached_fingerprint(file_path)))
+        except OSError:
+            return None
+        return info or None
+
+    def get_cached_context(self, file_path: str) -> str:
+        """已提取内容的上下文文本，没有时返回空字符串"""
+        return format_context(self.get_cached(file_path))
+
+    def prefetch(self, file_paths: Iterable[str]):
+        """在后台为一批视频提取内容
+
+        计算指纹需要读取文件，因此提交过程本身也放到后台线程，调用方（UI线程）立即返回。
+        """
+        file_paths = list(file_paths)
+
+        def submit_all():
+            for file_path in file_paths:
+                self.submit(file_path)
+
+        threading.Thread(target=submit_all, daemon=True).start()
+
+    def submit(self, file_path: str) -> Future:
+        """提交单个视频的内容提取任务，结果为内容字典或None"""
+        if not self.available:
+            return self._completed(None)
+
+        try:
+            fingerprint = cached_fingerprint(file_path)
+        except OSError:
+            return self._completed(None)
+
+        cache_path = self.get_cache_path(fingerprint)
+        info = self._read_cache(cache_path)
+        if info and not self._missing(info):
+            return self._completed(info)
+
+        with self._lock:
+            if fingerprint in self._pending:
+                return self._pending[fingerprint]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='enrich')
+            future = self._executor.submit(self._enrich, file_path, cache_path, info)
+            self._pending[fingerprint] = future
+
+        future.add_done_callback(lambda _: self._forget(fingerprint))
+        return future
+
+    def get_context(self, file_path: str, timeout: Optional[float] = None) -> str:
+        """等待视频内容提取完成并返回上下文文本，超时或失败时返回空字符串"""
+        future = self.submit(file_path)
+        try:
+            info = future.result(timeout=self.wait_timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            print(f"⚠️ 视频内容提取超时，本次不使用视频内容: {os.path.basename(file_path)}")
+            return ''
+        except Exception as e:
+            print(f"⚠️ 提取视频内容失败 {file_path}: {e}")
+            return ''
+        return format_context(info)
+
+    def shutdown(self):
+        """关闭后台线程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _forget(self, fingerprint: str):
+        with self._lock:
+            self._pending.pop(fingerprint, None)
+
+    def _enrich(self, file_path: str, cache_path: str, info: Dict) -> Optional[Dict]:
+        """提取缺少的部分并写入缓存，已有的部分保留"""
+        scheduler = getattr(self.client, 'scheduler', None)
+        priority = scheduler.priority(PRIORITY_BATCH) if scheduler is not None else contextlib.nullcontext()
+        info = dict(info)
+        try:
+            with priority:
+                if self.use_frames and info.get('vision_model') != self.vision_model:
+                    captions = self._caption_frames(file_path)
+                    if captions is not None:
+                        info.update(captions=captions, vision_model=self.vision_model)
+                if self.use_transcript and info.get('whisper_model') != self.whisper_model:
+                    transcript = self._transcribe(file_path)
+                    if transcript is not None:
+                        info.update(transcript=transcript, whisper_model=self.whisper_model)
+        except Exception as e:
+            print(f"⚠️ 提取视频内容失败 {file_path}: {e}")
+
+        if not info:
+            return None
+        try:
+            # 先写临时文件再替换，并发读取时不会读到写了一半的文件
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(cache_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(info, f, ensure_ascii=False)
+            os.replace(cache_path + '.tmp', cache_path)
+        except OSError as e:
+            print(f"⚠️ 保存视频内容缓存失败: {e}")
+        return info
+
+    def _frame_timestamps(self, duration: Optional[float]) -> List[float]:
+        """在视频的10%~90%区间均匀取关键帧时间点，避开片头片尾"""
+        if not duration or duration <= 0:
+            return [0.0]
+        if self.frames == 1:
+            return [duration / 2]
+        start, end = duration * 0.1, duration * 0.9
+        step = (end - start) / (self.frames - 1)
+        return [start + step * i for i in range(self.frames)]
+
+    def _caption_frames(self, file_path: str) -> Optional[List[str]]:
+        """描述关键帧画面，模型不可用时返回None（不写入缓存，下次重试）"""
+        captions = []
+        for timestamp in self._frame_timestamps(probe_duration(file_path)):
+            image = self._read_frame_jpeg(file_path, timestamp)
+            if image is None:
+                continue
+            try:
+                caption = self.client.describe_image(base64.b64encode(image).decode('ascii'), CAPTION_PROMPT,
+                                                     self.vision_model, max_tokens=CAPTION_MAX_TOKENS)
+            except OllamaError as e:
+                if e.status_code == 404:
+                    print(f"⚠️ 多模态模型 {self.vision_model} 未安装，不再描述视频画面")
+                    self.use_frames = False
+                else:
+                    print(f"⚠️ 描述视频画面失败: {e}")
+                return None
+            caption = caption.strip().split('\n')[0].strip()
+            if caption and caption not in captions:
+                captions.append(caption)
+        return captions
+
+    def _read_frame_jpeg(self, file_path: str, timestamp: float) -> Optional[bytes]:
+        """读取指定时间点的缩小JPEG帧"""
+        result = subprocess.run(
+            [self.ffmpeg, '-loglevel', 'error', '-ss', f"{timestamp:.3f}", '-i', file_path,
+             '-frames:v', '1', '-vf', f"scale={FRAME_WIDTH}:-2", '-q:v', '4', '-f', 'image2pipe',
+             '-vcodec', 'mjpeg', '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=30
+        )
+        if result.returncode != 0 or not result.stdout:
+            return None
+        return result.stdout
+
+    def _transcribe(self, file_path: str) -> Optional[str]:
+        """转写视频开头的语音，没有音轨或没有语音时返回空字符串，转写失败时返回None"""
+        np = load_numpy()
+
+        result = subprocess.run(
+            [self.ffmpeg, '-loglevel', 'error', '-t', str(TRANSCRIPT_SECONDS), '-i', file_path,
+             '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=120
+        )
+        if result.returncode != 0:
+            # 没有音轨时ffmpeg报错退出
+            return ''
+        audio = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+        if not len(audio):
+            return ''
+
+        # Whisper模型加载较慢且占用内存，所有线程共用一个实例，转写串行进行
+        with self._whisper_lock:
+            if self._whisper is None:
+                print(f"🎙️ 加载语音识别模型 {self.whisper_model}")
+                self._whisper = WhisperModel(self.whisper_model, device='auto', compute_type='int8')
+            segments, _ = self._whisper.transcribe(audio, language='zh', vad_filter=True,
+                                                   initial_prompt=TRANSCRIPT_PROMPT)
+            text = ''.join(segment.text.strip() for segment in segments)
+        return text[:TRANSCRIPT_MAX_LENGTH]
+
+    @staticmethod
+    def _completed(result: Optional[Dict]) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
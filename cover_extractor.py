@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频封面自动提取
+在后台采样候选帧，按清晰度/亮度评分选出封面，结果按内容指纹缓存到磁盘
+"""
+
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+from config import config
+from media_utils import cached_fingerprint, find_executable, get_cache_dir, load_numpy, probe_duration
+
+# 评分用缩略帧尺寸
+SCORE_WIDTH = 160
+SCORE_HEIGHT = 284
+
+# 亮度可接受区间，过暗/过曝的帧直接淘汰
+MIN_BRIGHTNESS = 30
+MAX_BRIGHTNESS = 225
+
+
+def score_frames(frames: 'np.ndarray') -> 'np.ndarray':
+    """对一组灰度帧打分
+
+    Args:
+        frames: 形状为 (N, H, W) 的灰度帧
+
+    Returns:
+        np.ndarray: 每帧得分，拉普拉斯方差（清晰度）乘以亮度权重
+    """
+    np = load_numpy()
+    frames = frames.astype(np.float32)
+    center = frames[:, 1:-1, 1:-1]
+    laplacian = (frames[:, :-2, 1:-1] + frames[:, 2:, 1:-1] +
+                 frames[:, 1:-1, :-2] + frames[:, 1:-1, 2:] - 4 * center)
+    sharpness = laplacian.reshape(len(frames), -1).var(axis=1)
+
+    brightness = frames.reshape(len(frames), -1).mean(axis=1)
+    # 亮度越接近中间调权重越高，超出可接受区间的帧得分为0
+    weight = 1.0 - np.abs(brightness - 128.0) / 128.0
+    weight[(brightness < MIN_BRIGHTNESS) | (brightness > MAX_BRIGHTNESS)] = 0.0
+
+    return sharpness * weight
+
+
+class CoverExtractor:
+    """封面提取器
+
+    通过 prefetch 在后台线程池中生成封面，发布时只通过 get_cached_cover 读取缓存，
+    不会在上传流程中临时截帧。
+    """
+
+    def __init__(self, candidates: int = 8, max_workers: int = 2, cache_dir: Optional[str] = None):
+        self.candidates = max(1, int(candidates))
+        self.max_workers = max(1, int(max_workers))
+        self.cache_dir = cache_dir or get_cache_dir('covers')
+        self.ffmpeg = find_executable('ffmpeg')
+
+        self._executor = None
+        self._lock = threading.Lock()
+        # 指纹 -> Future，避免同一视频重复提取
+        self._pending = {}
+
+    @classmethod
+    def from_config(cls) -> Optional['CoverExtractor']:
+        """根据配置创建封面提取器，未启用时返回None"""
+        cover_config = config.get_cover_config()
+        if not cover_config['enabled']:
+            return None
+        return cls(candidates=cover_config['candidates'],
+                   max_workers=cover_config['max_workers'])
+
+    @property
+    def available(self) -> bool:
+        """ffmpeg是否可用"""
+        return self.ffmpeg is not None
+
+    def get_cover_path(self, fingerprint: str) -> str:
+        """封面缓存路径"""
+        return os.path.join(self.cache_dir, f"{fingerprint}.jpg")
+
+    def get_cached_cover(self, file_path: str) -> Optional[str]:
+        """读取已生成的封面，不存在时返回None（不会触发提取）"""
+        try:
+            cover_path = self.get_cover_path(cached_fingerprint(file_path))
+        except OSError:
+            return None
+        return cover_path if os.path.exists(cover_path) else None
+
+    def prefetch(self, file_paths: Iterable[str]):
+        """在后台为一批视频生成封面
+
+        计算指纹需要读取文件，因此提交过程本身也放到后台线程，调用方（UI线程）立即返回。
+        """
+        file_paths = list(file_paths)
+
+        def submit_all():
+            for file_path in file_paths:
+                self.submit(file_path)
+
+        threading.Thread(target=submit_all, daemon=True).start()
+
+    def submit(self, file_path: str) -> Future:
+        """提交单个视频的封面提取任务，结果为封面路径或None"""
+        if not self.available:
+            return self._completed(None)
+
+        try:
+            fingerprint = cached_fingerprint(file_path)
+        except OSError:
+            return self._completed(None)
+
+        cover_path = self.get_cover_path(fingerprint)
+        if os.path.exists(cover_path):
+            return self._completed(cover_path)
+
+        with self._lock:
+            if fingerprint in self._pending:
+                return self._pending[fingerprint]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='cover')
+            future = self._executor.submit(self._extract, file_path, cover_path)
+            self._pending[fingerprint] = future
+
+        future.add_done_callback(lambda _: self._forget(fingerprint))
+        return future
+
+    def shutdown(self):
+        """关闭后台线程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _forget(self, fingerprint: str):
+        with self._lock:
+            self._pending.pop(fingerprint, None)
+
+    def _extract(self, file_path: str, cover_path: str) -> Optional[str]:
+        """采样候选帧、评分并导出最佳帧"""
+        try:
+            duration = probe_duration(file_path)
+            timestamps = self._candidate_timestamps(duration)
+
+            best_timestamp = timestamps[len(timestamps) // 2]
+            # numpy在首次评分时才导入，避免拖慢程序启动，未安装时取中间的候选帧
+            np = load_numpy()
+            if len(timestamps) > 1 and np is not None:
+                frames = []
+                sampled = []
+                for timestamp in timestamps:
+                    frame = self._read_gray_frame(file_path, timestamp)
+                    if frame is not None:
+                        frames.append(frame)
+                        sampled.append(timestamp)
+                if frames:
+                    scores = score_frames(np.stack(frames))
+                    best_timestamp = sampled[int(np.argmax(scores))]
+
+            tmp_path = cover_path + '.part.jpg'
+            result = subprocess.run(
+                [self.ffmpeg, '-y', '-loglevel', 'error', '-ss', f"{best_timestamp:.3f}",
+                 '-i', file_path, '-frames:v', '1', '-q:v', '2', tmp_path],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60
+            )
+            if result.returncode != 0 or not os.path.exists(tmp_path):
+                return None
+            os.replace(tmp_path, cover_path)
+            return cover_path
+        except Exception as e:
+            print(f"⚠️ 提取封面失败 {file_path}: {e}")
+            return None
+
+    def _candidate_timestamps(self, duration: Optional[float]) -> List[float]:
+        """在视频的10%~90%区间均匀取候选时间点，避开片头片尾"""
+        if not duration or duration <= 0:
+            return [0.0]
+        if self.candidates == 1:
+            return [duration / 2]
+        start, end = duration * 0.1, duration * 0.9
+        step = (end - start) / (self.candidates - 1)
+        return [start + step * i for i in range(self.candidates)]
+
+    def _read_gray_frame(self, file_path: str, timestamp: float) -> Optional['np.ndarray']:
+        """读取指定时间点的缩小灰度帧"""
+        result = subprocess.run(
+            [self.ffmpeg, '-loglevel', 'error', '-ss', f"{timestamp:.3f}", '-i', file_path,
+             '-frames:v', '1', '-vf', f"scale={SCORE_WIDTH}:{SCORE_HEIGHT}",
+             '-f', 'rawvideo', '-pix_fmt', 'gray', '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=30
+        )
+        expected = SCORE_WIDTH * SCORE_HEIGHT
+        if result.returncode != 0 or len(result.stdout) < expected:
+            return None
+        np = load_numpy()
+        return np.frombuffer(result.stdout[:expected], dtype=np.uint8).reshape(SCORE_HEIGHT, SCORE_WIDTH)
+
+    @staticmethod
+    def _completed(result: Optional[str]) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
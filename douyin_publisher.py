@@ -10,31 +10,59 @@ import os
 import sys
 from datetime import datetime
 import threading
-from typing import Optional, List, Dict
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional, List, Dict
+
+from cover_extractor import CoverExtractor
+from prompt_templates import extract_hashtags
+from tag_recommender import TagRecommender, video_text
+from video_preprocessor import VideoPreprocessor
 
 # 添加本地uploader路径
 sys.path.append('./uploader')
 
-# 尝试导入发布器
-try:
-    from douyin_uploader.main import DouYinVideo, douyin_setup
-    DOUYIN_PUBLISHER_AVAILABLE = True
-    print("✅ 抖音发布器可用")
-except ImportError as e:
-    DOUYIN_PUBLISHER_AVAILABLE = False
-    print(f"⚠️ 抖音发布器不可用: {e}")
-    print("将使用模拟发布功能")
+# 上传器模块（会加载Playwright），首次使用时才导入；None表示尚未导入
+_uploader_module = None
+_uploader_lock = threading.Lock()
+
+
+def load_uploader():
+    """
+    按需导入抖音上传器
+    
+    Returns:
+        上传器模块（douyin_uploader.main），不可用时返回None
+    """
+    global _uploader_module
+    with _uploader_lock:
+        if _uploader_module is None:
+            try:
+                from douyin_uploader import main as uploader_main
+                _uploader_module = uploader_main
+                print("✅ 抖音发布器可用")
+            except ImportError as e:
+                _uploader_module = False
+                print(f"⚠️ 抖音发布器不可用: {e}")
+                print("将使用模拟发布功能")
+    return _uploader_module or None
 
 
 class DouyinPublisher:
     """抖音发布器"""
     
-    def __init__(self, account_file: str = None):
+    def __init__(self, account_file: str = None, preprocessor: Optional[VideoPreprocessor] = None,
+                 cover_extractor: Optional[CoverExtractor] = None,
+                 tag_recommender: Optional[TagRecommender] = None, ollama_client=None):
         """
         初始化发布器
         
         Args:
             account_file: 账号cookie文件路径，如果为None则使用默认路径
+            preprocessor: 发布前视频预处理器，如果为None则按配置创建（未启用时不预处理）
+            cover_extractor: 封面提取器，只读取已生成的封面缓存，如果为None则按配置创建
+            tag_recommender: 话题标签推荐器，如果为None则按配置创建（未启用时使用默认标签）
+            ollama_client: 按配置创建标签推荐器时计算嵌入向量使用的Ollama客户端（应传入会话共用的客户端，
+                共享熔断、调度和指标），为None时推荐器自行创建
         """
         if account_file is None:
             # 默认账号文件路径
@@ -45,21 +73,41 @@ class DouyinPublisher:
         self.is_initialized = False
         self.publish_queue = []
         self.current_publishing = False
+        
+        if preprocessor is None:
+            preprocessor = VideoPreprocessor.from_config()
+        self.preprocessor = preprocessor
+        
+        if cover_extractor is None:
+            cover_extractor = CoverExtractor.from_config()
+        self.cover_extractor = cover_extractor
+        
+        if tag_recommender is None:
+            tag_recommender = TagRecommender.from_config(ollama_client)
+        self.tag_recommender = tag_recommender
+        # 发布成功、等待加入标签索引的视频，close() 时一次计算嵌入向量，不占用发布间隔
+        self._pending_tag_index = []
+        # 视频ID -> 推荐标签，由 suggest_tags() 批量计算，create_publish_info() 时使用
+        self._suggested_tags = {}
     
-    async def initialize(self) -> bool:
+    async def initialize(self, handle: bool = True) -> bool:
         """
         初始化发布器，检查cookie是否有效
         
+        Args:
+            handle: cookie失效时是否打开浏览器扫码登录，无显示环境下应为False
+        
         Returns:
             bool: 初始化是否成功
         """
-        if not DOUYIN_PUBLISHER_AVAILABLE:
+        uploader = load_uploader()
+        if uploader is None:
             print("❌ 抖音发布器不可用")
             return False
             
         try:
             # 检查账号设置
-            success = await douyin_setup(self.account_file, handle=True)
+            success = await uploader.douyin_setup(self.account_file, handle=handle)
             if success:
                 self.is_initialized = True
                 print("✅ 抖音发布器初始化成功")
@@ -87,7 +135,8 @@ class DouyinPublisher:
         Returns:
             bool: 发布是否成功
         """
-        if not DOUYIN_PUBLISHER_AVAILABLE:
+        uploader = load_uploader()
+        if uploader is None:
             print(f"⚠️ 模拟发布视频: {video_info.get('title', '未知标题')}")
             return True
             
@@ -105,7 +154,7 @@ class DouyinPublisher:
             thumbnail_path = video_info.get('thumbnail_path')
             
             # 创建DouYinVideo对象
-            douyin_video = DouYinVideo(
+            douyin_video = uploader.DouYinVideo(
                 title=title,
                 file_path=file_path,
                 tags=tags,
@@ -124,13 +173,16 @@ class DouyinPublisher:
             print(f"❌ 视频发布失败: {e}")
             return False
     
-    def publish_videos_batch(self, video_list: List[Dict], progress_callback=None) -> Dict:
+    def publish_videos_batch(self, video_list: List[Dict], progress_callback=None,
+                             build_info: Optional[Callable[[Dict], Dict]] = None) -> Dict:
         """
         批量发布视频
         
         Args:
             video_list: 视频信息列表
             progress_callback: 进度回调函数，接收参数：(current, total, success_count, failed_count, current_success)
+            build_info: 发布到某个视频时才把 video_list 中的项转换为发布信息（如数据库视频信息经
+                create_publish_info 转换），为None时 video_list 中即为发布信息；提前预处理只使用其中的 file_path
         
         Returns:
             Dict: 发布结果统计
@@ -145,37 +197,56 @@ class DouyinPublisher:
         
         print(f"🚀 开始批量发布 {total} 个视频...")
         
-        for i, video_info in enumerate(video_list):
-            current_success = False
-            try:
-                print(f"📤 正在发布第 {i+1}/{total} 个视频: {video_info.get('title', '未知标题')}")
+        # 预处理任务，提前提交后续视频，使预处理与当前视频上传重叠进行
+        prepared = {}
+        lookahead = self.preprocessor.max_workers if self.preprocessor else 0
+        
+        try:
+            for i, video_info in enumerate(video_list):
+                current_success = False
+                try:
+                    if build_info:
+                        video_info = build_info(video_info)
+                    print(f"📤 正在发布第 {i+1}/{total} 个视频: {video_info.get('title', '未知标题')}")
                 
-                # 发布视频
-                success = self.publish_video(video_info)
+                    if self.preprocessor:
+                        for j in range(i, min(i + 1 + lookahead, total)):
+                            if j not in prepared:
+                                prepared[j] = self.preprocessor.submit(video_list[j]['file_path'])
+                        video_info = dict(video_info, file_path=self.wait_prepared(prepared.pop(i),
+                                                                                   video_info['file_path']))
                 
-                if success:
-                    success_count += 1
-                    current_success = True
-                else:
-                    failed_count += 1
+                    # 发布视频
+                    success = self.publish_video(video_info)
                 
-                # 调用进度回调，传递当前视频的发布结果
-                if progress_callback:
-                    progress_callback(i + 1, total, success_count, failed_count, current_success)
+                    if success:
+                        success_count += 1
+                        current_success = True
+                        self.index_published_tags(video_info)
+                    else:
+                        failed_count += 1
                 
-                # 发布间隔，避免频率过高
-                if i < total - 1:  # 不是最后一个视频
-                    print("⏳ 等待5秒后发布下一个视频...")
-                    import time
-                    time.sleep(5)
+                    # 调用进度回调，传递当前视频的发布结果
+                    if progress_callback:
+                        progress_callback(i + 1, total, success_count, failed_count, current_success)
                 
-            except Exception as e:
-                print(f"❌ 发布第 {i+1} 个视频时出错: {e}")
-                failed_count += 1
-                current_success = False
+                    # 发布间隔，避免频率过高
+                    if i < total - 1:  # 不是最后一个视频
+                        print("⏳ 等待5秒后发布下一个视频...")
+                        import time
+                        time.sleep(5)
+                
+                except Exception as e:
+                    print(f"❌ 发布第 {i+1} 个视频时出错: {e}")
+                    failed_count += 1
+                    current_success = False
                 
-                if progress_callback:
-                    progress_callback(i + 1, total, success_count, failed_count, current_success)
+                    if progress_callback:
+                        progress_callback(i + 1, total, success_count, failed_count, current_success)
+        finally:
+            # 提前结束（出错、中断）或有未使用的结果时，取消尚未开始的预处理任务
+            for future in prepared.values():
+                future.cancel()
         
         result = {
             "success": success_count,
@@ -186,23 +257,95 @@ class DouyinPublisher:
         print(f"📊 批量发布完成: 成功 {success_count} 个，失败 {failed_count} 个")
         return result
     
-    def extract_tags_from_description(self, description: str) -> List[str]:
+    def wait_prepared(self, future: Future, file_path: str) -> str:
+        """等待预处理结果，超过 wait_timeout 秒或预处理出错时使用原文件上传"""
+        try:
+            return future.result(timeout=self.preprocessor.wait_timeout)
+        except FutureTimeoutError:
+            # 已开始的ffmpeg任务继续完成并写入缓存，下次发布时直接使用
+            future.cancel()
+            print(f"⚠️ 视频预处理超过 {self.preprocessor.wait_timeout} 秒，使用原文件上传: {file_path}")
+        except CancelledError:
+            print(f"⚠️ 视频预处理已取消，使用原文件上传: {file_path}")
+        except Exception as e:
+            print(f"⚠️ 视频预处理失败，使用原文件上传: {e}")
+        return file_path
+    
+    def close(self):
+        """释放预处理进程池等资源，更新并保存标签索引"""
+        if self.preprocessor:
+            self.preprocessor.shutdown()
+        if self.tag_recommender:
+            self.flush_tag_index()
+            self.tag_recommender.save()
+    
+    def index_published_tags(self, video_info: Dict):
+        """记录发布成功的视频，close() 时加入标签索引，供之后的视频推荐标签
+
+        只索引作者或AI写在描述中的话题标签，默认标签和推荐出的标签不索引，避免推荐结果自我强化。
+        """
+        if not self.tag_recommender or video_info.get('video_id') is None:
+            return
+        description = video_info.get('description', '')
+        tags = extract_hashtags(description)
+        if tags:
+            self._pending_tag_index.append((video_info['video_id'],
+                                            video_text(video_info.get('name', ''), description), tags))
+    
+    def flush_tag_index(self):
+        """把已记录的视频加入标签索引（失败不影响发布）"""
+        items, self._pending_tag_index = self._pending_tag_index, []
+        if not items:
+            return
+        try:
+            self.tag_recommender.add_many(items)
+        except Exception as e:
+            print(f"⚠️ 更新标签索引失败: {e}")
+    
+    def suggest_tags(self, videos: List[Dict]):
+        """为描述中没有话题标签的视频批量推荐标签（嵌入向量合并请求），结果在 create_publish_info() 时使用
+
+        发布前调用一次，不在每个视频的发布过程中请求；推荐失败时这些视频使用默认标签。
+
+        Args:
+            videos: 数据库中的视频信息列表
+        """
+        if not self.tag_recommender:
+            return
+        pending = [video for video in videos
+                   if video.get('id') is not None and not extract_hashtags(video.get('description', ''))]
+        if not pending:
+            return
+        texts = [video_text(video.get('display_name', video.get('filename', '')), video.get('description', ''))
+                 for video in pending]
+        try:
+            suggestions = self.tag_recommender.suggest_many(texts)
+        except Exception as e:
+            print(f"⚠️ 推荐标签失败: {e}")
+            return
+        for video, tags in zip(pending, suggestions):
+            if tags:
+                self._suggested_tags[video['id']] = tags
+    
+    def extract_tags_from_description(self, description: str, suggested: Optional[List[str]] = None) -> List[str]:
         """
         从描述中提取标签
         
         Args:
             description: 视频描述
+            suggested: 描述中没有标签时使用的推荐标签（由 suggest_tags() 预先计算）
             
         Returns:
             List[str]: 标签列表
         """
         tags = []
         
-        # 简单的标签提取逻辑
-        # 查找#开头的标签
-        import re
-        hashtags = re.findall(r'#(\w+)', description)
-        tags.extend(hashtags)
+        # 查找#开头的标签（与AI生成时追加标签的格式一致）
+        tags.extend(extract_hashtags(description))
+        
+        # 没有标签时使用按相似的已发布视频推荐的标签
+        if not tags and suggested:
+            tags = list(suggested)
         
         # 如果没有找到标签，使用默认标签
         if not tags:
@@ -225,16 +368,23 @@ class DouyinPublisher:
         description = video_data.get('description', '')
         
         # 从描述中提取标签
-        tags = self.extract_tags_from_description(description)
+        tags = self.extract_tags_from_description(description, self._suggested_tags.get(video_data.get('id')))
+        
+        # 只使用后台预先生成的封面，未就绪时不设置封面
+        thumbnail_path = None
+        if self.cover_extractor and file_path:
+            thumbnail_path = self.cover_extractor.get_cached_cover(file_path)
         
         # 创建发布信息
         publish_info = {
+            'video_id': video_data.get('id'),
+            'name': title,
             'title': title+'\n\n'+description,
             'file_path': file_path,
             'description': description,
             'tags': tags,
             'publish_date': 0,  # 立即发布
-            'thumbnail_path': None  # 暂时不使用封面
+            'thumbnail_path': thumbnail_path
         }
         
         return publish_info
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体工具 - 内容指纹、ffmpeg定位、缓存目录与numpy按需导入
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from typing import Optional
+
+from config import config
+
+# 指纹采样块大小（头/中/尾各取一块）
+FINGERPRINT_SAMPLE_SIZE = 1024 * 1024
+
+# (路径, 大小, 修改时间) -> 指纹，避免同一文件在多个阶段重复读取
+_fingerprint_memo = {}
+_fingerprint_lock = threading.Lock()
+
+# numpy模块，首次调用 load_numpy() 时导入，未安装时为False
+_numpy = None
+
+
+def file_fingerprint(file_path: str, sample_size: int = FINGERPRINT_SAMPLE_SIZE) -> str:
+    """计算视频文件的内容指纹
+
+    对文件大小以及头、中、尾三段内容做哈希，避免对GB级视频做全量读取，
+    同一内容的文件无论路径如何都会得到相同的指纹。
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha1()
+    digest.update(str(size).encode("ascii"))
+
+    with open(file_path, "rb") as f:
+        if size <= sample_size * 3:
+            digest.update(f.read())
+        else:
+            for offset in (0, size // 2 - sample_size // 2, size - sample_size):
+                f.seek(offset)
+                digest.update(f.read(sample_size))
+
+    return digest.hexdigest()
+
+
+def cached_fingerprint(file_path: str) -> str:
+    """带内存缓存的内容指纹，文件大小或修改时间变化时重新计算"""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+    with _fingerprint_lock:
+        fingerprint = _fingerprint_memo.get(memo_key)
+    if fingerprint is None:
+        fingerprint = file_fingerprint(file_path)
+        with _fingerprint_lock:
+            _fingerprint_memo[memo_key] = fingerprint
+    return fingerprint
+
+
+def find_executable(name: str) -> Optional[str]:
+    """查找ffmpeg/ffprobe可执行文件，优先使用配置中的路径"""
+    configured = config.get(f"media.{name}_path", "")
+    if configured and os.path.exists(configured):
+        return configured
+    return shutil.which(name)
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """使用ffprobe获取视频时长（秒），失败时返回None"""
+    ffprobe = find_executable("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "json", file_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=30
+        )
+        return float(json.loads(result.stdout)["format"]["duration"])
+    except (subprocess.SubprocessError, OSError, ValueError, KeyError):
+        return None
+
+
+def get_cache_dir(name: str) -> str:
+    """获取（并创建）指定用途的缓存目录"""
+    root = config.get("media.cache_root", "cache")
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_numpy():
+    """按需导入numpy（避免拖慢程序启动），未安装时返回None"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def is_faststart_mp4(file_path: str) -> bool:
+    """检查MP4的moov是否位于mdat之前（faststart）
+
+    只遍历顶层box头，不读取媒体数据。
+    """
+    try:
+        with open(file_path, "rb") as f:
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return False
+                box_size, box_type = struct.unpack(">I4s", header)
+                if box_type == b"moov":
+                    return True
+                if box_type == b"mdat":
+                    return False
+
+                if box_size == 1:
+                    # 64位扩展长度
+                    box_size = struct.unpack(">Q", f.read(8))[0]
+                    f.seek(box_size - 16, os.SEEK_CUR)
+                elif box_size < 8:
+                    # 0表示box延伸到文件末尾，其余为非法长度
+                    return False
+                else:
+                    f.seek(box_size - 8, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return False
@@ -7,29 +7,342 @@ Ollama客户端 - 用于与qwen3:8b模型交互
 import requests
 import json
 import time
-from typing import Optional
+from typing import Callable, Dict, Iterator, List, Optional
 
-class OllamaClient:
-    """Ollama客户端类"""
-    
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "qwen3:8b"):
+from ai_cache import GenerationCache
+from ai_metrics import AIMetrics
+from ai_router import ModelRouter
+from ai_resilience import CircuitBreaker, OllamaError, OllamaUnavailableError, backoff_delay
+from ai_scheduler import AIScheduler, PRIORITY_NAMES
+from ai_singleflight import SingleFlight
+from config import config
+from prompt_templates import (AD_HOC_TEMPLATE_ID, BATCH_TITLE, CONTENT, DESCRIPTION, TITLE, PromptSet,
+                              normalize_hashtag, strip_think_tags)
+
+# 批量标题：每个标题预留的输出token数（估算每批数量用），以及提示词固定部分的token估算
+BATCH_TITLE_TOKENS = 40
+BATCH_PROMPT_OVERHEAD_TOKENS = 300
+# 同一视频在批量请求中最多尝试的次数，仍缺失时改为单独生成
+MAX_BATCH_ATTEMPTS = 2
+
+_DEFAULT_CACHE = object()
+
+
+class ThinkTagFilter:
+    """增量过滤流式输出中的 <think>…</think> 内容
+
+    标签可能被拆分在多个分片中，可能构成标签前缀的末尾字符会暂存到下一个分片再判断。
+    """
+
+    OPEN_TAG = '<think>'
+    CLOSE_TAG = '</think>'
+
+    def __init__(self):
+        self.buffer = ''
+        self.in_think = False
+
+    def feed(self, chunk: str) -> str:
+        """输入一个分片，返回可以显示的文本"""
+        self.buffer += chunk
+        visible = []
+        while self.buffer:
+            if self.in_think:
+                index = self.buffer.find(self.CLOSE_TAG)
+                if index < 0:
+                    # 思考内容直接丢弃，只保留可能是结束标签开头的部分
+                    self.buffer = self.buffer[-(len(self.CLOSE_TAG) - 1):]
+                    break
+                self.buffer = self.buffer[index + len(self.CLOSE_TAG):]
+                self.in_think = False
+                continue
+
+            open_index = self.buffer.find(self.OPEN_TAG)
+            close_index = self.buffer.find(self.CLOSE_TAG)
+            if open_index >= 0 and (close_index < 0 or open_index < close_index):
+                visible.append(self.buffer[:open_index])
+                self.buffer = self.buffer[open_index + len(self.OPEN_TAG):]
+                self.in_think = True
+            elif close_index >= 0:
+                # 单独的结束标签直接移除
+                visible.append(self.buffer[:close_index])
+                self.buffer = self.buffer[close_index + len(self.CLOSE_TAG):]
+            else:
+                keep = self._partial_tag_length(self.buffer)
+                visible.append(self.buffer[:len(self.buffer) - keep])
+                self.buffer = self.buffer[len(self.buffer) - keep:]
+                break
+        return ''.join(visible)
+
+    def flush(self) -> str:
+        """输出结束，返回暂存的文本"""
+        text = '' if self.in_think else self.buffer
+        self.buffer = ''
+        return text
+
+    def _partial_tag_length(self, text: str) -> int:
+        """末尾可能是标签开头的字符数"""
+        for length in range(min(len(text), len(self.CLOSE_TAG) - 1), 0, -1):
+            suffix = text[-length:]
+            if self.OPEN_TAG.startswith(suffix) or self.CLOSE_TAG.startswith(suffix):
+                return length
+        return 0
+
+
+class AdaptiveBatchSizer:
+    """批量标题请求的批大小（K）自适应
+
+    - 上限由上下文窗口决定：提示词中的文件名与输出的标题都要放进 context_window
+    - 单批耗时超过目标时按比例缩小，远低于目标时逐步增大
+    - 回答不完整时减半，减少模型漏答
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 50,
+                 target_latency: float = 20.0, context_window: int = 2048):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.context_window = context_window
+
+    def next_size(self, filenames: List[str]) -> int:
+        """按当前K和上下文窗口确定下一批的数量"""
+        budget = self.context_window - BATCH_PROMPT_OVERHEAD_TOKENS
+        count = 0
+        for filename in filenames[:self.size]:
+            # 中文文件名按每个字符约一个token保守估计
+            budget -= len(filename) + BATCH_TITLE_TOKENS
+            if budget < 0 and count >= self.minimum:
+                break
+            count += 1
+        return max(self.minimum, count)
+
+    def record(self, batch_size: int, latency: float, answered: int):
+        """记录一批的耗时和回答数量，调整K"""
+        if answered < batch_size:
+            self.size = max(self.minimum, batch_size // 2)
+        elif latency > self.target_latency:
+            self.size = max(self.minimum, int(batch_size * self.target_latency / latency))
+        elif latency < self.target_latency / 2 and batch_size >= self.size:
+            self.size = min(self.maximum, self.size + max(1, self.size // 2))
+
+
+class BaseOllamaClient:
+    """Ollama客户端公共部分：提示词、请求参数、结果解析与缓存，不涉及网络请求"""
+
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "qwen3:8b",
+                 cache=_DEFAULT_CACHE):
         self.base_url = base_url
         self.model = model
+        # 生成结果缓存，默认按配置创建，传入None时不使用缓存
+        if cache is _DEFAULT_CACHE:
+            cache = GenerationCache.from_config()
+        self.cache = cache
+        # 请求结束后模型在显存中保留的时间（如 "10m"），为None时使用服务端默认值
+        self.keep_alive = None
+        # 目标平台的提示词模板与结果清理规则
+        self.prompts = PromptSet.from_config()
+
+    def _build_payload(self, prompt: str, max_tokens: int, stream: bool, format: Optional[str] = None,
+                       model: Optional[str] = None) -> Dict:
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "num_predict": max_tokens,
+                "temperature": 0.3,
+                "top_p": 0.8,
+                "top_k": 40
+            }
+        }
+        if format:
+            payload["format"] = format
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def _request_key(self, payload: Dict) -> str:
+        """请求的唯一键，与是否流式无关，两种方式生成的结果可以互相复用
+
+        键中包含提示词的模板标识（平台/类型@版本），切换模板版本只影响该模板的缓存结果。
+        """
+        template_id = getattr(payload["prompt"], 'template_id', AD_HOC_TEMPLATE_ID)
+        return GenerationCache.make_key(payload["model"], template_id,
+                                        {"options": payload["options"], "format": payload.get("format")},
+                                        payload["prompt"])
+
+    def _cache_key(self, payload: Dict) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self._request_key(payload)
+
+    def _get_cached(self, cache_key: Optional[str], regenerate: bool,
+                    validate: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """读取缓存结果，validate 不接受的旧结果视为未命中"""
+        if not cache_key or regenerate:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None and validate is not None and not validate(cached):
+            return None
+        return cached
+
+    def _put_cached(self, cache_key: Optional[str], text: str, model: str,
+                    validate: Optional[Callable[[str], bool]] = None):
+        """写入缓存，只保存 validate 接受的结果（如能解析的JSON），避免之后的调用一直命中无效结果"""
+        if cache_key and text and (validate is None or validate(text)):
+            self.cache.put(cache_key, text, model)
+
+    def clean_think_tags(self, text: str) -> str:
+        """清理<think>标签"""
+        return strip_think_tags(text)
+
+    def build_title_prompt(self, filename: str, context: str = '') -> str:
+        """视频标题提示词，context 为视频内容（画面描述、语音转写）"""
+        return self.prompts.render(TITLE, context, filename=filename)
+
+    def clean_title(self, result: str) -> str:
+        """清理结果，只保留标题部分（按平台去掉引号、话题标签、emoji，并截断到字数限制）"""
+        return self.prompts.clean_title(result)
+
+    def build_batch_title_prompt(self, filenames: List[str]) -> str:
+        """多个视频标题一次生成的提示词"""
+        numbered = '\n'.join(f"{index}. {filename}" for index, filename in enumerate(filenames, 1))
+        return self.prompts.render(BATCH_TITLE, numbered=numbered)
+
+    def parse_batch_titles(self, text: Optional[str], count: int) -> Dict[int, str]:
+        """解析批量标题结果，返回 {序号(从0开始): 标题}，缺失或无效的条目不包含在内"""
+        if not text:
+            return {}
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return {}
+        items = data.get("titles") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return {}
+
+        titles = {}
+        for position, item in enumerate(items):
+            if isinstance(item, dict):
+                index, title = item.get("id"), item.get("title")
+                try:
+                    index = int(index) - 1
+                except (TypeError, ValueError):
+                    continue
+            else:
+                # 只有标题的数组按顺序对应
+                index, title = position, item
+            if not isinstance(title, str) or not 0 <= index < count:
+                continue
+            title = self.clean_title(title)
+            if title:
+                titles[index] = title
+        return titles
+
+    def batch_titles_validator(self, count: int) -> Callable[[str], bool]:
+        """批量标题结果的校验：每个文件名都有标题"""
+        return lambda text: len(self.parse_batch_titles(text, count)) == count
+
+    def build_description_prompt(self, filename: str, context: str = '') -> str:
+        """视频描述提示词"""
+        return self.prompts.render(DESCRIPTION, context, filename=filename)
+
+    def build_content_prompt(self, filename: str, context: str = '') -> str:
+        """标题、描述、话题标签合并生成的提示词"""
+        return self.prompts.render(CONTENT, context, filename=filename)
+
+    def parse_video_content(self, text: Optional[str]) -> Optional[Dict]:
+        """解析并校验合并生成的JSON结果，无效时返回None，超长内容按限制截断"""
+        if not text:
+            return None
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        title = data.get("title")
+        description = data.get("description")
+        if not isinstance(title, str) or not isinstance(description, str):
+            return None
+        title = self.clean_title(title)
+        description = self.prompts.clean_description(description)
+        if not title or not description:
+            return None
+
+        hashtags = []
+        raw_tags = data.get("hashtags") or []
+        if isinstance(raw_tags, str):
+            raw_tags = raw_tags.replace('#', ' ').split()
+        if isinstance(raw_tags, list):
+            for tag in raw_tags:
+                tag = normalize_hashtag(tag)
+                if tag and tag not in hashtags:
+                    hashtags.append(tag)
+
+        return {
+            "title": title,
+            "description": description,
+            "hashtags": hashtags[:self.prompts.profile.max_hashtags]
+        }
+
+    def content_validator(self, text: str) -> bool:
+        """合并生成结果的校验：能解析出标题和描述"""
+        return self.parse_video_content(text) is not None
+
+    @staticmethod
+    def append_hashtags(description: str, hashtags: List[str]) -> str:
+        """把话题标签以 #标签 的形式追加到描述末尾（发布时用 extract_hashtags 从描述中提取标签）"""
+        hashtags = [tag for tag in map(normalize_hashtag, hashtags) if tag]
+        if not hashtags:
+            return description
+        return f"{description} {' '.join('#' + tag for tag in hashtags)}"
+
+    def cache_stats(self) -> Optional[Dict]:
+        """生成结果缓存的统计信息，未启用缓存时返回None"""
+        return self.cache.stats() if self.cache is not None else None
+
+
+class OllamaClient(BaseOllamaClient):
+    """Ollama客户端类"""
+
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "qwen3:8b", pool_size: int = 10,
+                 cache=_DEFAULT_CACHE):
+        super().__init__(base_url, model, cache)
+        resilience_config = config.get_ai_resilience_config()
+        self.max_retries = resilience_config['max_retries']
+        self.retry_base_delay = resilience_config['retry_base_delay']
+        self.max_pause = resilience_config['max_pause']
+        # 同一客户端的所有请求（包括并发的工作线程）共用一个熔断器
+        self.circuit_breaker = CircuitBreaker.from_config()
+        # 编辑窗口与批量任务同时请求相同内容时只调用一次Ollama
+        self.singleflight = SingleFlight()
+        # 生成请求名额，交互请求优先于批量任务（批量任务在 scheduler.priority(PRIORITY_BATCH) 中调用）
+        self.scheduler = AIScheduler.from_config()
+        # 每次生成请求的延迟与token统计
+        self.metrics = AIMetrics.from_config()
+        # 批量任务积压较多或主模型过慢时，批量请求改用配置的小模型
+        self.router = ModelRouter.from_config(model, metrics=self.metrics, list_models=self.list_models)
         self.session = requests.Session()
-    
+        # 连接池大小需不小于并发请求数，否则多余的连接用完即关闭
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
     def check_connection(self) -> bool:
         """检查Ollama服务是否可用"""
         try:
-            response = self.session.get(f"{self.base_url}/api/tags")
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
             return response.status_code == 200
         except Exception as e:
             print(f"连接Ollama失败: {e}")
             return False
-    
+
     def check_model(self) -> bool:
         """检查模型是否可用"""
         try:
-            response = self.session.get(f"{self.base_url}/api/tags")
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
             if response.status_code == 200:
                 models = response.json().get("models", [])
                 model_names = [model["name"] for model in models]
@@ -38,97 +351,503 @@ class OllamaClient:
         except Exception as e:
             print(f"检查模型失败: {e}")
             return False
-    
-    def generate_text(self, prompt: str, max_tokens: int = 200) -> Optional[str]:
-        """生成文本"""
+
+    def list_models(self) -> Optional[List[str]]:
+        """获取已安装的模型名称列表，服务不可用时返回None"""
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
+            if response.status_code != 200:
+                return None
+            return [model["name"] for model in response.json().get("models", [])]
+        except Exception as e:
+            print(f"连接Ollama失败: {e}")
+            return None
+
+    def load_model(self, keep_alive, timeout: float = 120, model: Optional[str] = None) -> bool:
+        """加载模型（预热）或释放模型，model 为None时为主模型
+
+        发送不含提示词的生成请求，Ollama只加载模型而不生成内容；keep_alive 为0时立即释放模型。
+        """
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "num_predict": max_tokens,
-                    "temperature": 0.3,
-                    "top_p": 0.8,
-                    "top_k": 40
-                }
-            }
-            
             response = self.session.post(
                 f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=30
+                json={"model": model or self.model, "keep_alive": keep_alive},
+                timeout=timeout
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                response_text = result.get("response", "").strip()
-                # 清理<think>标签
-                return self.clean_think_tags(response_text)
-            else:
-                print(f"生成失败，状态码: {response.status_code}")
-                return None
-                
+            return response.status_code == 200
         except Exception as e:
-            print(f"生成文本时出错: {e}")
+            print(f"{'释放' if keep_alive == 0 else '加载'}模型失败: {e}")
+            return False
+
+    def post_generate(self, payload: Dict, stream: bool = False,
+                      scheduled: Optional[Dict] = None) -> requests.Response:
+        """发送生成请求，连接错误、超时和5xx错误按指数退避（随机抖动）重试
+
+        连续失败触发熔断后，请求会等待服务恢复（最长 max_pause 秒），而不是立即失败。
+        scheduled 的用法见 _post_with_retry。
+
+        Raises:
+            OllamaUnavailableError: 熔断等待超时，服务持续不可用
+            OllamaError: 重试后仍然失败，或请求本身有误（如模型不存在）
+        """
+        return self._post_with_retry("/api/generate", payload, stream, scheduled=scheduled)
+
+    def _post_with_retry(self, path: str, payload: Dict, stream: bool = False,
+                         timeout: Optional[float] = None, scheduled: Optional[Dict] = None) -> requests.Response:
+        """向 path 发送POST请求，重试与熔断规则同 post_generate
+
+        指定 timeout 时只发送一次、最多等待 timeout 秒，熔断中立即失败，用于不能阻塞调用方的请求。
+
+        scheduled 不为None时每次尝试前占用一个调度名额（key 为 scheduled['key']），失败后先归还再退避，
+        熔断等待和退避期间不占用名额；成功返回时名额仍被占用，由调用方归还。
+        scheduled 中写入 queue_wait（累计排队秒数）和 start（最后一次尝试的开始时间）。
+        """
+        retries = self.max_retries if timeout is None else 0
+        if timeout is None:
+            timeout = (5, 30) if stream else 30
+        last_error = None
+        for attempt in range(retries + 1):
+            if not self.circuit_breaker.wait_until_closed(self.max_pause if retries else 0):
+                raise OllamaUnavailableError(f"Ollama服务已连续 {self.max_pause:.0f} 秒不可用" if retries
+                                             else "Ollama服务不可用（熔断中）")
+            try:
+                if scheduled is not None:
+                    scheduled['queue_wait'] = (scheduled.get('queue_wait', 0.0) +
+                                               self.scheduler.acquire(key=scheduled.get('key')))
+                    scheduled['start'] = time.monotonic()
+                try:
+                    response = self.session.post(f"{self.base_url}{path}", json=payload,
+                                                 stream=stream, timeout=timeout)
+                    if response.status_code < 500:
+                        self.circuit_breaker.record_success()
+                        if response.status_code != 200:
+                            raise OllamaError(f"请求 {path} 失败，状态码: {response.status_code}",
+                                              response.status_code)
+                        return response
+                    response.close()
+                    last_error = OllamaError(f"请求 {path} 失败，状态码: {response.status_code}",
+                                             response.status_code)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    last_error = e
+                except BaseException:
+                    if scheduled is not None:
+                        self.scheduler.release()
+                    raise
+                if scheduled is not None:
+                    self.scheduler.release()
+                self.circuit_breaker.record_failure()
+            finally:
+                # 本次尝试是探测请求却没有得出结论（排队时被取消、其他异常）时重新打开熔断，其他请求不会一直等待
+                self.circuit_breaker.abandon_probe()
+
+            if attempt < retries:
+                delay = backoff_delay(attempt, self.retry_base_delay)
+                print(f"⚠️ 请求失败（{last_error}），{delay:.1f} 秒后重试（{attempt + 1}/{retries}）")
+                time.sleep(delay)
+        raise OllamaError(f"请求重试 {retries} 次后仍失败: {last_error}" if retries
+                          else f"请求 {path} 失败: {last_error}")
+
+    def embed(self, texts: List[str], model: str, timeout: Optional[float] = None) -> List[List[float]]:
+        """计算文本的嵌入向量，返回结果与 texts 一一对应
+
+        优先使用批量接口 /api/embed；旧版Ollama没有该接口（404）时改用 /api/embeddings 逐条计算。
+        指定 timeout 时每个请求只发送一次、最多等待 timeout 秒，不重试。
+
+        Raises:
+            OllamaError: 请求失败或返回的向量数量不符
+        """
+        if not texts:
+            return []
+        try:
+            response = self._post_with_retry("/api/embed", {"model": model, "input": list(texts)}, timeout=timeout)
+            embeddings = response.json().get("embeddings", [])
+        except OllamaError as e:
+            if e.status_code != 404 or isinstance(e, OllamaUnavailableError):
+                raise
+            embeddings = [self._post_with_retry("/api/embeddings", {"model": model, "prompt": text},
+                                                timeout=timeout).json().get("embedding", []) for text in texts]
+
+        if len(embeddings) != len(texts) or not all(embeddings):
+            raise OllamaError(f"嵌入向量数量不符：请求 {len(texts)} 条，返回 {len(embeddings)} 条")
+        return embeddings
+
+    def describe_image(self, image: str, prompt: str, model: str, max_tokens: int = 60) -> str:
+        """用多模态模型描述图片（base64编码），不使用生成结果缓存（由调用方缓存）
+
+        Raises:
+            OllamaError: 请求失败，模型未安装时 status_code 为404
+        """
+        payload = self._build_payload(prompt, max_tokens, stream=False, model=model)
+        payload["images"] = [image]
+        data = self._scheduled_generate(payload)
+        return self.clean_think_tags(data.get("response", ""))
+
+    def _scheduled_generate(self, payload: Dict, key: Optional[str] = None) -> Dict:
+        """占用调度名额发送非流式生成请求并记录指标，返回响应JSON
+
+        名额只在请求进行期间占用，重试退避和熔断等待期间让给其他请求；延迟只计最后一次尝试，不含排队。
+        """
+        scheduled = {'key': key}
+        try:
+            response = self.post_generate(payload, scheduled=scheduled)
+        except OllamaError:
+            self.metrics.record_error(payload["model"])
+            raise
+        try:
+            data = response.json()
+        except ValueError as e:
+            self.metrics.record_error(payload["model"])
+            raise OllamaError(f"无法解析Ollama响应: {e}")
+        finally:
+            self.scheduler.release()
+        self.metrics.record(payload["model"], time.monotonic() - scheduled['start'], data,
+                            priority=self._priority_name(), queue_wait=scheduled['queue_wait'])
+        return data
+
+    def select_model(self) -> str:
+        """按当前线程的优先级和批量积压选择模型，交互请求始终使用主模型"""
+        return self.router.choose(self.scheduler.current_priority())
+
+    def generate_text(self, prompt: str, max_tokens: int = 200, format: Optional[str] = None,
+                      regenerate: bool = False, model: Optional[str] = None,
+                      validate: Optional[Callable[[str], bool]] = None) -> str:
+        """生成文本，format 为 "json" 时要求模型输出JSON
+
+        相同的请求优先返回缓存结果；regenerate 为True时跳过缓存重新生成，并用新结果更新缓存。
+        validate 为结果校验（如JSON能否解析），只有通过校验的结果才写入缓存，缓存中未通过校验的结果视为未命中。
+        相同的请求正在进行时（如编辑窗口与批量任务同时生成）等待并共享其结果。
+        请求按当前线程的优先级排队等待名额，见 AIScheduler；model 为None时由 select_model() 选择。
+
+        Raises:
+            OllamaError: 请求重试后仍然失败，调用方不应把占位内容当作生成结果写入
+        """
+        payload = self._build_payload(prompt, max_tokens, stream=False, format=format,
+                                      model=model or self.select_model())
+
+        cache_key = self._cache_key(payload)
+        cached = self._get_cached(cache_key, regenerate, validate)
+        if cached is not None:
+            return cached
+
+        flight_key = self._request_key(payload)
+        # 交互请求等待排队中的相同批量请求时，把该请求提升为交互优先级
+        return self.singleflight.do(flight_key,
+                                    lambda: self._generate_uncached(payload, cache_key, flight_key, validate),
+                                    on_join=lambda: self.scheduler.promote(flight_key))
+
+    def _generate_uncached(self, payload: Dict, cache_key: Optional[str], flight_key: str,
+                           validate: Optional[Callable[[str], bool]] = None) -> str:
+        """占用名额发送生成请求，记录指标并写入缓存"""
+        data = self._scheduled_generate(payload, flight_key)
+
+        # 清理<think>标签
+        text = self.clean_think_tags(data.get("response", "").strip())
+        self._put_cached(cache_key, text, payload["model"], validate)
+        return text
+
+    def stream_text(self, prompt: str, max_tokens: int = 200,
+                    should_stop: Optional[Callable[[str], bool]] = None,
+                    regenerate: bool = False, model: Optional[str] = None) -> Iterator[str]:
+        """流式生成文本，逐段返回已过滤<think>内容的文本，连接失败时抛出 OllamaError
+
+        Args:
+            prompt: 提示词
+            max_tokens: 最大生成token数
+            should_stop: 接收当前累计文本，返回True时提前结束请求（如标题已换行或超出字数）
+            regenerate: 跳过缓存重新生成
+
+        缓存命中时一次性返回缓存结果；只有模型输出完毕的完整结果写入缓存，
+        提前结束（should_stop）的部分结果不写入，以免之后相同的非流式请求取到截断的文本。
+        相同的流式请求正在进行时不再发送，等待其结果后一次性返回；该请求没有完整输出时等待方抛出 OllamaError。
+        """
+        payload = self._build_payload(prompt, max_tokens, stream=True, model=model or self.select_model())
+        cache_key = self._cache_key(payload)
+        cached = self._get_cached(cache_key, regenerate)
+        if cached is not None:
+            yield cached
+            return
+
+        # 流式请求可能提前结束，只与相同的流式请求合并，不与非流式请求共享结果
+        flight_key = self._request_key(payload) + ':stream'
+        call, leader = self.singleflight.begin(flight_key)
+        if not leader:
+            self.scheduler.promote(flight_key)
+            yield self.singleflight.wait(call)
+            return
+
+        think_filter = ThinkTagFilter()
+        text = ''
+        # 模型输出完毕（收到 done），提前结束时为False
+        complete = False
+        error = None
+        last_data = None
+        scheduled = {'key': flight_key}
+        try:
+            # 建立连接阶段按 post_generate 的策略重试（退避期间不占用名额）；
+            # 开始输出后出错则保留已生成的部分（不写入缓存）
+            response = self.post_generate(payload, stream=True, scheduled=scheduled)
+        except Exception as e:
+            self.metrics.record_error(payload["model"])
+            self.singleflight.finish(flight_key, call, error=e)
+            raise
+        # 连接成功后名额一直占用到输出结束
+        start, queue_wait = scheduled['start'], scheduled['queue_wait']
+        try:
+            with response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    piece = think_filter.feed(data.get("response", ""))
+                    if data.get("done"):
+                        # 最后一条响应包含 eval_count 等统计
+                        last_data = data
+                        piece += think_filter.flush()
+                    if not text:
+                        piece = piece.lstrip()
+                    if piece:
+                        text += piece
+                        yield piece
+                    if data.get("done"):
+                        complete = True
+                        break
+                    if should_stop and should_stop(text):
+                        # 提前结束时关闭连接，Ollama随即停止生成
+                        break
+        except Exception as e:
+            print(f"流式生成文本时出错: {e}")
+            error = e
+        finally:
+            self.scheduler.release()
+            if error is not None:
+                self.metrics.record_error(payload["model"])
+            elif complete:
+                self.metrics.record(payload["model"], time.monotonic() - start, last_data,
+                                    priority=self._priority_name(), queue_wait=queue_wait, stream=True)
+            else:
+                # 提前结束或调用方中途停止读取，耗时不代表完整生成，不计入延迟统计
+                self.metrics.record_incomplete(payload["model"])
+            # 调用方中途停止读取时也要唤醒等待同一请求的其他调用方，只有完整的输出才共享给它们
+            if complete and text.strip():
+                self.singleflight.finish(flight_key, call, result=text.strip())
+            else:
+                self.singleflight.finish(flight_key, call, error=error or OllamaError("流式生成未完成，没有完整结果"))
+
+        text = text.strip()
+        if cache_key and text and complete:
+            self.cache.put(cache_key, text, payload["model"])
+
+    def _priority_name(self) -> str:
+        return PRIORITY_NAMES.get(self.scheduler.current_priority(), 'batch')
+
+    def generate_video_title(self, filename: str, description: str = "", regenerate: bool = False,
+                             model: Optional[str] = None, context: str = '') -> str:
+        """生成视频标题
+
+        Raises:
+            OllamaError: 请求失败或模型没有给出标题，调用方把视频保留在AI队列中，不写入占位标题
+        """
+        title = self._generate_title(filename, regenerate=regenerate, model=model, context=context)
+        if not title:
+            raise OllamaError(f"模型没有给出标题: {filename}")
+        return title
+
+    def _generate_title(self, filename: str, regenerate: bool = False, model: Optional[str] = None,
+                        context: str = '') -> Optional[str]:
+        """单独生成一个标题，模型没有给出标题时返回None"""
+        result = self.generate_text(self.build_title_prompt(filename, context),
+                                    max_tokens=self.prompts.max_tokens(TITLE),
+                                    regenerate=regenerate, model=model)
+        title = self.clean_title(result) if result else ''
+        return title or None
+
+    def stream_video_title(self, filename: str, on_text: Callable[[str], None],
+                           regenerate: bool = False, context: str = '') -> str:
+        """流式生成视频标题，每收到一段文本调用 on_text(当前累计文本)，返回最终标题
+
+        标题出现换行或超出字数限制后立即结束请求。批量任务正在为同一视频合并生成内容时直接使用其结果。
+
+        Raises:
+            OllamaError: 请求失败或模型没有给出标题
+        """
+        shared = None if regenerate else self._inflight_content(filename, context)
+        if shared:
+            on_text(shared["title"])
+            return shared["title"]
+
+        def should_stop(text):
+            text = text.strip()
+            return '\n' in text or len(text) > self.prompts.profile.title_max
+
+        text = ''
+        for piece in self.stream_text(self.build_title_prompt(filename, context),
+                                      max_tokens=self.prompts.max_tokens(TITLE),
+                                      should_stop=should_stop, regenerate=regenerate):
+            text += piece
+            on_text(text)
+
+        title = self.clean_title(text.strip().split('\n')[0])
+        if not title:
+            raise OllamaError(f"模型没有给出标题: {filename}")
+        return title
+
+    def generate_video_titles(self, filenames: List[str], sizer: Optional[AdaptiveBatchSizer] = None,
+                              on_result: Optional[Callable[[int, str], None]] = None,
+                              regenerate: bool = False, model: Optional[str] = None) -> List[Optional[str]]:
+        """批量生成视频标题，一次请求包含多个文件名，返回与文件名一一对应的标题
+
+        每批的数量由 sizer 自适应调整；回答中缺失的文件名单独重新请求（只请求缺失的部分），
+        多次缺失后改为单个生成，单个生成仍没有标题时对应位置为None，不调用 on_result。
+
+        Args:
+            filenames: 视频文件名列表
+            sizer: 批大小控制，默认按配置的上下文窗口创建
+            on_result: 每个标题确定后的回调，接收参数：(序号, 标题)
+            regenerate: 跳过缓存重新生成
+            model: 使用的模型，为None时由 select_model() 选择（整个批次使用同一个模型）
+        """
+        model = model or self.select_model()
+        if sizer is None:
+            sizer = AdaptiveBatchSizer(context_window=config.get('ai.context_window', 2048))
+        titles = [None] * len(filenames)
+        attempts = [0] * len(filenames)
+        pending = list(range(len(filenames)))
+
+        def finish(index, title):
+            titles[index] = title
+            if on_result and title:
+                on_result(index, title)
+
+        while pending:
+            batch = pending[:sizer.next_size([filenames[index] for index in pending])]
+            pending = pending[len(batch):]
+
+            if len(batch) == 1 and attempts[batch[0]] >= MAX_BATCH_ATTEMPTS - 1:
+                index = batch[0]
+                finish(index, self._generate_title(filenames[index], regenerate=regenerate, model=model))
+                continue
+
+            batch_names = [filenames[index] for index in batch]
+            start = time.monotonic()
+            # 只缓存每个文件名都有标题的回答，重新请求缺失部分时不会命中残缺的结果
+            text = self.generate_text(self.build_batch_title_prompt(batch_names),
+                                      max_tokens=self.prompts.max_tokens(BATCH_TITLE) * len(batch) + 50,
+                                      format="json", regenerate=regenerate, model=model,
+                                      validate=self.batch_titles_validator(len(batch)))
+            answered = self.parse_batch_titles(text, len(batch))
+            sizer.record(len(batch), time.monotonic() - start, len(answered))
+
+            retry = []
+            for position, index in enumerate(batch):
+                if position in answered:
+                    finish(index, answered[position])
+                    continue
+                attempts[index] += 1
+                if attempts[index] >= MAX_BATCH_ATTEMPTS:
+                    finish(index, self._generate_title(filenames[index], regenerate=regenerate, model=model))
+                else:
+                    retry.append(index)
+            if retry:
+                print(f"⚠️ 批量标题缺少 {len(retry)} 个，重新请求")
+            pending = retry + pending
+
+        return titles
+
+    def generate_video_description(self, filename: str, title: str = "", regenerate: bool = False,
+                                   model: Optional[str] = None, context: str = '') -> str:
+        """生成视频描述
+
+        Raises:
+            OllamaError: 请求失败或模型没有给出描述，调用方把视频保留在AI队列中，不写入占位描述
+        """
+        result = self.generate_text(self.build_description_prompt(filename, context),
+                                    max_tokens=self.prompts.max_tokens(DESCRIPTION), regenerate=regenerate, model=model)
+        description = self.prompts.clean_description(result) if result else ''
+        if not description:
+            raise OllamaError(f"模型没有给出描述: {filename}")
+        return description
+
+    def stream_video_description(self, filename: str, on_text: Callable[[str], None],
+                                 regenerate: bool = False, context: str = '') -> str:
+        """流式生成视频描述，每收到一段文本调用 on_text(当前累计文本)，返回最终描述
+
+        描述超出字数限制或出现空行（开始输出其他内容）后立即结束请求。批量任务正在为同一视频合并生成内容时直接使用其结果。
+
+        Raises:
+            OllamaError: 请求失败或模型没有给出描述
+        """
+        shared = None if regenerate else self._inflight_content(filename, context)
+        if shared:
+            on_text(shared["description"])
+            return shared["description"]
+
+        def should_stop(text):
+            text = text.strip()
+            return '\n\n' in text or len(text) > self.prompts.profile.description_max
+
+        text = ''
+        for piece in self.stream_text(self.build_description_prompt(filename, context),
+                                      max_tokens=self.prompts.max_tokens(DESCRIPTION),
+                                      should_stop=should_stop, regenerate=regenerate):
+            text += piece
+            on_text(text)
+
+        description = self.prompts.clean_description(text.strip().split('\n\n')[0])
+        if not description:
+            raise OllamaError(f"模型没有给出描述: {filename}")
+        return description
+
+    def _inflight_content(self, filename: str, context: str = '') -> Optional[Dict]:
+        """同一视频的合并生成请求（主模型或小模型）正在进行时等待并返回其解析结果，没有进行中的请求或请求失败时返回None"""
+        call = None
+        for model in filter(None, (self.model, self.router.bulk_model)):
+            payload = self._build_payload(self.build_content_prompt(filename, context),
+                                          self.prompts.max_tokens(CONTENT),
+                                          stream=False, format="json", model=model)
+            flight_key = self._request_key(payload)
+            call = self.singleflight.join(flight_key)
+            if call is not None:
+                break
+        if call is None:
             return None
-    
-    def clean_think_tags(self, text: str) -> str:
-        """清理<think>标签"""
-        import re
-        # 移除<think>...</think>标签及其内容
-        text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
-        # 移除单独的<think>标签
-        text = re.sub(r'<think>', '', text)
-        text = re.sub(r'</think>', '', text)
-        return text.strip()
-    
-    def generate_video_title(self, filename: str, description: str = "") -> str:
-        """生成视频标题"""
-        prompt = f"""请用中文生成一个吸引人的视频标题，不要思考，直接输出。
-
-视频文件名：{filename}
-要求：
-1. 必须使用中文
-2. 标题要简洁明了，不超过20个字
-3. 要有吸引力，适合在短视频平台发布
-4. 不要包含特殊符号或emoji
-5. 直接输出标题，不要其他内容
-
-中文标题："""
-        
-        result = self.generate_text(prompt, max_tokens=50)
+        self.scheduler.promote(flight_key)
+        try:
+            return self.parse_video_content(self.singleflight.wait(call))
+        except Exception:
+            return None
+
+    def generate_video_content(self, filename: str, regenerate: bool = False, model: Optional[str] = None,
+                               context: str = '') -> Dict:
+        """一次请求同时生成标题、描述和话题标签
+
+        使用JSON输出格式，解析失败时退回分别生成标题和描述（此时没有话题标签）。
+        context 为视频内容（画面描述、语音转写），为空时只根据文件名生成。
+
+        Returns:
+            Dict: title、description、hashtags（不含#的标签列表）、model（生成使用的模型）
+
+        Raises:
+            OllamaError: 请求失败，或分别生成时模型仍没有给出标题或描述
+        """
+        prompt = self.build_content_prompt(filename, context)
+        model = model or self.select_model()
+
+        result = self.parse_video_content(
+            self.generate_text(prompt, max_tokens=self.prompts.max_tokens(CONTENT), format="json",
+                               regenerate=regenerate, model=model, validate=self.content_validator))
         if result:
-            # 清理结果，只保留标题部分
-            result = result.strip()
-            # 移除可能的引号
-            if result.startswith('"') and result.endswith('"'):
-                result = result[1:-1]
-            if result.startswith("'") and result.endswith("'"):
-                result = result[1:-1]
+            result["model"] = model
             return result
-        else:
-            return f"AI生成标题_{filename}"
-    
-    def generate_video_description(self, filename: str, title: str = "") -> str:
-        """生成视频描述"""
-        prompt = f"""请用中文生成一个吸引人的视频描述，不要思考，直接输出。
-
-视频文件名：{filename}
-要求：
-1. 必须使用中文
-2. 描述要简洁有趣，不超过100字
-3. 要有吸引力，适合在短视频平台发布
-4. 直接输出描述，不要其他内容
-
-中文描述："""
-        
-        result = self.generate_text(prompt, max_tokens=150)
-        if result:
-            return result.strip()
-        else:
-            return f"这是一个关于{filename}的精彩视频，内容有趣，值得观看。"
-    
+
+        print(f"⚠️ 合并生成结果无法解析，改为分别生成: {filename}")
+        return {
+            "title": self.generate_video_title(filename, regenerate=regenerate, model=model, context=context),
+            "description": self.generate_video_description(filename, regenerate=regenerate, model=model,
+                                                           context=context),
+            "hashtags": [],
+            "model": model
+        }
+
     def test_connection(self) -> dict:
         """测试连接和模型"""
         result = {
@@ -138,13 +857,14 @@ class OllamaClient:
             "base_url": self.base_url
         }
         
-        # 测试连接
-        if self.check_connection():
+        # 测试连接（连接与模型检查共用一次 /api/tags 请求）
+        models = self.list_models()
+        if models is not None:
             result["connection"] = True
             print("✅ Ollama服务连接成功")
             
             # 测试模型
-            if self.check_model():
+            if self.model in models:
                 result["model_available"] = True
                 print(f"✅ 模型 {self.model} 可用")
             else:
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ollama会话管理
+缓存服务健康状态，批量生成前预热模型并在期间保持加载，结束后释放显存
+"""
+
+import contextlib
+import threading
+import time
+from typing import Dict, Optional
+
+from config import config
+
+
+class OllamaSession:
+    """Ollama会话管理
+
+    - 健康状态（连接与模型列表）按TTL缓存，频繁检查只请求一次 /api/tags
+    - batch() 开始时预热模型（keep_alive），期间所有请求都携带 keep_alive，
+      避免大批量生成中途因空闲超时卸载模型；批量任务改用小模型时同样预热小模型
+    - 最后一个批次结束并空闲 release_idle_seconds 秒后释放预热过的所有模型（可配置），期间开始的新批次继续使用已加载的模型，
+      守护进程的每一轮、后台预生成的每一小批不会反复加载和释放
+
+    可在多个线程中共用。
+    """
+
+    def __init__(self, client, ttl: Optional[float] = None, keep_alive: Optional[str] = None,
+                 release_after_batch: Optional[bool] = None, release_idle_seconds: Optional[float] = None):
+        """
+        Args:
+            client: OllamaClient
+            ttl: 健康状态缓存秒数
+            keep_alive: 批量期间模型保持加载的时间，如 "10m"
+            release_after_batch: 批量结束后是否释放模型
+            release_idle_seconds: 最后一个批次结束后空闲多少秒再释放，0表示立即释放
+        """
+        session_config = config.get_ollama_session_config()
+        self.client = client
+        self.ttl = ttl if ttl is not None else session_config['health_ttl']
+        self.keep_alive = keep_alive if keep_alive is not None else session_config['keep_alive']
+        self.release_after_batch = (release_after_batch if release_after_batch is not None
+                                    else session_config['release_after_batch'])
+        self.release_idle_seconds = (release_idle_seconds if release_idle_seconds is not None
+                                     else session_config['release_idle_seconds'])
+
+        self._lock = threading.Lock()
+        self._health = None
+        self._checked_at = 0.0
+        self._active_batches = 0
+        self._release_timer = None
+        # 已预热、批量结束后需要释放的模型
+        self._loaded_models = set()
+
+    def health(self, force: bool = False) -> Dict:
+        """服务健康状态，格式与 OllamaClient.test_connection 相同，TTL内直接返回缓存结果"""
+        with self._lock:
+            if not force and self._health is not None and time.monotonic() - self._checked_at < self.ttl:
+                return dict(self._health)
+
+        health = self.client.test_connection()
+        with self._lock:
+            self._health = health
+            self._checked_at = time.monotonic()
+        return dict(health)
+
+    def is_available(self, force: bool = False) -> bool:
+        """服务已连接且模型可用"""
+        health = self.health(force)
+        return health["connection"] and health["model_available"]
+
+    def invalidate(self):
+        """清除缓存的健康状态（如请求失败后），下次检查重新请求"""
+        with self._lock:
+            self._health = None
+
+    def warm_up(self, model: Optional[str] = None) -> bool:
+        """预热：加载模型（为None时为主模型）并按 keep_alive 保持加载"""
+        model = model or self.client.model
+        start = time.monotonic()
+        loaded = self.client.load_model(self.keep_alive, model=model)
+        if loaded:
+            with self._lock:
+                self._loaded_models.add(model)
+            print(f"🔥 模型 {model} 已加载（{time.monotonic() - start:.1f}秒）")
+        else:
+            self.invalidate()
+        return loaded
+
+    def release(self) -> bool:
+        """释放预热过的模型（没有预热记录时释放主模型）占用的显存"""
+        with self._lock:
+            models = sorted(self._loaded_models) or [self.client.model]
+            self._loaded_models = set()
+        released = True
+        for model in models:
+            if self.client.load_model(0, timeout=10, model=model):
+                print(f"💤 模型 {model} 已释放")
+            else:
+                released = False
+        return released
+
+    def _bulk_model_used(self, model: str):
+        """批量任务改用小模型时预热，每个模型在释放前只预热一次"""
+        with self._lock:
+            if not self._active_batches or model in self._loaded_models:
+                return
+            # 先记录，避免多个工作线程同时预热；预热失败时仍在批量结束后释放
+            self._loaded_models.add(model)
+        self.warm_up(model)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """批量生成期间的上下文：进入时预热，退出时（没有其他批次时）安排空闲后释放"""
+        with self._lock:
+            self._active_batches += 1
+            first = self._active_batches == 1
+            # 等待释放期间开始的新批次，模型仍在加载中，不需要重新预热
+            reused = self._cancel_release()
+            router = getattr(self.client, 'router', None)
+            if first:
+                self.client.keep_alive = self.keep_alive
+                if router is not None:
+                    router.on_bulk_model = self._bulk_model_used
+        try:
+            if first and not reused:
+                self.warm_up()
+            yield self
+        finally:
+            with self._lock:
+                self._active_batches -= 1
+                last = self._active_batches == 0
+                if last:
+                    self.client.keep_alive = None
+                    if router is not None and router.on_bulk_model == self._bulk_model_used:
+                        router.on_bulk_model = None
+                    if self.release_after_batch and self.release_idle_seconds > 0:
+                        self._release_timer = threading.Timer(self.release_idle_seconds, self._release_if_idle)
+                        self._release_timer.daemon = True
+                        self._release_timer.start()
+            if last and self.release_after_batch and self.release_idle_seconds <= 0:
+                self.release()
+
+    def _cancel_release(self) -> bool:
+        """取消等待中的释放，返回是否有等待中的释放（调用方需持有锁）"""
+        if self._release_timer is None:
+            return False
+        self._release_timer.cancel()
+        self._release_timer = None
+        return True
+
+    def _release_if_idle(self):
+        with self._lock:
+            if self._active_batches or self._release_timer is None:
+                return
+            self._release_timer = None
+        self.release()
+
+    def close(self):
+        """程序退出前调用：有等待中的释放时立即释放模型"""
+        with self._lock:
+            pending = self._cancel_release()
+        if pending:
+            self.release()
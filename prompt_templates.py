@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提示词模板
+按平台区分、带版本号的提示词模板，以及预编译的生成结果过滤规则
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from config import config
+
+# 模板类型
+TITLE = 'title'
+BATCH_TITLE = 'batch_title'
+DESCRIPTION = 'description'
+CONTENT = 'content'
+TEMPLATE_KINDS = (TITLE, BATCH_TITLE, DESCRIPTION, CONTENT)
+
+# 各平台通用的模板登记在该平台名下，平台没有专用模板时使用
+DEFAULT_PLATFORM = '*'
+
+# 未通过模板生成的提示词在缓存键中使用的模板标识
+AD_HOC_TEMPLATE_ID = 'ad-hoc@1'
+
+# 生成结果过滤规则，模块加载时编译一次
+THINK_BLOCK_PATTERN = re.compile(r'<think>.*?</think>', re.DOTALL)
+THINK_TAG_PATTERN = re.compile(r'</?think>')
+HASHTAG_PATTERN = re.compile(r'#\S+')
+# 话题标签在描述中以 "#标签" 的形式出现，标签以空白、#或句读符号结束；
+# 追加标签时先按同样的规则清理（normalize_hashtag），提取结果与追加的标签一致
+HASHTAG_SEPARATORS = '#，。！？、；：,!?;'
+HASHTAG_TAG_PATTERN = re.compile(r'#([^\s' + re.escape(HASHTAG_SEPARATORS) + r']+)')
+HASHTAG_SEPARATOR_PATTERN = re.compile(r'[\s' + re.escape(HASHTAG_SEPARATORS) + r']+')
+EMOJI_PATTERN = re.compile('[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TITLE_QUOTES = '"\'“”‘’「」『』《》'
+
+# 有视频内容（画面描述、语音转写）时插入到文件名之后，没有时模板渲染结果不变
+CONTEXT_LINE = "\n视频内容（根据画面和语音整理，仅供参考）：\n{context}"
+
+
+def strip_think_tags(text: str) -> str:
+    """移除 <think>…</think> 内容和单独的标签"""
+    return THINK_TAG_PATTERN.sub('', THINK_BLOCK_PATTERN.sub('', text)).strip()
+
+
+def normalize_hashtag(tag: str) -> str:
+    """去掉标签中的空白、#和句读符号，使其在描述中能被完整提取"""
+    return HASHTAG_SEPARATOR_PATTERN.sub('', str(tag))
+
+
+def extract_hashtags(text: str) -> List[str]:
+    """提取描述中的话题标签（不含#，去重并保持顺序）"""
+    tags = []
+    for tag in HASHTAG_TAG_PATTERN.findall(text or ''):
+        if tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+class Prompt(str):
+    """渲染后的提示词，与普通字符串用法相同，额外带有模板标识（平台/类型@版本），用于生成结果的缓存键"""
+
+    def __new__(cls, text: str, template_id: str = AD_HOC_TEMPLATE_ID):
+        prompt = super().__new__(cls, text)
+        prompt.template_id = template_id
+        return prompt
+
+
+class PlatformProfile:
+    """平台的内容限制与风格"""
+
+    def __init__(self, name: str, label: str, title_max: int, description_max: int, max_hashtags: int,
+                 style: str, title_rule: str, allow_emoji: bool = False):
+        """
+        Args:
+            name: 平台标识（douyin/channels/xhs）
+            label: 平台名称
+            title_max: 标题最大字数
+            description_max: 描述最大字数
+            max_hashtags: 话题标签最大数量
+            style: 提示词中的风格要求
+            title_rule: 提示词中对标题符号的要求
+            allow_emoji: 标题是否保留emoji
+        """
+        self.name = name
+        self.label = label
+        self.title_max = title_max
+        self.description_max = description_max
+        self.max_hashtags = max_hashtags
+        self.style = style
+        self.title_rule = title_rule
+        # 标题的过滤规则：去掉话题标签、（按平台）去掉emoji、合并空白
+        self.title_filters = [(HASHTAG_PATTERN, '')]
+        if not allow_emoji:
+            self.title_filters.append((EMOJI_PATTERN, ''))
+        self.title_filters.append((WHITESPACE_PATTERN, ' '))
+
+    def values(self) -> Dict:
+        """模板中可用的平台变量"""
+        return {'platform': self.label, 'title_max': self.title_max, 'description_max': self.description_max,
+                'max_hashtags': self.max_hashtags, 'style': self.style, 'title_rule': self.title_rule}
+
+
+PLATFORMS = {
+    'douyin': PlatformProfile('douyin', '抖音', title_max=30, description_max=100, max_hashtags=5,
+                              style='要有吸引力，适合在抖音发布', title_rule='不要包含特殊符号或emoji'),
+    'channels': PlatformProfile('channels', '微信视频号', title_max=16, description_max=100, max_hashtags=3,
+                                style='语气平实可信，适合在微信视频号发布', title_rule='不要包含特殊符号或emoji'),
+    'xhs': PlatformProfile('xhs', '小红书', title_max=20, description_max=300, max_hashtags=8,
+                           style='小红书笔记风格，口语化、有分享感', title_rule='可以在末尾使用1个emoji，不要包含其他特殊符号',
+                           allow_emoji=True),
+}
+
+
+class PromptTemplate:
+    """一个版本的提示词模板
+
+    模板文本使用 str.format 语法，可用变量为平台变量（见 PlatformProfile.values）和渲染时传入的变量。
+    修改已有模板时应登记新版本，而不是直接修改文本：旧版本的缓存结果保留，可以通过配置切换回去对比。
+    """
+
+    def __init__(self, kind: str, version: int, text: str, max_tokens: int, platform: str = DEFAULT_PLATFORM):
+        """
+        Args:
+            kind: 模板类型（title/batch_title/description/content）
+            version: 版本号
+            text: 模板文本
+            max_tokens: 生成时的最大输出token数（批量标题为每个标题的token数）
+            platform: 专用平台，DEFAULT_PLATFORM 表示通用模板
+        """
+        self.kind = kind
+        self.version = version
+        self.text = text
+        self.max_tokens = max_tokens
+        self.platform = platform
+
+    def template_id(self, platform: str) -> str:
+        """模板标识，与平台、类型、版本对应，作为生成结果缓存键的一部分"""
+        return f"{platform}/{self.kind}@{self.version}"
+
+    def render(self, profile: PlatformProfile, **values) -> Prompt:
+        """渲染提示词"""
+        return Prompt(self.text.format(**profile.values(), **values), self.template_id(profile.name))
+
+
+# 模板登记表：{(平台, 类型): {版本: 模板}}
+TEMPLATES = {}
+
+
+def register_template(template: PromptTemplate) -> PromptTemplate:
+    """登记模板，同一平台、类型、版本只能登记一次"""
+    versions = TEMPLATES.setdefault((template.platform, template.kind), {})
+    if template.version in versions:
+        raise ValueError(f"模板已登记: {template.template_id(template.platform)}")
+    versions[template.version] = template
+    return template
+
+
+def get_template(kind: str, platform: str, version: Optional[int] = None) -> PromptTemplate:
+    """查找模板：优先使用平台专用模板，没有时使用通用模板；未指定版本或版本不存在时使用最新版本"""
+    versions = TEMPLATES.get((platform, kind)) or TEMPLATES.get((DEFAULT_PLATFORM, kind))
+    if not versions:
+        raise KeyError(f"没有 {kind} 类型的提示词模板")
+    if version is not None:
+        if version in versions:
+            return versions[version]
+        print(f"⚠️ 提示词模板 {platform}/{kind} 没有版本 {version}，使用最新版本")
+    return versions[max(versions)]
+
+
+register_template(PromptTemplate(TITLE, 1, """请用中文生成一个吸引人的视频标题，不要思考，直接输出。
+
+视频文件名：{filename}{context}
+要求：
+1. 必须使用中文
+2. 标题要简洁明了，不超过{title_max}个字
+3. {style}
+4. {title_rule}
+5. 直接输出标题，不要其他内容
+
+中文标题：""", max_tokens=60))
+
+register_template(PromptTemplate(TITLE, 1, """请用中文为微信视频号视频生成一个短标题，不要思考，直接输出。
+
+视频文件名：{filename}{context}
+要求：
+1. 必须使用中文
+2. 短标题6到{title_max}个字，概括视频内容，不要只有感叹
+3. {style}
+4. {title_rule}
+5. 直接输出短标题，不要其他内容
+
+短标题：""", max_tokens=40, platform='channels'))
+
+register_template(PromptTemplate(BATCH_TITLE, 1, """请为下面每个视频文件名分别生成一个吸引人的中文视频标题，不要思考，直接输出JSON。
+
+视频文件名：
+{numbered}
+
+要求：
+1. 必须使用中文
+2. 每个标题简洁明了，不超过{title_max}个字
+3. {style}
+4. {title_rule}
+5. 每个文件名都必须有一个标题，id 与文件名的序号一致
+
+输出格式：{{"titles": [{{"id": 1, "title": "标题"}}, {{"id": 2, "title": "标题"}}]}}""", max_tokens=40))
+
+register_template(PromptTemplate(DESCRIPTION, 1, """请用中文生成一个吸引人的视频描述，不要思考，直接输出。
+
+视频文件名：{filename}{context}
+要求：
+1. 必须使用中文
+2. 描述要简洁有趣，不超过{description_max}字
+3. {style}
+4. 直接输出描述，不要其他内容
+
+中文描述：""", max_tokens=150))
+
+register_template(PromptTemplate(DESCRIPTION, 1, """请用中文为这个视频写一篇小红书笔记正文，不要思考，直接输出。
+
+视频文件名：{filename}{context}
+要求：
+1. 必须使用中文
+2. 正文不超过{description_max}字，可以分成2到3个短段落
+3. {style}，可以适当使用emoji
+4. 不要写标题和话题标签，直接输出正文
+
+笔记正文：""", max_tokens=400, platform='xhs'))
+
+register_template(PromptTemplate(CONTENT, 1, """请根据视频文件名，用中文生成短视频的标题、描述和话题标签，不要思考，直接输出JSON。
+
+视频文件名：{filename}{context}
+要求：
+1. 必须使用中文
+2. title：标题简洁明了，不超过{title_max}个字，{title_rule}
+3. description：描述简洁有趣，不超过{description_max}字
+4. hashtags：1到{max_hashtags}个话题标签，不带#号
+5. {style}
+
+输出格式：{{"title": "标题", "description": "描述", "hashtags": ["标签1", "标签2"]}}""", max_tokens=300))
+
+register_template(PromptTemplate(CONTENT, 1, """请根据视频文件名，用中文写一篇小红书笔记，包括标题、正文和话题标签，不要思考，直接输出JSON。
+
+视频文件名：{filename}{context}
+要求：
+1. 必须使用中文
+2. title：笔记标题不超过{title_max}个字，{title_rule}
+3. description：笔记正文不超过{description_max}字，可以分成2到3个短段落，可以适当使用emoji
+4. hashtags：3到{max_hashtags}个话题标签，不带#号
+5. {style}
+
+输出格式：{{"title": "标题", "description": "正文", "hashtags": ["标签1", "标签2"]}}""", max_tokens=600, platform='xhs'))
+
+
+class PromptSet:
+    """一个平台当前使用的各类模板，以及该平台的结果清理规则"""
+
+    def __init__(self, platform: str = 'douyin', versions: Optional[Dict] = None):
+        """
+        Args:
+            platform: 目标平台（douyin/channels/xhs）
+            versions: 指定模板版本，键为 "类型" 或 "平台/类型"，如 {"title": 2}，未指定的使用最新版本
+        """
+        if platform not in PLATFORMS:
+            print(f"⚠️ 未知的平台 {platform}，提示词使用抖音模板")
+            platform = 'douyin'
+        self.profile = PLATFORMS[platform]
+        versions = versions or {}
+        self.templates = {}
+        for kind in TEMPLATE_KINDS:
+            version = versions.get(f"{platform}/{kind}", versions.get(kind))
+            self.templates[kind] = get_template(kind, platform, int(version) if version is not None else None)
+
+    @classmethod
+    def from_config(cls) -> 'PromptSet':
+        prompt_config = config.get_prompt_config()
+        return cls(prompt_config['platform'], prompt_config['versions'])
+
+    @property
+    def platform(self) -> str:
+        return self.profile.name
+
+    def render(self, kind: str, context: str = '', **values) -> Prompt:
+        """渲染某类提示词，context 为视频内容（见 content_enricher）"""
+        values['context'] = CONTEXT_LINE.format(context=context) if context else ''
+        return self.templates[kind].render(self.profile, **values)
+
+    def max_tokens(self, kind: str) -> int:
+        """某类提示词的最大输出token数"""
+        return self.templates[kind].max_tokens
+
+    def clean_title(self, text: str) -> str:
+        """清理标题：只保留第一行，去掉引号、话题标签、（按平台）emoji和多余空白，并截断到字数限制"""
+        # 模型在标题后继续输出的内容（换行之后）不属于标题
+        text = next((line for line in text.strip().splitlines() if line.strip()), '')
+        text = text.strip().strip(TITLE_QUOTES)
+        for pattern, replacement in self.profile.title_filters:
+            text = pattern.sub(replacement, text)
+        return text.strip().strip(TITLE_QUOTES).strip()[:self.profile.title_max]
+
+    def clean_description(self, text: str) -> str:
+        """清理描述并截断到字数限制"""
+        return text.strip()[:self.profile.description_max].strip()
+
+    def describe(self) -> Dict[str, str]:
+        """当前使用的模板标识"""
+        return {kind: template.template_id(self.platform) for kind, template in self.templates.items()}
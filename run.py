@@ -9,12 +9,17 @@ import os
 
 def main():
     """主函数"""
+    # 检查Python版本
+    if sys.version_info < (3, 7):
+        print("错误: 需要Python 3.7或更高版本")
+        sys.exit(1)
+    
+    # 带参数时使用命令行模式（不加载tkinter），例如: python run.py status
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    
     try:
-        # 检查Python版本
-        if sys.version_info < (3, 7):
-            print("错误: 需要Python 3.7或更高版本")
-            sys.exit(1)
-        
         # 导入并运行视频管理器
         from video_manager_improved import VideoManager
         
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+话题标签推荐
+用Ollama嵌入向量索引已发布视频的标题和描述，按余弦相似度找出最相近的视频，推荐它们使用过的标签
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from media_utils import get_cache_dir, load_numpy
+from prompt_templates import HASHTAG_TAG_PATTERN
+
+# 每次请求嵌入接口的最大文本数
+EMBED_BATCH_SIZE = 64
+# 向量矩阵的初始容量，写满后容量翻倍，追加视频时不必每次复制整个矩阵
+INITIAL_CAPACITY = 256
+
+INDEX_FILE = 'index.json'
+EMBEDDINGS_FILE = 'embeddings.npy'
+
+
+def video_text(title: str, description: str) -> str:
+    """用于计算嵌入向量的视频文本（标题和去掉话题标签的描述）"""
+    # 与 extract_hashtags 使用同一规则，标签不会残留在文本中
+    description = HASHTAG_TAG_PATTERN.sub('', description or '').strip()
+    return f"{title or ''}\n{description}".strip()
+
+
+class TagRecommender:
+    """基于嵌入向量的话题标签推荐
+
+    - 每个已索引视频保存一行归一化的嵌入向量和它的标签，余弦相似度即矩阵与查询向量的点积
+    - 推荐时取最相似的 top_k 个视频，按相似度加权统计标签得分
+    - 索引保存在 cache/tags/ 下，新发布的视频增量追加，模型更换后索引自动重建
+
+    可在多个线程中共用。
+    """
+
+    def __init__(self, client, model: str = 'nomic-embed-text', index_dir: Optional[str] = None,
+                 top_k: int = 10, min_similarity: float = 0.3, suggest_timeout: Optional[float] = 3):
+        """
+        Args:
+            client: OllamaClient，用于计算嵌入向量
+            model: 嵌入模型名称
+            index_dir: 索引目录，为None时使用 cache/tags
+            top_k: 推荐时参考的最相似视频数
+            min_similarity: 相似度低于该值的视频不参与推荐
+            suggest_timeout: 推荐时计算嵌入向量最多等待的秒数（只请求一次，不重试），为None时按默认规则重试
+        """
+        # numpy在创建推荐器时才导入，避免拖慢程序启动
+        if load_numpy() is None:
+            raise ImportError("话题标签推荐需要numpy，请先安装：pip install numpy")
+        self.client = client
+        self.model = model
+        self.index_dir = index_dir or get_cache_dir('tags')
+        self.top_k = max(1, top_k)
+        self.min_similarity = min_similarity
+        self.suggest_timeout = suggest_timeout
+
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._count = 0
+        self._video_ids = []
+        self._tags = []
+        self._rows = {}
+        self._dirty = False
+        self.load()
+
+    @classmethod
+    def from_config(cls, client=None) -> Optional['TagRecommender']:
+        """按配置创建推荐器，未启用或numpy不可用时返回None"""
+        tags_config = config.get_tags_config()
+        if not tags_config['enabled']:
+            return None
+        if load_numpy() is None:
+            print("⚠️ 未安装numpy，话题标签推荐不可用")
+            return None
+        if client is None:
+            from ollama_client import OllamaClient
+            client = OllamaClient(cache=None)
+        return cls(client, model=tags_config['embedding_model'], top_k=tags_config['top_k'],
+                   min_similarity=tags_config['min_similarity'], suggest_timeout=tags_config['suggest_timeout'])
+
+    @property
+    def size(self) -> int:
+        """已索引的视频数"""
+        return self._count
+
+    def contains(self, video_id: int) -> bool:
+        with self._lock:
+            return video_id in self._rows
+
+    def load(self):
+        """从磁盘加载索引，文件不存在、损坏或嵌入模型不同时从空索引开始"""
+        np = load_numpy()
+        index_path = os.path.join(self.index_dir, INDEX_FILE)
+        embeddings_path = os.path.join(self.index_dir, EMBEDDINGS_FILE)
+        if not (os.path.exists(index_path) and os.path.exists(embeddings_path)):
+            return
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('model') != self.model:
+                print(f"ℹ️ 嵌入模型已从 {index.get('model')} 更换为 {self.model}，标签索引将重建")
+                return
+            matrix = np.load(embeddings_path)
+            if len(matrix) != len(index['video_ids']):
+                raise ValueError("向量数与视频数不一致")
+        except Exception as e:
+            print(f"⚠️ 标签索引加载失败，将重建: {e}")
+            return
+
+        with self._lock:
+            self._matrix = np.asarray(matrix, dtype=np.float32)
+            self._count = len(matrix)
+            self._video_ids = list(index['video_ids'])
+            self._tags = [list(tags) for tags in index['tags']]
+            self._rows = {video_id: row for row, video_id in enumerate(self._video_ids)}
+
+    def save(self):
+        """把索引写入磁盘（先写临时文件再替换，中途退出不会损坏已有索引）"""
+        np = load_numpy()
+        with self._lock:
+            if not self._dirty:
+                return
+            matrix = self._matrix[:self._count].copy() if self._count else np.zeros((0, 0), dtype=np.float32)
+            index = {'model': self.model, 'dim': int(matrix.shape[1]) if self._count else 0,
+                     'video_ids': list(self._video_ids), 'tags': [list(tags) for tags in self._tags]}
+            self._dirty = False
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        embeddings_path = os.path.join(self.index_dir, EMBEDDINGS_FILE)
+        index_path = os.path.join(self.index_dir, INDEX_FILE)
+        # np.save 会给没有 .npy 后缀的文件名补上后缀
+        with open(embeddings_path + '.tmp', 'wb') as f:
+            np.save(f, matrix)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(embeddings_path + '.tmp', embeddings_path)
+        os.replace(index_path + '.tmp', index_path)
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> 'np.ndarray':
+        """计算一组文本的归一化嵌入向量，形状为 (N, dim)，指定 timeout 时每个请求只发送一次"""
+        np = load_numpy()
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            vectors.extend(self.client.embed(texts[start:start + EMBED_BATCH_SIZE], self.model, timeout=timeout))
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def add(self, video_id: int, text: str, tags: List[str]):
+        """索引一个视频，已索引的视频更新向量和标签"""
+        self.add_many([(video_id, text, tags)])
+
+    def add_many(self, items: Iterable[Tuple[int, str, List[str]]]) -> int:
+        """批量索引视频，没有标签或文本为空的视频跳过，返回索引的数量
+
+        Raises:
+            OllamaError: 计算嵌入向量失败
+        """
+        items = [(video_id, text, list(tags)) for video_id, text, tags in items if tags and text]
+        if not items:
+            return 0
+        vectors = self.embed([text for _, text, _ in items])
+
+        with self._lock:
+            if self._count and vectors.shape[1] != self._matrix.shape[1]:
+                raise ValueError(f"嵌入向量维度不一致：索引为 {self._matrix.shape[1]}，新向量为 {vectors.shape[1]}")
+            for (video_id, _, tags), vector in zip(items, vectors):
+                row = self._rows.get(video_id)
+                if row is None:
+                    self._reserve(self._count + 1, len(vector))
+                    row = self._count
+                    self._count += 1
+                    self._video_ids.append(video_id)
+                    self._tags.append(tags)
+                    self._rows[video_id] = row
+                else:
+                    self._tags[row] = tags
+                self._matrix[row] = vector
+            self._dirty = True
+        return len(items)
+
+    def _reserve(self, count: int, dim: int):
+        """确保矩阵至少能容纳 count 行，容量不足时翻倍（调用方需持有锁）"""
+        np = load_numpy()
+        if self._matrix is None:
+            self._matrix = np.zeros((max(INITIAL_CAPACITY, count), dim), dtype=np.float32)
+        elif count > len(self._matrix):
+            grown = np.zeros((max(count, len(self._matrix) * 2), dim), dtype=np.float32)
+            grown[:self._count] = self._matrix[:self._count]
+            self._matrix = grown
+
+    def suggest(self, text: str, max_tags: int = 5, exclude: Iterable[str] = ()) -> List[str]:
+        """为文本推荐标签，索引为空或没有足够相似的视频时返回空列表，规则同 suggest_many
+
+        Raises:
+            OllamaError: 计算嵌入向量失败或超时
+        """
+        return self.suggest_many([text], max_tags, exclude)[0]
+
+    def suggest_many(self, texts: List[str], max_tags: int = 5, exclude: Iterable[str] = ()) -> List[List[str]]:
+        """为一组文本推荐标签，返回与 texts 一一对应的标签列表
+
+        所有文本的嵌入向量合并请求（每 EMBED_BATCH_SIZE 条一次），每次只请求一次、最多等待 suggest_timeout 秒。
+
+        Raises:
+            OllamaError: 计算嵌入向量失败或超时
+        """
+        suggestions = [[] for _ in texts]
+        if not self._count:
+            return suggestions
+        positions = [position for position, text in enumerate(texts) if text]
+        if not positions:
+            return suggestions
+        vectors = self.embed([texts[position] for position in positions], timeout=self.suggest_timeout)
+        for position, vector in zip(positions, vectors):
+            suggestions[position] = self.suggest_for_vector(vector, max_tags, exclude)
+        return suggestions
+
+    def suggest_for_vector(self, vector: 'np.ndarray', max_tags: int = 5,
+                           exclude: Iterable[str] = ()) -> List[str]:
+        """用已计算的归一化向量推荐标签"""
+        np = load_numpy()
+        with self._lock:
+            if not self._count:
+                return []
+            similarities = self._matrix[:self._count] @ vector
+            k = min(self.top_k, self._count)
+            # 只对前k个做部分排序，不必排序整个索引
+            nearest = np.argpartition(-similarities, k - 1)[:k]
+
+            scores = {}
+            for row in nearest:
+                similarity = float(similarities[row])
+                if similarity < self.min_similarity:
+                    continue
+                for tag in self._tags[row]:
+                    scores[tag] = scores.get(tag, 0.0) + similarity
+
+        excluded = set(exclude)
+        ranked = sorted((tag for tag in scores if tag not in excluded), key=lambda tag: -scores[tag])
+        return ranked[:max_tags]
+
+    def stats(self) -> Dict:
+        """索引统计"""
+        with self._lock:
+            return {'videos': self._count, 'model': self.model,
+                    'dim': int(self._matrix.shape[1]) if self._matrix is not None else 0}
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+熔断器测试：探测请求没有得出结论就结束时，熔断不能停留在半开状态
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_resilience import CircuitBreaker  # noqa: E402
+from ollama_client import OllamaClient  # noqa: E402
+
+
+class CircuitBreakerProbeTest(unittest.TestCase):
+
+    def open_breaker(self, reset_timeout=0.1):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        return breaker
+
+    def test_abandoned_probe_reopens(self):
+        breaker = self.open_breaker()
+        self.assertTrue(breaker.wait_until_closed(1))
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+        breaker.abandon_probe()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        # reset_timeout 后放行下一个探测请求
+        self.assertTrue(breaker.wait_until_closed(1))
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_abandon_from_other_thread_is_ignored(self):
+        breaker = self.open_breaker()
+        self.assertTrue(breaker.wait_until_closed(1))
+
+        thread = threading.Thread(target=breaker.abandon_probe)
+        thread.start()
+        thread.join()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_probe_that_raises_does_not_block_others(self):
+        client = OllamaClient("http://127.0.0.1:9", cache=None)
+        client.circuit_breaker = self.open_breaker()
+        client.max_pause = 2
+        time.sleep(0.15)
+
+        # 探测请求出现连接错误以外的异常
+        with mock.patch.object(client.session, 'post', side_effect=ValueError("boom")):
+            with self.assertRaises(ValueError):
+                client.post_generate({"model": "m", "prompt": "p"})
+        self.assertEqual(client.circuit_breaker.state, CircuitBreaker.OPEN)
+
+        # 下一个请求成为新的探测请求，而不是一直等待半开状态结束
+        response = mock.Mock(status_code=200)
+        with mock.patch.object(client.session, 'post', return_value=response):
+            start = time.monotonic()
+            self.assertIs(client.post_generate({"model": "m", "prompt": "p"}), response)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(client.circuit_breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
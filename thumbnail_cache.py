@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频列表缩略图缓存
+后台线程只为可见行生成/读取缩略图，主线程维护有界的PhotoImage LRU
+"""
+
+import base64
+import os
+import queue
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import tkinter as tk
+
+from media_utils import cached_fingerprint, find_executable, get_cache_dir
+
+# 缩略图最大尺寸（像素），保持原始宽高比缩放到该范围内
+THUMBNAIL_WIDTH = 64
+THUMBNAIL_HEIGHT = 36
+# 截取缩略图的时间点（秒）
+THUMBNAIL_TIMESTAMP = 1.0
+
+
+class ThumbnailCache:
+    """缩略图缓存
+
+    - 磁盘缓存：cache/thumbs/<内容指纹>.png，重复启动无需重新截帧
+    - 后台线程：截帧与读取文件只在工作线程中进行，请求只保留最新一次的可见行
+    - 内存缓存：按最近使用淘汰的 PhotoImage，数量有上限
+
+    PhotoImage 只能在Tk主线程创建，因此工作线程产出PNG数据，由 poll 在主线程转换。
+    """
+
+    def __init__(self, root: tk.Misc, on_ready: Callable[[str, tk.PhotoImage], None],
+                 on_evict: Optional[Callable[[str], None]] = None,
+                 max_images: int = 300, cache_dir: Optional[str] = None):
+        self.root = root
+        self.on_ready = on_ready
+        self.on_evict = on_evict
+        self.max_images = max(1, int(max_images))
+        self.cache_dir = cache_dir or get_cache_dir('thumbs')
+        self.ffmpeg = find_executable('ffmpeg')
+
+        # file_path -> PhotoImage
+        self._images = OrderedDict()
+        # 生成失败的文件，避免反复尝试
+        self._failed = set()
+
+        self._lock = threading.Lock()
+        self._wanted = []
+        self._wakeup = threading.Event()
+        self._results = queue.Queue()
+        self._closed = False
+
+        threading.Thread(target=self._worker, daemon=True).start()
+        self.root.after(50, self._poll)
+
+    def get(self, file_path: str) -> Optional[tk.PhotoImage]:
+        """获取已加载的缩略图，命中时刷新LRU顺序"""
+        image = self._images.get(file_path)
+        if image is not None:
+            self._images.move_to_end(file_path)
+        return image
+
+    def request(self, file_paths: List[str]):
+        """请求加载一批（当前可见行的）缩略图
+
+        新请求会替换尚未处理的旧请求，快速滚动时不会积压已滚出视野的任务。
+        """
+        wanted = [path for path in file_paths
+                  if path not in self._images and path not in self._failed]
+        with self._lock:
+            self._wanted = wanted
+        if wanted:
+            self._wakeup.set()
+
+    def close(self):
+        """停止后台线程"""
+        self._closed = True
+        self._wakeup.set()
+
+    def _worker(self):
+        while not self._closed:
+            self._wakeup.wait()
+            with self._lock:
+                if not self._wanted:
+                    self._wakeup.clear()
+                    continue
+                file_path = self._wanted.pop(0)
+
+            data = self._load_png(file_path)
+            self._results.put((file_path, data))
+
+    def _load_png(self, file_path: str) -> Optional[bytes]:
+        """读取（必要时生成）磁盘缩略图，返回base64编码的PNG数据"""
+        try:
+            thumb_path = os.path.join(self.cache_dir, f"{cached_fingerprint(file_path)}.png")
+            if not os.path.exists(thumb_path):
+                if not self.ffmpeg:
+                    return None
+                tmp_path = thumb_path + '.part.png'
+                result = subprocess.run(
+                    [self.ffmpeg, '-y', '-loglevel', 'error', '-ss', str(THUMBNAIL_TIMESTAMP),
+                     '-i', file_path, '-frames:v', '1', '-vf', f"scale={THUMBNAIL_WIDTH}:{THUMBNAIL_HEIGHT}:force_original_aspect_ratio=decrease",
+                     tmp_path],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30
+                )
+                if result.returncode != 0 or not os.path.exists(tmp_path):
+                    return None
+                os.replace(tmp_path, thumb_path)
+
+            with open(thumb_path, 'rb') as f:
+                return base64.b64encode(f.read())
+        except Exception as e:
+            print(f"⚠️ 生成缩略图失败 {file_path}: {e}")
+            return None
+
+    def _poll(self):
+        """在主线程中把后台结果转换为PhotoImage，每次最多处理少量结果以免卡顿"""
+        if self._closed:
+            return
+        for _ in range(20):
+            try:
+                file_path, data = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            if data is None:
+                self._failed.add(file_path)
+                continue
+
+            try:
+                image = tk.PhotoImage(data=data)
+            except tk.TclError:
+                self._failed.add(file_path)
+                continue
+
+            self._images[file_path] = image
+            self._images.move_to_end(file_path)
+            while len(self._images) > self.max_images:
+                evicted_path, _ = self._images.popitem(last=False)
+                if self.on_evict:
+                    self.on_evict(evicted_path)
+            self.on_ready(file_path, image)
+
+        self.root.after(50, self._poll)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+界面更新事件总线
+后台线程投递界面更新事件，Tk主线程按固定帧率合并处理，批量任务时不会塞满Tk事件队列
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+import tkinter as tk
+
+# 默认每秒处理事件的次数
+DEFAULT_FPS = 20
+
+
+class UIEventBus:
+    """界面更新事件总线
+
+    后台线程调用以下方法投递事件（可在任意线程调用），主线程每帧合并后统一处理：
+    - status(text)：状态栏文本，同一帧内只显示最新一条
+    - row(video_id, **changes)：行更新（name/description/processing），同一行的多次更新合并，每帧一次批量交给 on_rows
+    - reload()：重新加载列表，同一帧内多次请求只加载一次
+    - call(func, key=None)：其他主线程操作，按投递顺序执行；指定 key 时同一 key 只执行最新一次（如流式生成的文本）
+
+    每帧的处理顺序：重新加载列表、行更新、状态栏、其他操作（对话框等可能阻塞的操作放在最后）。
+    """
+
+    def __init__(self, root: tk.Misc, on_status: Callable[[str], None],
+                 on_rows: Callable[[Dict[int, Dict]], None], on_reload: Callable[[], None],
+                 fps: int = DEFAULT_FPS):
+        """
+        Args:
+            root: Tk根窗口
+            on_status: 设置状态栏文本
+            on_rows: 批量更新行，接收 {视频ID: {字段: 值}}
+            on_reload: 重新加载列表
+            fps: 每秒处理事件的次数
+        """
+        self.root = root
+        self.on_status = on_status
+        self.on_rows = on_rows
+        self.on_reload = on_reload
+        self.interval = max(1, int(1000 / max(1, fps)))
+
+        self._lock = threading.Lock()
+        self._status = None
+        self._rows = OrderedDict()
+        self._reload = False
+        self._calls = OrderedDict()
+        self._sequence = 0
+        self._closed = False
+
+        self.root.after(self.interval, self._drain)
+
+    def status(self, text: str):
+        """设置状态栏文本"""
+        with self._lock:
+            self._status = text
+
+    def row(self, video_id: int, **changes):
+        """更新一行（name/description/processing）"""
+        with self._lock:
+            self._rows.setdefault(video_id, {}).update(changes)
+
+    def reload(self):
+        """重新加载列表"""
+        with self._lock:
+            self._reload = True
+
+    def call(self, func: Callable[[], None], key: Optional[Hashable] = None):
+        """在主线程中执行操作，指定 key 时替换同一 key 尚未执行的操作"""
+        with self._lock:
+            if key is None:
+                self._sequence += 1
+                key = ('#', self._sequence)
+            self._calls[key] = func
+
+    def close(self):
+        """停止处理，尚未处理的事件丢弃"""
+        self._closed = True
+
+    def _drain(self):
+        """在主线程中处理一帧内累积的事件"""
+        if self._closed:
+            return
+        with self._lock:
+            status, self._status = self._status, None
+            rows, self._rows = self._rows, OrderedDict()
+            reload, self._reload = self._reload, False
+            calls, self._calls = self._calls, OrderedDict()
+
+        steps = []
+        if reload:
+            steps.append(self.on_reload)
+        if rows:
+            steps.append(lambda: self.on_rows(rows))
+        if status is not None:
+            steps.append(lambda: self.on_status(status))
+        steps.extend(calls.values())
+
+        try:
+            for step in steps:
+                try:
+                    step()
+                except tk.TclError:
+                    # 窗口已关闭（如流式生成结束前关闭了编辑窗口）
+                    pass
+                except Exception as e:
+                    print(f"⚠️ 界面更新出错: {e}")
+        finally:
+            self.root.after(self.interval, self._drain)
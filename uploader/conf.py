@@ -11,7 +11,6 @@ USE_CHROME_BROWSER = True
 
 # Playwright Chromium 路径（自动检测）
 import os
-from playwright.async_api import async_playwright
 
 # 其他配置
 BASE_DIR = "."
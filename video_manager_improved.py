@@ -3,19 +3,25 @@ from tkinter import ttk, filedialog, messagebox
 import sqlite3
 import os
 import threading
+import time
 from datetime import datetime
 import json
 from ollama_client import OllamaClient
-import asyncio
+from ollama_session import OllamaSession
+from ai_pregenerator import AIPregenerator
+from content_enricher import ContentEnricher
+from cover_extractor import CoverExtractor
+from thumbnail_cache import ThumbnailCache, THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT
+from ui_events import UIEventBus
+from config import config
+from video_store import VideoStore, AI_STATUS_NONE, AI_STATUS_PENDING, DEFAULT_SORT, STATUS_PUBLISHED
+from batch_tasks import run_ai_batch, run_publish_batch
 import sys
 
-# 添加发布器路径
-try:
-    from douyin_publisher import DouyinPublisher
-    DOUYIN_PUBLISHER_AVAILABLE = True
-except ImportError:
-    DOUYIN_PUBLISHER_AVAILABLE = False
-    print("⚠️ 抖音发布器不可用，将使用模拟发布功能")
+# 抖音发布器（douyin_publisher/Playwright）在启动后的后台检测或首次发布时才导入，避免拖慢窗口显示
+
+# 删除确认对话框中最多列出的视频数（全选时可能有上万个）
+DELETE_PREVIEW_LIMIT = 200
 
 class VideoManager:
     def __init__(self):
@@ -26,61 +32,84 @@ class VideoManager:
         # 数据库初始化
         self.init_database()
         
-        # 初始化Ollama客户端
-        self.init_ollama()
+        # 封面提取器（未启用时为None）
+        self.cover_extractor = CoverExtractor.from_config()
         
         # 创建界面
         self.create_widgets()
         
+        # 后台线程的界面更新经事件总线合并后在主线程按帧处理
+        self.ui_events = UIEventBus(self.root, on_status=self.status_var.set, on_rows=self.update_rows,
+                                    on_reload=self.load_video_list, fps=config.get('ui.refresh_fps', 20))
+        
         # 加载视频列表
         self.load_video_list()
+        
+        # 初始化Ollama客户端并在后台检测AI和发布器状态，不阻塞窗口显示
+        self.init_ollama()
+        self.publisher_available = None
+        threading.Thread(target=self.probe_publisher, daemon=True).start()
+        
+        # 为未发布视频在后台预先生成封面
+        self.cursor.execute("SELECT file_path FROM videos WHERE status != '已发布'")
+        self.prefetch_covers([row[0] for row in self.cursor.fetchall()])
     
     def init_database(self):
         """初始化数据库"""
         self.db_path = 'videos.db'
-        self.conn = sqlite3.connect(self.db_path)
+        # 建表与迁移由VideoStore负责，与命令行模式共用
+        self.store = VideoStore(self.db_path)
+        self.conn = self.store.conn
         self.cursor = self.conn.cursor()
-        
-        # 创建视频表
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS videos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL,
-                display_name TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                description TEXT,
-                status TEXT DEFAULT '未发布',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        self.conn.commit()
     
     def init_ollama(self):
-        """初始化Ollama客户端"""
+        """初始化Ollama客户端，连接检测在后台线程中进行"""
+        self.ai_enabled = False
+        self.ollama_client = OllamaClient()
+        self.ollama_session = OllamaSession(self.ollama_client)
+        # 视频内容提取器（未启用时为None），批量生成时提取，编辑窗口只读取已有结果
+        self.content_enricher = ContentEnricher.from_config(self.ollama_client)
+        # 入库后台AI预生成（未启用时为None），新视频在空闲时生成名称和描述
+        self.ai_pregenerator = AIPregenerator.from_config(
+            self.db_path, self.ollama_session, self.content_enricher,
+            progress_callback=self.on_pregenerated, done_callback=self.on_pregenerate_batch)
+        if self.ai_pregenerator:
+            self.ai_pregenerator.start()
+            # 处理上次退出时未完成的AI队列
+            self.ai_pregenerator.notify()
+        
+        def probe_thread():
+            try:
+                # 测试连接
+                test_result = self.ollama_session.health()
+                if test_result["connection"] and test_result["model_available"]:
+                    print("✅ AI功能已启用")
+                    self.ui_events.call(lambda: self.set_ai_status(True, "AI: 已启用"), key='ai_status')
+                else:
+                    print("⚠️ AI功能未启用，将使用模拟功能")
+                    self.ui_events.call(lambda: self.set_ai_status(False, "AI: 未启用"), key='ai_status')
+            except Exception as e:
+                print(f"⚠️ Ollama初始化失败: {e}")
+                print("将使用模拟AI功能")
+                self.ui_events.call(lambda: self.set_ai_status(False, "AI: 连接失败"), key='ai_status')
+        
+        threading.Thread(target=probe_thread, daemon=True).start()
+    
+    def set_ai_status(self, enabled, text):
+        """更新AI可用状态及状态显示"""
+        self.ai_enabled = enabled
+        self.ai_status_var.set(text)
+        self.ai_status_label.config(foreground="blue" if enabled else "red")
+    
+    def probe_publisher(self):
+        """检测抖音发布器是否可用（会导入Playwright，应在后台线程调用）"""
         try:
-            self.ollama_client = OllamaClient()
-            # 测试连接
-            test_result = self.ollama_client.test_connection()
-            if test_result["connection"] and test_result["model_available"]:
-                self.ai_enabled = True
-                print("✅ AI功能已启用")
-                # 更新AI状态显示
-                if hasattr(self, 'ai_status_var'):
-                    self.ai_status_var.set("AI: 已启用")
-            else:
-                self.ai_enabled = False
-                print("⚠️ AI功能未启用，将使用模拟功能")
-                # 更新AI状态显示
-                if hasattr(self, 'ai_status_var'):
-                    self.ai_status_var.set("AI: 未启用")
-        except Exception as e:
-            self.ai_enabled = False
-            print(f"⚠️ Ollama初始化失败: {e}")
-            print("将使用模拟AI功能")
-            # 更新AI状态显示
-            if hasattr(self, 'ai_status_var'):
-                self.ai_status_var.set("AI: 连接失败")
+            from douyin_publisher import load_uploader
+            self.publisher_available = load_uploader() is not None
+        except ImportError as e:
+            print(f"⚠️ 抖音发布器不可用，将使用模拟发布功能: {e}")
+            self.publisher_available = False
+        return self.publisher_available
     
     def create_widgets(self):
         """创建GUI界面"""
@@ -119,6 +148,10 @@ class VideoManager:
         self.deselect_all_btn = ttk.Button(left_buttons, text="取消全选", command=self.deselect_all)
         self.deselect_all_btn.pack(side=tk.LEFT, padx=(0, 10))
         
+        # 批量处理期间也可以查看，不随其他按钮禁用
+        self.ai_metrics_btn = ttk.Button(left_buttons, text="AI统计", command=self.show_ai_metrics)
+        self.ai_metrics_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
         # 右侧筛选区域
         filter_frame = ttk.Frame(control_frame)
         filter_frame.pack(side=tk.RIGHT)
@@ -129,12 +162,11 @@ class VideoManager:
         
         self.ai_status_var = tk.StringVar()
         self.ai_status_var.set("AI: 检查中...")
-        ai_status_label = ttk.Label(ai_status_frame, textvariable=self.ai_status_var, 
-                                   foreground="blue" if hasattr(self, 'ai_enabled') and self.ai_enabled else "red")
-        ai_status_label.pack(side=tk.LEFT)
+        self.ai_status_label = ttk.Label(ai_status_frame, textvariable=self.ai_status_var, foreground="gray")
+        self.ai_status_label.pack(side=tk.LEFT)
         
         ttk.Label(filter_frame, text="状态筛选:").pack(side=tk.LEFT)
-        self.status_filter = ttk.Combobox(filter_frame, values=["全部", "未发布", "已发布", "发布失败"], 
+        self.status_filter = ttk.Combobox(filter_frame, values=["全部", "未发布", "待发布", "已发布", "发布失败"], 
                                          state="readonly", width=10)
         self.status_filter.set("全部")
         self.status_filter.pack(side=tk.LEFT, padx=(5, 0))
@@ -146,16 +178,42 @@ class VideoManager:
         
         # 创建树形视图
         columns = ("选择", "ID", "显示名称", "描述", "文件名", "状态", "创建时间")
-        self.tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=15)
+        # 可选的缩略图列使用树形列(#0)显示图片
+        self.show_thumbnails = config.get('ui.show_thumbnails', False)
+        self.tree = ttk.Treeview(list_frame, columns=columns, 
+                                 show="tree headings" if self.show_thumbnails else "headings", height=15)
+        
+        # 行ID与文件路径的映射，用于加载缩略图；视频ID到行ID的映射，用于更新单行
+        self.item_paths = {}
+        self.path_items = {}
+        self.id_items = {}
+        self.thumbnail_cache = None
+        self.thumbnail_refresh_job = None
+        if self.show_thumbnails:
+            ttk.Style(self.root).configure("Treeview", rowheight=THUMBNAIL_HEIGHT + 4)
+            self.tree.heading("#0", text="预览")
+            self.tree.column("#0", width=THUMBNAIL_WIDTH + 20, stretch=False, anchor="center")
+            self.thumbnail_cache = ThumbnailCache(
+                self.root, on_ready=self.on_thumbnail_ready, on_evict=self.on_thumbnail_evict,
+                max_images=config.get('ui.thumbnail_cache_size', 300)
+            )
         
-        # 设置列标题和宽度
+        # 设置列标题和宽度，点击列标题按该列排序（在数据库中排序，列表按页加载）
+        self.sort_columns = {"ID": 'id', "显示名称": 'display_name', "描述": 'description',
+                             "文件名": 'filename', "状态": 'status', "创建时间": 'created_at'}
+        self.sort_column = DEFAULT_SORT
+        self.sort_descending = True
+        self.page_size = max(50, int(config.get('ui.page_size', 500)))
+        self.page_after = None
+        self.has_more_rows = False
+        self.load_more_job = None
+        # 全选按当前筛选条件记录（不加载全部行），selection_exceptions 为全选后又取消勾选的视频ID
+        self.all_selected = False
+        self.selection_exceptions = set()
         self.tree.heading("选择", text="选择")
-        self.tree.heading("ID", text="ID")
-        self.tree.heading("显示名称", text="显示名称")
-        self.tree.heading("描述", text="描述")
-        self.tree.heading("文件名", text="文件名")
-        self.tree.heading("状态", text="状态")
-        self.tree.heading("创建时间", text="创建时间")
+        for column in self.sort_columns:
+            self.tree.heading(column, command=lambda c=column: self.sort_by(c))
+        self.update_sort_headings()
         
         self.tree.column("选择", width=50, anchor="center")
         self.tree.column("ID", width=50, anchor="center")
@@ -167,7 +225,15 @@ class VideoManager:
         
         # 添加滚动条
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        
+        def on_tree_scroll(first, last):
+            scrollbar.set(first, last)
+            self.schedule_thumbnail_refresh()
+            # 滚动到接近底部时加载下一页
+            if self.has_more_rows and float(last) >= 0.9 and self.load_more_job is None:
+                self.load_more_job = self.root.after_idle(self.load_more_videos)
+        
+        self.tree.configure(yscrollcommand=on_tree_scroll)
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -175,6 +241,7 @@ class VideoManager:
         # 绑定事件
         self.tree.bind("<Double-1>", self.edit_video)
         self.tree.bind("<Button-1>", self.on_tree_click)
+        self.tree.bind("<Configure>", lambda e: self.schedule_thumbnail_refresh())
         
         # 设置标签样式
         self.tree.tag_configure("published", background="#90EE90")  # 浅绿色
@@ -190,6 +257,56 @@ class VideoManager:
         # 初始化按钮状态
         self.is_processing = False
     
+    def schedule_thumbnail_refresh(self):
+        """滚动停顿后再加载可见行缩略图，避免滚动过程中频繁请求"""
+        if not self.thumbnail_cache:
+            return
+        if self.thumbnail_refresh_job is not None:
+            self.root.after_cancel(self.thumbnail_refresh_job)
+        self.thumbnail_refresh_job = self.root.after(100, self.refresh_visible_thumbnails)
+    
+    def refresh_visible_thumbnails(self):
+        """为当前可见行设置已缓存的缩略图，并请求加载缺失的缩略图"""
+        self.thumbnail_refresh_job = None
+        children = self.tree.get_children()
+        if not children:
+            return
+        
+        first, last = self.tree.yview()
+        start = int(float(first) * len(children))
+        end = min(len(children), int(float(last) * len(children)) + 1)
+        
+        missing = []
+        for item in children[start:end]:
+            file_path = self.item_paths.get(item)
+            if not file_path:
+                continue
+            image = self.thumbnail_cache.get(file_path)
+            if image is not None:
+                self.tree.item(item, image=image)
+            else:
+                missing.append(file_path)
+        
+        self.thumbnail_cache.request(missing)
+    
+    def on_thumbnail_ready(self, file_path, image):
+        """缩略图加载完成"""
+        item = self.path_items.get(file_path)
+        if item and self.tree.exists(item):
+            self.tree.item(item, image=image)
+    
+    def on_thumbnail_evict(self, file_path):
+        """缩略图被移出内存缓存时清除对应行的图片"""
+        item = self.path_items.get(file_path)
+        if item and self.tree.exists(item):
+            self.tree.item(item, image="")
+    
+    def register_row(self, item, file_path, video_id):
+        """记录行与文件路径、视频ID的对应关系"""
+        self.item_paths[item] = file_path
+        self.path_items[file_path] = item
+        self.id_items[video_id] = item
+    
     def disable_buttons(self):
         """禁用所有按钮"""
         self.is_processing = True
@@ -236,24 +353,41 @@ class VideoManager:
         values = list(self.tree.item(item)['values'])
         if values[0] == "□":
             values[0] = "☑"
+            self.selection_exceptions.discard(values[1])
         else:
             values[0] = "□"
+            if self.all_selected:
+                self.selection_exceptions.add(values[1])
         self.tree.item(item, values=values)
     
     def select_all(self):
-        """全选"""
-        for item in self.tree.get_children():
-            values = list(self.tree.item(item)['values'])
-            values[0] = "☑"
-            self.tree.item(item, values=values)
+        """全选当前筛选条件下的所有视频（包括尚未加载的页，之后加载的行自动勾选）"""
+        self.all_selected = True
+        self.selection_exceptions.clear()
+        self.set_all_marks("☑")
+        status_filter = self.status_filter.get()
+        self.status_var.set(f"已全选 {self.count_filtered_videos(status_filter)} 个视频")
     
     def deselect_all(self):
         """取消全选"""
+        self.all_selected = False
+        self.selection_exceptions.clear()
+        self.set_all_marks("□")
+    
+    def set_all_marks(self, mark):
+        """设置已加载行的勾选标记"""
         for item in self.tree.get_children():
             values = list(self.tree.item(item)['values'])
-            values[0] = "□"
+            values[0] = mark
             self.tree.item(item, values=values)
     
+    def count_filtered_videos(self, status_filter):
+        """当前筛选条件下的视频数"""
+        counts = self.store.status_counts()
+        if status_filter == "全部":
+            return counts['total']
+        return counts.get('by_status', {}).get(status_filter, 0)
+    
     def add_videos(self):
         """批量添加视频文件"""
         # 禁用按钮
@@ -268,47 +402,15 @@ class VideoManager:
         )
         
         if files:
-            # 批量处理所有文件
-            added_count = 0
-            skipped_count = 0
-            error_count = 0
-            
-            # 批量检查已存在的文件
-            file_paths = []
-            valid_files = []
-            
-            for file_path in files:
-                if os.path.exists(file_path):
-                    file_paths.append(file_path)
-                    valid_files.append(file_path)
-                else:
-                    error_count += 1
-            
-            if file_paths:
-                # 批量查询已存在的文件
-                placeholders = ','.join(['?' for _ in file_paths])
-                self.cursor.execute(f"SELECT file_path FROM videos WHERE file_path IN ({placeholders})", file_paths)
-                existing_paths = {row[0] for row in self.cursor.fetchall()}
-                
-                # 准备批量插入的数据
-                batch_data = []
-                for file_path in valid_files:
-                    if file_path not in existing_paths:
-                        filename = os.path.basename(file_path)
-                        display_name = os.path.splitext(filename)[0]
-                        description = f"这是一个关于{filename}的视频，内容精彩有趣。"
-                        batch_data.append((filename, display_name, file_path, description))
-                    else:
-                        skipped_count += 1
-                
-                # 批量插入新文件
-                if batch_data:
-                    self.cursor.executemany('''
-                        INSERT INTO videos (filename, display_name, file_path, description)
-                        VALUES (?, ?, ?, ?)
-                    ''', batch_data)
-                    self.conn.commit()
-                    added_count = len(batch_data)
+            # 批量添加（跳过重复和不存在的文件），启用后台预生成时新视频直接进入AI队列
+            ai_status = AI_STATUS_PENDING if self.ai_pregenerator else AI_STATUS_NONE
+            result = self.store.add_videos(files, ai_status=ai_status)
+            added_count = result['added']
+            skipped_count = result['skipped']
+            error_count = result['error']
+            self.prefetch_covers(result['added_paths'])
+            if self.ai_pregenerator and added_count:
+                self.ai_pregenerator.notify()
             
             self.load_video_list()
             
@@ -368,22 +470,15 @@ class VideoManager:
         def process_thread():
             try:
                 # 更新状态
-                self.root.after(0, lambda: self.status_var.set("正在扫描文件夹..."))
-                
-                # 获取支持的视频格式
-                supported_formats = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']
+                self.ui_events.status("正在扫描文件夹...")
                 
                 # 查找文件夹中的所有视频文件
-                video_files = []
-                for root, dirs, files in os.walk(folder_path):
-                    for file in files:
-                        if any(file.lower().endswith(fmt) for fmt in supported_formats):
-                            video_files.append(os.path.join(root, file))
+                video_files = VideoStore.scan_folder(folder_path)
                 
                 if not video_files:
-                    self.root.after(0, lambda: messagebox.showwarning("警告", "所选文件夹中没有找到支持的视频文件"))
-                    self.root.after(0, lambda: self.status_var.set("就绪"))
-                    self.root.after(0, lambda: self.enable_buttons())
+                    self.ui_events.status("就绪")
+                    self.ui_events.call(lambda: messagebox.showwarning("警告", "所选文件夹中没有找到支持的视频文件"))
+                    self.ui_events.call(self.enable_buttons)
                     return
                 
                 # 在主线程中显示确认对话框
@@ -395,12 +490,13 @@ class VideoManager:
                     else:
                         self.status_var.set("就绪")
                 
-                self.root.after(0, show_confirm)
+                self.ui_events.call(show_confirm)
                 
             except Exception as e:
                 print(f"处理文件夹时出错: {e}")
-                self.root.after(0, lambda: messagebox.showerror("错误", f"处理文件夹时出错：{e}"))
-                self.root.after(0, lambda: self.status_var.set("就绪"))
+                message = f"处理文件夹时出错：{e}"
+                self.ui_events.status("就绪")
+                self.ui_events.call(lambda: messagebox.showerror("错误", message))
         
         # 启动后台线程
         threading.Thread(target=process_thread, daemon=True).start()
@@ -409,56 +505,22 @@ class VideoManager:
         """从文件列表添加视频"""
         def add_thread():
             # 为后台线程创建独立的数据库连接
-            import sqlite3
-            thread_conn = sqlite3.connect(self.db_path)
-            thread_cursor = thread_conn.cursor()
+            thread_store = VideoStore(self.db_path)
             
             try:
-                added_count = 0
-                skipped_count = 0
-                error_count = 0
-                
-                # 批量检查已存在的文件
-                self.root.after(0, lambda: self.status_var.set("正在检查重复文件..."))
-                file_paths = []
-                valid_files = []
-                
-                for file_path in video_files:
-                    if os.path.exists(file_path):
-                        file_paths.append(file_path)
-                        valid_files.append(file_path)
-                    else:
-                        error_count += 1
-                
-                if file_paths:
-                    # 批量查询已存在的文件
-                    placeholders = ','.join(['?' for _ in file_paths])
-                    thread_cursor.execute(f"SELECT file_path FROM videos WHERE file_path IN ({placeholders})", file_paths)
-                    existing_paths = {row[0] for row in thread_cursor.fetchall()}
-                    
-                    # 准备批量插入的数据
-                    batch_data = []
-                    for file_path in valid_files:
-                        if file_path not in existing_paths:
-                            filename = os.path.basename(file_path)
-                            display_name = os.path.splitext(filename)[0]
-                            description = f"这是一个关于{filename}的视频，内容精彩有趣。"
-                            batch_data.append((filename, display_name, file_path, description))
-                        else:
-                            skipped_count += 1
-                    
-                    # 批量插入新文件
-                    if batch_data:
-                        self.root.after(0, lambda: self.status_var.set(f"正在批量添加 {len(batch_data)} 个文件..."))
-                        thread_cursor.executemany('''
-                            INSERT INTO videos (filename, display_name, file_path, description)
-                            VALUES (?, ?, ?, ?)
-                        ''', batch_data)
-                        thread_conn.commit()
-                        added_count = len(batch_data)
+                self.ui_events.status(f"正在批量添加 {len(video_files)} 个文件...")
+                # 启用后台预生成时新视频直接进入AI队列
+                ai_status = AI_STATUS_PENDING if self.ai_pregenerator else AI_STATUS_NONE
+                result = thread_store.add_videos(video_files, ai_status=ai_status)
+                added_count = result['added']
+                skipped_count = result['skipped']
+                error_count = result['error']
+                self.prefetch_covers(result['added_paths'])
+                if self.ai_pregenerator and added_count:
+                    self.ai_pregenerator.notify()
                 
                 # 更新界面
-                self.root.after(0, lambda: self.load_video_list())
+                self.ui_events.reload()
                 
                 # 显示结果
                 message = f"文件夹批量添加完成: 成功添加 {added_count} 个视频"
@@ -467,27 +529,33 @@ class VideoManager:
                 if error_count > 0:
                     message += f"，失败 {error_count} 个文件"
                 
-                self.root.after(0, lambda: self.status_var.set(message))
+                self.ui_events.status(message)
                 
                 # 显示成功消息
                 if added_count > 0:
-                    self.root.after(0, lambda: self.show_success_message(f"已添加 {added_count} 个视频"))
+                    self.ui_events.call(lambda: self.show_success_message(f"已添加 {added_count} 个视频"))
                 
                 # 启用按钮
-                self.root.after(0, lambda: self.enable_buttons())
+                self.ui_events.call(self.enable_buttons)
                 
             except Exception as e:
                 print(f"批量添加视频时出错: {e}")
-                self.root.after(0, lambda: messagebox.showerror("错误", f"批量添加视频时出错：{e}"))
-                self.root.after(0, lambda: self.status_var.set("就绪"))
-                self.root.after(0, lambda: self.enable_buttons())
+                message = f"批量添加视频时出错：{e}"
+                self.ui_events.status("就绪")
+                self.ui_events.call(lambda: messagebox.showerror("错误", message))
+                self.ui_events.call(self.enable_buttons)
             finally:
                 # 关闭线程数据库连接
-                thread_conn.close()
+                thread_store.close()
         
         # 启动后台线程
         threading.Thread(target=add_thread, daemon=True).start()
     
+    def prefetch_covers(self, file_paths):
+        """在后台为视频生成封面，发布时直接使用缓存"""
+        if self.cover_extractor and file_paths:
+            self.cover_extractor.prefetch(file_paths)
+    
     def add_single_video_thread_safe(self, file_path, cursor, conn):
         """线程安全的添加单个视频到数据库"""
         filename = os.path.basename(file_path)
@@ -530,75 +598,82 @@ class VideoManager:
             # 模拟描述
             return f"这是一个关于{filename}的视频，内容精彩有趣。"
     
-    def load_video_list(self):
-        """加载视频列表"""
+    def update_sort_headings(self):
+        """在当前排序列的标题上显示排序方向"""
+        for column, sort in self.sort_columns.items():
+            arrow = (" ▼" if self.sort_descending else " ▲") if sort == self.sort_column else ""
+            self.tree.heading(column, text=column + arrow)
+    
+    def sort_by(self, column):
+        """按列排序，再次点击同一列切换升序/降序"""
+        sort = self.sort_columns[column]
+        if sort == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = sort
+            # 创建时间默认最新的在前，其他列默认升序
+            self.sort_descending = sort == 'created_at'
+        self.update_sort_headings()
+        self.load_video_list(reset=True)
+    
+    def load_video_list(self, reset=False):
+        """加载视频列表（按当前筛选和排序，从第一页开始）
+        
+        Args:
+            reset: 为False时（刷新）至少重新加载当前已加载的行数，为True时（切换筛选或排序）只加载第一页
+        """
+        loaded = len(self.item_paths)
         # 清空现有项目
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self.item_paths.clear()
+        self.path_items.clear()
+        self.id_items.clear()
+        # 重新加载后所有行都是未勾选状态，全选也随之清除（筛选条件可能已变化）
+        self.all_selected = False
+        self.selection_exceptions.clear()
+        self.page_after = None
+        self.has_more_rows = True
+        self.load_more_videos(self.page_size if reset else max(self.page_size, loaded))
+        if reset:
+            self.tree.yview_moveto(0)
+    
+    def load_more_videos(self, limit=None):
+        """加载下一页"""
+        self.load_more_job = None
+        if not self.has_more_rows:
+            return
+        limit = limit or self.page_size
         
-        # 从数据库加载数据
-        self.cursor.execute('''
-            SELECT id, display_name, filename, description, status, created_at
-            FROM videos ORDER BY created_at DESC
-        ''')
-        
-        for row in self.cursor.fetchall():
-            item_id = row[0]
-            display_name = row[1]
-            filename = row[2]
-            description = row[3]
-            status = row[4]
-            created_at = row[5]
-            
+        status_filter = self.status_filter.get()
+        videos = self.store.list_videos(status=None if status_filter == "全部" else status_filter,
+                                        limit=limit, sort=self.sort_column, descending=self.sort_descending,
+                                        after=self.page_after)
+        self.has_more_rows = len(videos) == limit
+        if videos:
+            self.page_after = VideoStore.sort_key(videos[-1], self.sort_column)
+        
+        for video in videos:
             # 根据状态设置标签
             tags = []
-            if status == "已发布":
+            if video['status'] == "已发布":
                 tags.append("published")
-            elif status == "发布失败":
+            elif video['status'] == "发布失败":
                 tags.append("failed")
             
             # 添加复选框 - 按照新的列顺序：选择, ID, 显示名称, 描述, 文件名, 状态, 创建时间
-            self.tree.insert("", "end", values=("□", item_id, display_name, description, 
-                                               filename, status, created_at), tags=tags)
+            mark = "☑" if self.all_selected and video['id'] not in self.selection_exceptions else "□"
+            item = self.tree.insert("", "end", values=(mark, video['id'], video['display_name'], video['description'],
+                                                      video['filename'], video['status'], video['created_at']),
+                                    tags=tags)
+            self.register_row(item, video['file_path'], video['id'])
+        
+        self.schedule_thumbnail_refresh()
     
     def filter_videos(self, event=None):
         """筛选视频"""
-        status_filter = self.status_filter.get()
-        
-        # 清空现有项目
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # 根据筛选条件查询
-        if status_filter == "全部":
-            self.cursor.execute('''
-                SELECT id, display_name, filename, description, status, created_at
-                FROM videos ORDER BY created_at DESC
-            ''')
-        else:
-            self.cursor.execute('''
-                SELECT id, display_name, filename, description, status, created_at
-                FROM videos WHERE status = ? ORDER BY created_at DESC
-            ''', (status_filter,))
-        
-        for row in self.cursor.fetchall():
-            item_id = row[0]
-            display_name = row[1]
-            filename = row[2]
-            description = row[3]
-            status = row[4]
-            created_at = row[5]
-            
-            # 根据状态设置标签
-            tags = []
-            if status == "已发布":
-                tags.append("published")
-            elif status == "发布失败":
-                tags.append("failed")
-            
-            # 按照新的列顺序：选择, ID, 显示名称, 描述, 文件名, 状态, 创建时间
-            self.tree.insert("", "end", values=("□", item_id, display_name, description, 
-                                               filename, status, created_at), tags=tags)
+        self.load_video_list(reset=True)
     
     def edit_video(self, event):
         """编辑视频信息"""
@@ -623,14 +698,14 @@ class VideoManager:
         
         # 获取视频信息
         self.cursor.execute('''
-            SELECT filename, display_name, description, status FROM videos WHERE id = ?
+            SELECT filename, display_name, description, status, ai_model, file_path FROM videos WHERE id = ?
         ''', (video_id,))
         video_data = self.cursor.fetchone()
         
         if not video_data:
             return
         
-        filename, display_name, description, status = video_data
+        filename, display_name, description, status, ai_model, file_path = video_data
         
         # 创建表单
         form_frame = ttk.Frame(edit_window, padding=20)
@@ -653,17 +728,26 @@ class VideoManager:
         ttk.Label(form_frame, text="状态:").grid(row=2, column=0, sticky="w", pady=5)
         status_var = tk.StringVar(value=status)
         status_combo = ttk.Combobox(form_frame, textvariable=status_var, 
-                                   values=["未发布", "已发布", "发布失败"], state="readonly")
+                                   values=["未发布", "待发布", "已发布", "发布失败"], state="readonly")
         status_combo.grid(row=2, column=1, sticky="ew", pady=5)
         
         # AI生成按钮
         ai_frame = ttk.Frame(form_frame)
         ai_frame.grid(row=3, column=0, columnspan=2, pady=10)
         
+        regenerate_var = tk.BooleanVar(value=False)
+        # 本窗口中AI生成的文本 {字段: (文本, 模型)}，保存时据此判断内容是否仍为AI生成
+        generated = {}
         ttk.Button(ai_frame, text="AI生成名称", 
-                  command=lambda: self.generate_ai_name(name_var, filename)).pack(side=tk.LEFT, padx=(0, 10))
+                  command=lambda: self.generate_ai_name(name_var, filename, regenerate_var.get(), file_path,
+                                                        generated)).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(ai_frame, text="AI生成描述", 
-                  command=lambda: self.generate_ai_desc(desc_text, filename)).pack(side=tk.LEFT)
+                  command=lambda: self.generate_ai_desc(desc_text, filename, regenerate_var.get(), file_path,
+                                                        generated)).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Checkbutton(ai_frame, text="重新生成（不使用缓存）", variable=regenerate_var).pack(side=tk.LEFT)
+        if ai_model:
+            # 批量任务可能由小模型生成，便于判断是否需要用主模型重新生成
+            ttk.Label(ai_frame, text=f"AI模型: {ai_model}").pack(side=tk.LEFT, padx=(10, 0))
         
         # 按钮框架
         button_frame = ttk.Frame(form_frame)
@@ -673,12 +757,16 @@ class VideoManager:
             new_name = name_var.get()
             new_desc = desc_text.get("1.0", tk.END).strip()
             new_status = status_var.get()
+            new_model = self.edited_ai_model(ai_model, generated, {
+                'name': (display_name, new_name),
+                'description': ((description or '').strip(), new_desc)
+            })
             
             self.cursor.execute('''
                 UPDATE videos 
-                SET display_name = ?, description = ?, status = ?, updated_at = CURRENT_TIMESTAMP
+                SET display_name = ?, description = ?, status = ?, ai_model = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
-            ''', (new_name, new_desc, new_status, video_id))
+            ''', (new_name, new_desc, new_status, new_model, video_id))
             self.conn.commit()
             
             self.load_video_list()
@@ -691,43 +779,142 @@ class VideoManager:
         # 配置网格权重
         form_frame.columnconfigure(1, weight=1)
     
-    def generate_ai_name(self, name_var, filename):
-        """AI生成名称"""
+    @staticmethod
+    def edited_ai_model(ai_model, generated, fields):
+        """编辑窗口保存时记录的AI模型
+
+        未修改的字段沿用原模型，改为本窗口AI生成的文本时为生成使用的模型，手动修改的字段没有模型；
+        名称和描述的模型不一致时（如只重新生成了其中一项）清空。
+
+        Args:
+            ai_model: 原来记录的模型
+            generated: 本窗口中AI生成的文本 {字段: (文本, 模型)}
+            fields: {字段: (原文本, 保存的文本)}
+        """
+        models = set()
+        for field, (original, current) in fields.items():
+            if current == original:
+                models.add(ai_model or '')
+            elif field in generated and current == generated[field][0]:
+                models.add(generated[field][1])
+            else:
+                models.add('')
+        return models.pop() if len(models) == 1 else ''
+    
+    def cached_video_context(self, file_path):
+        """已提取的视频内容（编辑窗口不等待提取），未启用或尚未提取时为空字符串"""
+        if not self.content_enricher or not file_path:
+            return ''
+        return self.content_enricher.get_cached_context(file_path)
+    
+    def generate_ai_name(self, name_var, filename, regenerate=False, file_path=None, generated=None):
+        """AI生成名称（后台流式生成，边生成边显示），生成成功时把 (名称, 模型) 记入 generated['name']"""
         if hasattr(self, 'ai_enabled') and self.ai_enabled:
-            try:
-                # 使用原始文件名生成AI名称
-                ai_name = self.ollama_client.generate_video_title(filename)
-                name_var.set(ai_name)
-            except Exception as e:
-                print(f"AI生成名称失败: {e}")
-                ai_name = f"AI生成的视频名称_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                name_var.set(ai_name)
+            def stream_thread():
+                model = None
+                try:
+                    # 使用原始文件名和已提取的视频内容生成AI名称（交互请求使用主模型）
+                    ai_name = self.ollama_client.stream_video_title(
+                        filename, lambda text: self.ui_events.call(lambda t=text: name_var.set(t), key=str(name_var)),
+                        regenerate=regenerate, context=self.cached_video_context(file_path))
+                    model = self.ollama_client.model
+                except Exception as e:
+                    print(f"AI生成名称失败: {e}")
+                    ai_name = f"AI生成的视频名称_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                
+                def show():
+                    name_var.set(ai_name)
+                    if generated is not None and model:
+                        generated['name'] = (ai_name, model)
+                self.ui_events.call(show, key=str(name_var))
+            
+            name_var.set("AI生成中...")
+            threading.Thread(target=stream_thread, daemon=True).start()
         else:
             # 模拟名称
             ai_name = f"AI生成的视频名称_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             name_var.set(ai_name)
     
-    def generate_ai_desc(self, desc_text, filename):
-        """AI生成描述"""
+    def set_text_content(self, text_widget, content):
+        """替换文本框内容，编辑窗口已关闭时忽略"""
+        if text_widget.winfo_exists():
+            text_widget.delete("1.0", tk.END)
+            text_widget.insert("1.0", content)
+    
+    def generate_ai_desc(self, desc_text, filename, regenerate=False, file_path=None, generated=None):
+        """AI生成描述（后台流式生成，边生成边显示），生成成功时把 (描述, 模型) 记入 generated['description']"""
         if hasattr(self, 'ai_enabled') and self.ai_enabled:
-            try:
-                # 使用原始文件名生成AI描述
-                ai_desc = self.ollama_client.generate_video_description(filename)
-                desc_text.delete("1.0", tk.END)
-                desc_text.insert("1.0", ai_desc)
-            except Exception as e:
-                print(f"AI生成描述失败: {e}")
-                ai_desc = f"这是一个由AI生成的视频描述，内容丰富有趣，值得观看。生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                desc_text.delete("1.0", tk.END)
-                desc_text.insert("1.0", ai_desc)
+            def stream_thread():
+                model = None
+                try:
+                    # 使用原始文件名和已提取的视频内容生成AI描述（交互请求使用主模型）
+                    ai_desc = self.ollama_client.stream_video_description(
+                        filename, lambda text: self.ui_events.call(lambda t=text: self.set_text_content(desc_text, t),
+                                                                   key=str(desc_text)),
+                        regenerate=regenerate, context=self.cached_video_context(file_path))
+                    model = self.ollama_client.model
+                except Exception as e:
+                    print(f"AI生成描述失败: {e}")
+                    ai_desc = f"这是一个由AI生成的视频描述，内容丰富有趣，值得观看。生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                
+                def show():
+                    self.set_text_content(desc_text, ai_desc)
+                    if generated is not None and model:
+                        generated['description'] = (ai_desc.strip(), model)
+                self.ui_events.call(show, key=str(desc_text))
+            
+            self.set_text_content(desc_text, "AI生成中...")
+            threading.Thread(target=stream_thread, daemon=True).start()
         else:
             # 模拟描述
             ai_desc = f"这是一个由AI生成的视频描述，内容丰富有趣，值得观看。生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            desc_text.delete("1.0", tk.END)
-            desc_text.insert("1.0", ai_desc)
+            self.set_text_content(desc_text, ai_desc)
+    
+    def show_ai_metrics(self):
+        """显示AI请求统计（延迟分位数、生成速度、模型加载次数），可导出到文件"""
+        metrics = self.ollama_client.metrics
+        window = tk.Toplevel(self.root)
+        window.title("AI请求统计")
+        window.geometry("560x420")
+        window.transient(self.root)
+        
+        frame = ttk.Frame(window, padding=15)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        text = tk.Text(frame, height=18, width=70)
+        text.pack(fill=tk.BOTH, expand=True)
+        
+        def refresh():
+            self.set_text_content(text, metrics.format_summary())
+        
+        def export():
+            path = metrics.export_path or filedialog.asksaveasfilename(
+                parent=window, title="导出AI统计", defaultextension=".json",
+                filetypes=[("JSON", "*.json"), ("Prometheus", "*.prom")])
+            if not path:
+                return
+            try:
+                metrics.export(path)
+                messagebox.showinfo("完成", f"已导出到 {path}", parent=window)
+            except OSError as e:
+                messagebox.showerror("错误", f"导出失败: {e}", parent=window)
+        
+        button_frame = ttk.Frame(frame)
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(button_frame, text="刷新", command=refresh).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="导出", command=export).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="关闭", command=window.destroy).pack(side=tk.RIGHT)
+        refresh()
     
     def get_selected_videos(self):
-        """获取选中的视频ID列表"""
+        """获取选中的视频ID列表（按列表的显示顺序）"""
+        if self.all_selected:
+            # 全选时按筛选条件查询ID，不需要加载全部行
+            status_filter = self.status_filter.get()
+            video_ids = self.store.list_video_ids(status=None if status_filter == "全部" else status_filter,
+                                                  sort=self.sort_column, descending=self.sort_descending)
+            return [video_id for video_id in video_ids if video_id not in self.selection_exceptions]
+        
         selected_items = []
         for item in self.tree.get_children():
             values = self.tree.item(item)['values']
@@ -743,8 +930,10 @@ class VideoManager:
             messagebox.showwarning("警告", "请先选择要发布的视频")
             return
         
-        # 检查发布器是否可用
-        if not DOUYIN_PUBLISHER_AVAILABLE:
+        # 检查发布器是否可用（通常已由启动后的后台检测完成）
+        if self.publisher_available is None:
+            self.probe_publisher()
+        if not self.publisher_available:
             messagebox.showwarning("警告", "抖音发布器不可用，将使用模拟发布功能")
             self.simulate_batch_publish(selected_items)
             return
@@ -760,98 +949,49 @@ class VideoManager:
         # 开始真实发布
         def publish_thread():
             # 为后台线程创建独立的数据库连接
-            thread_conn = sqlite3.connect(self.db_path)
-            thread_cursor = thread_conn.cursor()
+            thread_store = VideoStore(self.db_path)
+            publisher = None
             
             try:
                 # 创建发布器
-                publisher = DouyinPublisher()
-                
-                # 获取选中的视频信息
-                video_list = []
-                for video_id in selected_items:
-                    thread_cursor.execute('''
-                        SELECT display_name, file_path, description, filename 
-                        FROM videos WHERE id = ?
-                    ''', (video_id,))
-                    video_data = thread_cursor.fetchone()
-                    
-                    if video_data:
-                        display_name, file_path, description, filename = video_data
-                        
-                        # 检查文件是否存在
-                        if not os.path.exists(file_path):
-                            print(f"❌ 视频文件不存在: {file_path}")
-                            continue
-                        
-                        # 创建发布信息
-                        publish_info = publisher.create_publish_info({
-                            'display_name': display_name,
-                            'file_path': file_path,
-                            'description': description,
-                            'filename': filename
-                        })
-                        
-                        video_list.append(publish_info)
-                
-                if not video_list:
-                    self.root.after(0, lambda: messagebox.showerror("错误", "没有找到有效的视频文件"))
-                    self.root.after(0, lambda: self.enable_buttons())
-                    return
+                from douyin_publisher import DouyinPublisher
+                publisher = DouyinPublisher(cover_extractor=self.cover_extractor, ollama_client=self.ollama_client)
                 
-                # 初始化发布器
-                async def init_publisher():
-                    return await publisher.initialize()
+                # 定义进度回调（数据库中的发布状态由run_publish_batch写入）
+                def progress_callback(current, total, success_count, failed_count, video_id, current_success):
+                    self.ui_events.status(f"正在发布: {current}/{total} - 成功: {success_count}, 失败: {failed_count}")
+                    self.ui_events.row(video_id, status="已发布" if current_success else "发布失败")
                 
-                # 在主线程中运行异步初始化
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                init_success = loop.run_until_complete(init_publisher())
-                loop.close()
+                # 开始批量发布
+                result = run_publish_batch(thread_store, selected_items, publisher=publisher,
+                                           progress_callback=progress_callback)
                 
-                if not init_success:
-                    self.root.after(0, lambda: messagebox.showerror("错误", "抖音发布器初始化失败"))
-                    self.root.after(0, lambda: self.enable_buttons())
+                if result.get('error'):
+                    self.ui_events.reload()
+                    self.ui_events.call(lambda: messagebox.showerror("错误", result['error']))
+                    self.ui_events.call(self.enable_buttons)
                     return
                 
-                # 定义进度回调
-                def progress_callback(current, total, success_count, failed_count, current_success):
-                    self.root.after(0, lambda: self.status_var.set(
-                        f"正在发布: {current}/{total} - 成功: {success_count}, 失败: {failed_count}"
-                    ))
-                    
-                    # 更新处理中状态
-                    if current <= len(selected_items):
-                        video_id = selected_items[current - 1]
-                        self.root.after(0, lambda vid=video_id: self.update_processing_status(vid, True))
-                        
-                        # 立即更新当前视频的发布状态
-                        if current_success:
-                            self.root.after(0, lambda vid=video_id: self.update_publish_status(vid, "已发布"))
-                        else:
-                            self.root.after(0, lambda vid=video_id: self.update_publish_status(vid, "发布失败"))
-                        
-                        # 移除处理中状态
-                        self.root.after(0, lambda vid=video_id: self.update_processing_status(vid, False))
-                
-                # 开始批量发布
-                result = publisher.publish_videos_batch(video_list, progress_callback)
-                
                 # 显示结果
                 message = f"发布完成: 成功 {result['success']} 个，失败 {result['failed']} 个"
-                self.root.after(0, lambda: self.status_var.set(message))
-                self.root.after(0, lambda: self.enable_buttons())
+                # 发布过程中只更新各行的状态，结束后按当前筛选重新加载一次
+                self.ui_events.reload()
+                self.ui_events.status(message)
+                self.ui_events.call(self.enable_buttons)
                 
                 if result['success'] > 0:
-                    self.root.after(0, lambda: messagebox.showinfo("发布完成", message))
+                    self.ui_events.call(lambda: messagebox.showinfo("发布完成", message))
                 
             except Exception as e:
                 print(f"批量发布出错: {e}")
-                self.root.after(0, lambda: messagebox.showerror("发布失败", f"批量发布时出错：{e}"))
-                self.root.after(0, lambda: self.enable_buttons())
+                message = f"批量发布时出错：{e}"
+                self.ui_events.call(lambda: messagebox.showerror("发布失败", message))
+                self.ui_events.call(self.enable_buttons)
             finally:
                 # 关闭数据库连接
-                thread_conn.close()
+                thread_store.close()
+                if publisher is not None:
+                    publisher.close()
         
         threading.Thread(target=publish_thread, daemon=True).start()
     
@@ -860,91 +1000,89 @@ class VideoManager:
         # 禁用按钮
         self.disable_buttons()
         
-        # 模拟发布过程
+        # 模拟发布过程：状态写入和界面更新都在同一个后台线程中，界面更新经事件总线按帧合并
         def publish_thread():
-            self.status_var.set("正在发布...")
-            for i, video_id in enumerate(selected_items):
-                # 设置处理中状态
-                self.root.after(1000 * (i + 1), lambda vid=video_id: self.update_processing_status(vid, True))
-                
-                # 模拟发布延迟并立即更新状态
-                self.root.after(2000 * (i + 1), lambda vid=video_id: self.update_publish_status(vid, "已发布"))
-                self.root.after(2000 * (i + 1), lambda vid=video_id: self.update_processing_status(vid, False))
-                
-                # 更新状态栏
-                self.root.after(2000 * (i + 1), lambda idx=i: self.status_var.set(f"模拟发布: {idx+1}/{len(selected_items)}"))
-            
-            self.root.after(2000 * (len(selected_items) + 1), 
-                          lambda: self.status_var.set(f"模拟发布完成，共发布 {len(selected_items)} 个视频"))
-            self.root.after(2000 * (len(selected_items) + 1), 
-                          lambda: self.enable_buttons())
-        
-        threading.Thread(target=publish_thread, daemon=True).start()
-    
-    def update_publish_status(self, video_id, status):
-        """更新发布状态"""
-        # 在后台线程中使用独立的数据库连接
-        def update_in_thread():
-            import sqlite3
-            thread_conn = sqlite3.connect(self.db_path)
-            thread_cursor = thread_conn.cursor()
-            
+            thread_store = VideoStore(self.db_path)
+            total = len(selected_items)
             try:
-                thread_cursor.execute('''
-                    UPDATE videos SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
-                ''', (status, video_id))
-                thread_conn.commit()
-                
-                # 在主线程中更新界面
-                self.root.after(0, lambda: self.load_video_list())
+                self.ui_events.status("正在发布...")
+                for i, video_id in enumerate(selected_items):
+                    # 设置处理中状态
+                    self.ui_events.row(video_id, processing=True)
+                    
+                    # 模拟发布延迟
+                    time.sleep(1)
+                    thread_store.set_status([video_id], STATUS_PUBLISHED)
+                    self.ui_events.row(video_id, status=STATUS_PUBLISHED, processing=False)
+                    self.ui_events.status(f"模拟发布: {i + 1}/{total}")
                 
+                # 结束后按当前筛选重新加载一次
+                self.ui_events.reload()
+                self.ui_events.status(f"模拟发布完成，共发布 {total} 个视频")
             except Exception as e:
-                print(f"更新发布状态时出错: {e}")
+                print(f"模拟发布出错: {e}")
+                self.ui_events.reload()
+                self.ui_events.status(f"模拟发布时出错：{e}")
             finally:
-                thread_conn.close()
+                thread_store.close()
+                self.ui_events.call(self.enable_buttons)
         
-        # 在后台线程中执行数据库更新
-        threading.Thread(target=update_in_thread, daemon=True).start()
+        threading.Thread(target=publish_thread, daemon=True).start()
     
     def update_processing_status(self, video_id, is_processing):
         """更新处理中状态"""
-        # 查找对应的树形视图项目
-        for item in self.tree.get_children():
-            values = self.tree.item(item)['values']
-            if values[1] == video_id:  # ID列
-                current_tags = list(self.tree.item(item)['tags'])
-                
-                if is_processing:
-                    # 添加处理中标签
-                    if "processing" not in current_tags:
-                        current_tags.append("processing")
-                else:
-                    # 移除处理中标签
-                    if "processing" in current_tags:
-                        current_tags.remove("processing")
-                
-                # 更新项目标签
-                self.tree.item(item, tags=current_tags)
-                break
+        self.update_rows({video_id: {'processing': is_processing}})
     
     def update_video_display(self, video_id, new_name, new_desc):
         """更新视频显示信息"""
-        # 查找对应的树形视图项目
-        for item in self.tree.get_children():
-            values = list(self.tree.item(item)['values'])
-            if values[1] == video_id:  # ID列
-                # 更新显示名称和描述
-                values[2] = new_name  # 显示名称列
-                values[3] = new_desc  # 描述列
-                
-                # 移除处理中标签
-                current_tags = list(self.tree.item(item)['tags'])
-                if "processing" in current_tags:
-                    current_tags.remove("processing")
-                
-                # 更新项目
-                self.tree.item(item, values=values, tags=current_tags)
-                break
+        self.update_rows({video_id: {'name': new_name, 'description': new_desc, 'processing': False}})
+    
+    def update_rows(self, rows):
+        """批量更新行（显示名称、描述、发布状态、处理中状态），不在当前列表中的视频忽略"""
+        for video_id, changes in rows.items():
+            item = self.id_items.get(video_id)
+            if not item or not self.tree.exists(item):
+                continue
+            
+            options = {}
+            if 'name' in changes or 'description' in changes or 'status' in changes:
+                values = list(self.tree.item(item, 'values'))
+                if 'name' in changes:
+                    values[2] = changes['name']  # 显示名称列
+                if 'description' in changes:
+                    values[3] = changes['description']  # 描述列
+                if 'status' in changes:
+                    values[5] = changes['status']  # 状态列
+                options['values'] = values
+            if 'processing' in changes or 'status' in changes:
+                tags = list(self.tree.item(item, 'tags'))
+                if 'status' in changes:
+                    # 发布状态标签 - 绿色/红色背景
+                    tags = [tag for tag in tags if tag not in ("published", "failed")]
+                    if changes['status'] == "已发布":
+                        tags.append("published")
+                    elif changes['status'] == "发布失败":
+                        tags.append("failed")
+                if 'processing' in changes:
+                    # 处理中标签 - 蓝色背景
+                    tags = [tag for tag in tags if tag != "processing"]
+                    if changes['processing']:
+                        tags.append("processing")
+                options['tags'] = tags
+            if options:
+                self.tree.item(item, **options)
+    
+    def on_pregenerated(self, current, total, success_count, failed_count, video_id, result):
+        """后台预生成完成一个视频（在后台线程中调用）"""
+        if result:
+            self.ui_events.row(video_id, name=result[0], description=result[1], processing=False)
+    
+    def on_pregenerate_batch(self, progress):
+        """后台预生成完成一小批（在后台线程中调用）"""
+        text = f"后台AI预生成：已完成 {progress['done']} 个"
+        if progress['remaining']:
+            text += f"，队列中还有 {progress['remaining']} 个"
+        self.ui_events.status(text)
     
     def batch_ai_description(self):
         """批量AI智能描述（生成名称和描述）"""
@@ -966,82 +1104,75 @@ class VideoManager:
         # 禁用按钮
         self.disable_buttons()
         
-        # 批量AI生成
-        success_count = 0
-        failed_count = 0
+        ai_enabled = hasattr(self, 'ai_enabled') and self.ai_enabled
         
         def generate_thread():
-            nonlocal success_count, failed_count
-            
             # 在后台线程中创建数据库连接
-            import sqlite3
-            thread_conn = sqlite3.connect(self.db_path)
-            thread_cursor = thread_conn.cursor()
+            thread_store = VideoStore(self.db_path)
+            # 手动批量生成期间后台预生成不开始新的小批
+            if self.ai_pregenerator:
+                self.ai_pregenerator.pause()
             
             try:
-                for i, video_id in enumerate(selected_items):
-                    try:
-                        # 更新处理中状态 - 蓝色背景
-                        self.root.after(0, lambda vid=video_id: self.update_processing_status(vid, True))
-                        
-                        # 获取视频信息
-                        thread_cursor.execute('SELECT filename FROM videos WHERE id = ?', (video_id,))
-                        filename = thread_cursor.fetchone()[0]
-                        
-                        # 生成AI名称
-                        if hasattr(self, 'ai_enabled') and self.ai_enabled:
-                            try:
-                                ai_name = self.ollama_client.generate_video_title(filename)
-                            except Exception as e:
-                                print(f"AI生成名称失败: {e}")
-                                ai_name = f"AI生成标题_{filename}"
-                        else:
-                            ai_name = f"AI生成标题_{filename}"
-                        
-                        # 生成AI描述
-                        if hasattr(self, 'ai_enabled') and self.ai_enabled:
-                            try:
-                                ai_desc = self.ollama_client.generate_video_description(filename)
-                            except Exception as e:
-                                print(f"AI生成描述失败: {e}")
-                                ai_desc = f"这是一个关于{filename}的精彩视频，内容有趣，值得观看。"
-                        else:
-                            ai_desc = f"这是一个关于{filename}的精彩视频，内容有趣，值得观看。"
-                        
-                        # 更新数据库
-                        thread_cursor.execute('''
-                            UPDATE videos 
-                            SET display_name = ?, description = ?, updated_at = CURRENT_TIMESTAMP 
-                            WHERE id = ?
-                        ''', (ai_name, ai_desc, video_id))
-                        
-                        # 立即提交单个更改
-                        thread_conn.commit()
-                        
-                        success_count += 1
-                        
+                def on_item_start(video_id):
+                    # 更新处理中状态 - 蓝色背景
+                    self.ui_events.row(video_id, processing=True)
+                
+                live_stats = {}
+                
+                def stats_callback(stats):
+                    live_stats.update(stats)
+                
+                def progress_callback(current, total, success_count, failed_count, video_id, result):
+                    if result:
                         # 更新UI界面 - 移除处理中状态，更新显示
-                        self.root.after(0, lambda vid=video_id, name=ai_name, desc=ai_desc: 
-                                      self.update_video_display(vid, name, desc))
-                        
-                        # 更新状态栏
-                        self.root.after(0, lambda: self.status_var.set(f"正在处理: {i+1}/{len(selected_items)} - 成功: {success_count}"))
-                        
-                    except Exception as e:
-                        print(f"处理视频 {video_id} 时出错: {e}")
-                        failed_count += 1
-                        
+                        self.ui_events.row(video_id, name=result[0], description=result[1], processing=False)
+                    else:
                         # 移除处理中状态
-                        self.root.after(0, lambda vid=video_id: self.update_processing_status(vid, False))
+                        self.ui_events.row(video_id, processing=False)
+                    
+                    # 更新状态栏（包括当前并发数和吞吐量）
+                    status_text = f"正在处理: {current}/{total} - 成功: {success_count}"
+                    if live_stats:
+                        status_text += f" | 并发: {live_stats['concurrency']} | 吞吐: {live_stats['throughput']:.1f} 个/分钟"
+                    self.ui_events.status(status_text)
                 
-                # 更新界面
-                self.root.after(0, lambda: self.status_var.set(f"完成！成功: {success_count}, 失败: {failed_count}"))
-                self.root.after(0, lambda: messagebox.showinfo("完成", f"批量AI生成完成！\n成功: {success_count} 个\n失败: {failed_count} 个"))
-                self.root.after(0, lambda: self.enable_buttons())
+                result = run_ai_batch(thread_store, self.ollama_client, selected_items, ai_enabled,
+                                      on_item_start=on_item_start, progress_callback=progress_callback,
+                                      session=self.ollama_session, stats_callback=stats_callback,
+                                      enricher=self.content_enricher)
+                success_count = result['success']
+                failed_count = result['failed']
+                summary = f"完成！成功: {success_count}, 失败: {failed_count}"
+                if result.get('cancelled'):
+                    summary += f"，已删除跳过: {result['cancelled']}"
+                if 'cache' in result:
+                    summary += f"，缓存命中率: {result['cache']['hit_rate']:.0%}"
+                if result.get('metrics', {}).get('tokens_per_second'):
+                    summary += (f"，延迟 p95: {result['metrics']['latency_p95']:.1f}秒"
+                                f"，生成速度: {result['metrics']['tokens_per_second']:.0f} token/秒")
                 
+                # 更新界面
+                self.ui_events.status(summary)
+                message = f"批量AI生成完成！\n成功: {success_count} 个\n失败: {failed_count} 个"
+                if failed_count or result.get('skipped'):
+                    message += "\n\n未完成的视频已保留在AI队列中，稍后可重新生成"
+                self.ui_events.call(lambda: messagebox.showinfo("完成", message))
+                self.ui_events.call(self.enable_buttons)
+
+            except Exception as e:
+                print(f"批量AI生成出错: {e}")
+                message = f"批量AI生成时出错：{e}"
+                # 重新加载列表清除处理中状态，未完成的视频仍在AI队列中
+                self.ui_events.reload()
+                self.ui_events.status(message)
+                self.ui_events.call(lambda: messagebox.showerror("AI生成失败", message))
+                self.ui_events.call(self.enable_buttons)
             finally:
+                if self.ai_pregenerator:
+                    self.ai_pregenerator.resume()
                 # 关闭线程数据库连接
-                thread_conn.close()
+                thread_store.close()
         
         # 在后台线程中执行
         threading.Thread(target=generate_thread, daemon=True).start()
@@ -1106,9 +1237,9 @@ class VideoManager:
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
         
-        # 获取要删除的视频信息
+        # 获取要删除的视频信息（最多列出 DELETE_PREVIEW_LIMIT 个）
         video_info = []
-        for video_id in selected_items:
+        for video_id in selected_items[:DELETE_PREVIEW_LIMIT]:
             self.cursor.execute('SELECT filename, display_name FROM videos WHERE id = ?', (video_id,))
             result = self.cursor.fetchone()
             if result:
@@ -1131,6 +1262,10 @@ class VideoManager:
             filename_label = ttk.Label(video_frame, text=f"({filename})", foreground="gray", font=("Arial", 9))
             filename_label.pack(side=tk.LEFT)
         
+        if len(selected_items) > DELETE_PREVIEW_LIMIT:
+            ttk.Label(scrollable_frame, text=f"……还有 {len(selected_items) - DELETE_PREVIEW_LIMIT} 个视频",
+                      foreground="gray").pack(anchor="w", pady=3, padx=5)
+        
         # 配置滚动区域
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -1171,6 +1306,8 @@ class VideoManager:
                 deleted_count += 1
             
             self.conn.commit()
+            # 取消这些视频在批量任务中尚未发送的AI请求
+            self.ollama_client.singleflight.cancel(selected_items)
             
             # 关闭对话框
             dialog.destroy()
@@ -1220,8 +1357,20 @@ class VideoManager:
     
     def __del__(self):
         """清理资源"""
+        if getattr(self, 'ui_events', None):
+            self.ui_events.close()
         if hasattr(self, 'conn'):
             self.conn.close()
+        if getattr(self, 'cover_extractor', None):
+            self.cover_extractor.shutdown()
+        if getattr(self, 'ai_pregenerator', None):
+            self.ai_pregenerator.stop()
+        if getattr(self, 'ollama_session', None):
+            self.ollama_session.close()
+        if getattr(self, 'content_enricher', None):
+            self.content_enricher.shutdown()
+        if getattr(self, 'thumbnail_cache', None):
+            self.thumbnail_cache.close()
 
 if __name__ == "__main__":
     app = VideoManager()
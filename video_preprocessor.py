@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发布前视频预处理
+将非MP4或未做faststart的视频转封装/转码为平台友好的MP4，结果按内容指纹缓存
+"""
+
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+from config import config
+from media_utils import cached_fingerprint, find_executable, get_cache_dir, is_faststart_mp4
+
+# 各平台转码参数
+PLATFORM_PROFILES = {
+    'douyin': {
+        'max_height': 1920,
+        'fps': 30,
+        'crf': 23,
+        'max_bitrate': '8M',
+        'audio_bitrate': '128k'
+    },
+    'tencent': {
+        'max_height': 1080,
+        'fps': 30,
+        'crf': 23,
+        'max_bitrate': '6M',
+        'audio_bitrate': '128k'
+    },
+    'xiaohongshu': {
+        'max_height': 1920,
+        'fps': 30,
+        'crf': 22,
+        'max_bitrate': '10M',
+        'audio_bitrate': '192k'
+    }
+}
+
+# 单个ffmpeg任务的超时时间（秒）
+FFMPEG_TIMEOUT = 3600
+
+
+def _build_ffmpeg_command(ffmpeg: str, src: str, dst: str, mode: str, profile: Dict) -> list:
+    """构造ffmpeg命令"""
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-i', src,
+               '-map', '0:v:0', '-map', '0:a:0?']
+
+    if mode == 'remux':
+        command += ['-c', 'copy']
+    else:
+        max_height = profile['max_height']
+        command += [
+            '-vf', f"scale=-2:'min({max_height},ih)'",
+            '-r', str(profile['fps']),
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(profile['crf']),
+            '-maxrate', profile['max_bitrate'], '-bufsize', profile['max_bitrate'],
+            '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', profile['audio_bitrate']
+        ]
+
+    command += ['-movflags', '+faststart', '-f', 'mp4', dst]
+    return command
+
+
+def _prepare_video_worker(ffmpeg: str, src: str, dst: str, mode: str, profile: Dict) -> str:
+    """进程池中执行的预处理任务，返回输出文件路径
+
+    先写入临时文件再原子替换，避免中断时留下半成品被当作缓存命中。
+    转封装失败（如wmv/flv中的编码MP4不支持）时自动退回转码。
+    """
+    tmp_path = dst + '.part'
+    modes = [mode] if mode == 'transcode' else [mode, 'transcode']
+
+    last_error = ''
+    for current_mode in modes:
+        command = _build_ffmpeg_command(ffmpeg, src, tmp_path, current_mode, profile)
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                timeout=FFMPEG_TIMEOUT)
+        if result.returncode == 0:
+            os.replace(tmp_path, dst)
+            return dst
+        last_error = result.stderr.decode('utf-8', errors='replace').strip()
+
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    raise RuntimeError(f"ffmpeg处理失败: {last_error}")
+
+
+class VideoPreprocessor:
+    """视频预处理器
+
+    在有界进程池中执行ffmpeg，同一内容的视频只处理一次。
+    """
+
+    def __init__(self, mode: str = 'remux', platform: str = 'douyin',
+                 max_workers: int = 2, cache_dir: Optional[str] = None, wait_timeout: Optional[float] = 600):
+        """
+        Args:
+            mode: remux 仅转封装为faststart MP4；transcode 按平台参数转码
+            platform: 转码参数对应的平台
+            max_workers: ffmpeg进程数
+            cache_dir: 输出目录，为None时使用 cache/prepared
+            wait_timeout: 发布时等待单个视频预处理的最长秒数，为None时一直等待
+        """
+        if mode not in ('remux', 'transcode'):
+            raise ValueError(f"不支持的预处理模式: {mode}")
+
+        self.mode = mode
+        self.platform = platform
+        self.profile = PLATFORM_PROFILES.get(platform, PLATFORM_PROFILES['douyin'])
+        self.max_workers = max(1, int(max_workers))
+        self.wait_timeout = wait_timeout
+        self.cache_dir = cache_dir or get_cache_dir('prepared')
+        self.ffmpeg = find_executable('ffmpeg')
+
+        self._executor = None
+        self._lock = threading.Lock()
+        # 指纹 -> Future，合并同一内容的重复提交
+        self._pending = {}
+
+    @classmethod
+    def from_config(cls) -> Optional['VideoPreprocessor']:
+        """根据配置创建预处理器，未启用时返回None"""
+        preprocess_config = config.get_preprocess_config()
+        if not preprocess_config['enabled']:
+            return None
+        return cls(mode=preprocess_config['mode'],
+                   platform=preprocess_config['platform'],
+                   max_workers=preprocess_config['max_workers'],
+                   wait_timeout=preprocess_config['wait_timeout'])
+
+    @property
+    def available(self) -> bool:
+        """ffmpeg是否可用"""
+        return self.ffmpeg is not None
+
+    def needs_preparation(self, file_path: str) -> bool:
+        """判断视频是否需要预处理"""
+        if self.mode == 'transcode':
+            return True
+        if os.path.splitext(file_path)[1].lower() != '.mp4':
+            return True
+        return not is_faststart_mp4(file_path)
+
+    def get_output_path(self, fingerprint: str) -> str:
+        """缓存输出路径，转码结果与平台参数相关"""
+        suffix = 'remux' if self.mode == 'remux' else self.platform
+        return os.path.join(self.cache_dir, f"{fingerprint}_{suffix}.mp4")
+
+    def submit(self, file_path: str) -> Future:
+        """提交预处理任务，返回结果为可上传文件路径的Future
+
+        不需要处理、ffmpeg不可用或处理失败时，结果为原始路径。
+        取消返回的Future时，尚未开始的ffmpeg任务一并取消（已开始的任务继续完成并写入缓存）。
+        """
+        if not self.available or not self.needs_preparation(file_path):
+            return self._completed(file_path)
+
+        try:
+            fingerprint = cached_fingerprint(file_path)
+        except OSError as e:
+            print(f"⚠️ 读取视频失败，跳过预处理: {e}")
+            return self._completed(file_path)
+
+        output_path = self.get_output_path(fingerprint)
+        if os.path.exists(output_path):
+            return self._completed(output_path)
+
+        with self._lock:
+            if fingerprint in self._pending:
+                return self._pending[fingerprint]
+
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+            inner = self._executor.submit(_prepare_video_worker, self.ffmpeg, file_path,
+                                          output_path, self.mode, self.profile)
+            outer = Future()
+            self._pending[fingerprint] = outer
+
+        def on_done(done_future):
+            with self._lock:
+                if self._pending.get(fingerprint) is outer:
+                    del self._pending[fingerprint]
+            if outer.cancelled():
+                return
+            try:
+                outer.set_result(done_future.result())
+            except Exception as e:
+                print(f"⚠️ 视频预处理失败，使用原文件上传: {e}")
+                outer.set_result(file_path)
+
+        def on_outer_done(done_future):
+            if done_future.cancelled():
+                inner.cancel()
+                with self._lock:
+                    if self._pending.get(fingerprint) is outer:
+                        del self._pending[fingerprint]
+
+        inner.add_done_callback(on_done)
+        outer.add_done_callback(on_outer_done)
+        return outer
+
+    def prepare(self, file_path: str) -> str:
+        """同步预处理，返回可上传文件路径"""
+        return self.submit(file_path).result()
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    @staticmethod
+    def _completed(result: str) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
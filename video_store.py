@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频数据库访问
+GUI与命令行/守护进程共用的数据库逻辑，不依赖tkinter
+"""
+
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 默认支持的视频格式
+SUPPORTED_FORMATS = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']
+
+# 发布状态
+STATUS_UNPUBLISHED = '未发布'
+STATUS_QUEUED = '待发布'
+STATUS_PUBLISHED = '已发布'
+STATUS_FAILED = '发布失败'
+
+# AI生成状态
+AI_STATUS_NONE = ''
+AI_STATUS_PENDING = 'pending'
+AI_STATUS_READY = 'ready'
+
+# SQLite单条语句的参数数量上限较低（旧版本为999），批量查询时分块
+QUERY_CHUNK_SIZE = 500
+
+VIDEO_COLUMNS = ('id', 'filename', 'display_name', 'file_path', 'description',
+                 'status', 'ai_status', 'ai_model', 'created_at', 'updated_at')
+
+# 可排序的列及其排序表达式，每个表达式都有 (表达式, id) 索引，排序和翻页直接走索引
+# description 可能为NULL，按空字符串排序，保证翻页条件可以比较
+SORT_COLUMNS = {
+    'id': 'id',
+    'display_name': 'display_name',
+    'description': "IFNULL(description, '')",
+    'filename': 'filename',
+    'status': 'status',
+    'created_at': 'created_at',
+}
+DEFAULT_SORT = 'created_at'
+
+
+def default_description(filename: str) -> str:
+    """新添加视频的默认描述"""
+    return f"这是一个关于{filename}的视频，内容精彩有趣。"
+
+
+class VideoStore:
+    """视频数据库
+
+    每个线程应使用独立的 VideoStore 实例（SQLite连接不能跨线程共享）。
+    """
+
+    def __init__(self, db_path: str = 'videos.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.init_schema()
+
+    def init_schema(self):
+        """创建视频表，并为旧数据库补充新增列"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS videos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL,
+                display_name TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                description TEXT,
+                status TEXT DEFAULT '未发布',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute("PRAGMA table_info(videos)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        if 'ai_status' not in existing_columns:
+            cursor.execute("ALTER TABLE videos ADD COLUMN ai_status TEXT DEFAULT ''")
+        if 'ai_model' not in existing_columns:
+            cursor.execute("ALTER TABLE videos ADD COLUMN ai_model TEXT DEFAULT ''")
+
+        # 排序索引，id 作为并列时的次序，与 list_videos 的 ORDER BY 一致
+        for column, expression in SORT_COLUMNS.items():
+            if column != 'id':
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_videos_sort_{column} ON videos({expression}, id)")
+
+        self.conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def _dict_cursor(self) -> sqlite3.Cursor:
+        cursor = self.conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        return cursor
+
+    @staticmethod
+    def scan_folder(folder_path: str, supported_formats: Optional[List[str]] = None) -> List[str]:
+        """递归查找文件夹中所有支持的视频文件"""
+        formats = tuple(fmt.lower() for fmt in (supported_formats or SUPPORTED_FORMATS))
+        video_files = []
+        for root, dirs, files in os.walk(folder_path):
+            for file in files:
+                if file.lower().endswith(formats):
+                    video_files.append(os.path.join(root, file))
+        return video_files
+
+    def add_videos(self, file_paths: Iterable[str], ai_status: str = AI_STATUS_NONE) -> Dict:
+        """批量添加视频，跳过重复和不存在的文件
+
+        Args:
+            file_paths: 视频文件路径
+            ai_status: 新视频的AI生成状态，传入 AI_STATUS_PENDING 时加入AI队列
+
+        Returns:
+            Dict: added/skipped/error 计数以及新增文件路径 added_paths
+        """
+        result = {'added': 0, 'skipped': 0, 'error': 0, 'added_paths': []}
+
+        valid_files = []
+        for file_path in file_paths:
+            if os.path.exists(file_path):
+                valid_files.append(file_path)
+            else:
+                result['error'] += 1
+
+        if not valid_files:
+            return result
+
+        # 批量查询已存在的文件
+        cursor = self.conn.cursor()
+        existing_paths = set()
+        for start in range(0, len(valid_files), QUERY_CHUNK_SIZE):
+            chunk = valid_files[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ','.join(['?' for _ in chunk])
+            cursor.execute(f"SELECT file_path FROM videos WHERE file_path IN ({placeholders})", chunk)
+            existing_paths.update(row[0] for row in cursor.fetchall())
+
+        # 准备批量插入的数据
+        batch_data = []
+        for file_path in valid_files:
+            if file_path in existing_paths:
+                result['skipped'] += 1
+                continue
+            # 同一批次内的重复路径也只添加一次
+            existing_paths.add(file_path)
+            filename = os.path.basename(file_path)
+            display_name = os.path.splitext(filename)[0]
+            batch_data.append((filename, display_name, file_path, default_description(filename), ai_status))
+
+        if batch_data:
+            cursor.executemany('''
+                INSERT INTO videos (filename, display_name, file_path, description, ai_status)
+                VALUES (?, ?, ?, ?, ?)
+            ''', batch_data)
+            self.conn.commit()
+            result['added'] = len(batch_data)
+            result['added_paths'] = [row[2] for row in batch_data]
+
+        return result
+
+    def get_video(self, video_id: int) -> Optional[Dict]:
+        """获取单个视频信息"""
+        cursor = self._dict_cursor()
+        cursor.execute(f"SELECT {', '.join(VIDEO_COLUMNS)} FROM videos WHERE id = ?", (video_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+    def get_videos(self, video_ids: Iterable[int]) -> List[Dict]:
+        """按给定顺序获取多个视频信息，不存在的ID会被忽略"""
+        videos = []
+        for video_id in video_ids:
+            video = self.get_video(video_id)
+            if video:
+                videos.append(video)
+        return videos
+
+    def list_videos(self, status: Optional[str] = None, limit: Optional[int] = None, sort: str = DEFAULT_SORT,
+                    descending: bool = True, after: Optional[Tuple] = None) -> List[Dict]:
+        """列出视频（默认按创建时间倒序），支持按键翻页
+
+        Args:
+            status: 按发布状态筛选
+            limit: 最多返回的数量
+            sort: 排序列（见 SORT_COLUMNS），值相同时按ID排序
+            descending: 是否倒序
+            after: 上一页最后一个视频的 sort_key，返回其后的视频
+
+        Returns:
+            List[Dict]: 视频信息
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"不支持的排序列: {sort}")
+        expression = SORT_COLUMNS[sort]
+        direction = 'DESC' if descending else 'ASC'
+
+        conditions = []
+        params = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if after is not None:
+            # 等价于 (表达式, id) < (?, ?)，但拆开后第一项可以直接在排序索引上定位（行值比较对表达式索引
+            # 如 IFNULL(description, '') 只能扫描），翻到后面的页不需要扫描前面的行
+            op = '<' if descending else '>'
+            if sort == 'id':
+                conditions.append(f"id {op} ?")
+                params.append(after[1])
+            else:
+                conditions.append(f"{expression} {op}= ? AND ({expression} {op} ? OR id {op} ?)")
+                params.extend([after[0], after[0], after[1]])
+
+        sql = f"SELECT {', '.join(VIDEO_COLUMNS)} FROM videos"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {expression} {direction}" + (f", id {direction}" if sort != 'id' else '')
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        cursor = self._dict_cursor()
+        cursor.execute(sql, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def list_video_ids(self, status: Optional[str] = None, sort: str = DEFAULT_SORT,
+                       descending: bool = True) -> List[int]:
+        """按与 list_videos 相同的筛选和排序列出全部视频ID（只读ID，用于全选等批量操作）"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"不支持的排序列: {sort}")
+        expression = SORT_COLUMNS[sort]
+        direction = 'DESC' if descending else 'ASC'
+        sql = "SELECT id FROM videos" + (" WHERE status = ?" if status else "")
+        sql += f" ORDER BY {expression} {direction}" + (f", id {direction}" if sort != 'id' else '')
+        cursor = self.conn.cursor()
+        cursor.execute(sql, (status,) if status else ())
+        return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def sort_key(video: Dict, sort: str = DEFAULT_SORT) -> Tuple:
+        """视频在某个排序下的位置，作为 list_videos 的 after 参数获取下一页"""
+        value = video[sort]
+        if sort == 'description' and value is None:
+            value = ''
+        return value, video['id']
+
+    def get_ids_by_status(self, status: str, limit: Optional[int] = None) -> List[int]:
+        """获取指定发布状态的视频ID（按ID升序，先进先出）"""
+        return self._get_ids("status = ?", (status,), limit)
+
+    def get_ids_by_ai_status(self, ai_status: str, limit: Optional[int] = None,
+                             exclude: Iterable[int] = ()) -> List[int]:
+        """获取指定AI状态的视频ID（按ID升序，先进先出），跳过 exclude 中的视频（如等待重试的）"""
+        exclude = set(exclude)
+        if not exclude:
+            return self._get_ids("ai_status = ?", (ai_status,), limit)
+        # 多取 len(exclude) 个再过滤，不受SQL参数个数限制
+        video_ids = [video_id for video_id in
+                     self._get_ids("ai_status = ?", (ai_status,), limit + len(exclude) if limit else None)
+                     if video_id not in exclude]
+        return video_ids[:limit] if limit else video_ids
+
+    def _get_ids(self, where: str, params: tuple, limit: Optional[int]) -> List[int]:
+        sql = f"SELECT id FROM videos WHERE {where} ORDER BY id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+    def update_ai_result(self, video_id: int, display_name: str, description: str, model: Optional[str] = None,
+                         commit: bool = True):
+        """写入AI生成的名称和描述，以及生成使用的模型（为None时清空，如占位内容）"""
+        self.conn.execute('''
+            UPDATE videos
+            SET display_name = ?, description = ?, ai_status = ?, ai_model = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (display_name, description, AI_STATUS_READY, model or '', video_id))
+        if commit:
+            self.conn.commit()
+
+    def update_display_name(self, video_id: int, display_name: str, model: Optional[str] = None,
+                            commit: bool = True):
+        """只更新显示名称（批量生成标题），model 为生成使用的模型（为None时清空）"""
+        self.conn.execute('''
+            UPDATE videos
+            SET display_name = ?, ai_model = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (display_name, model or '', video_id))
+        if commit:
+            self.conn.commit()
+
+    def update_status(self, video_id: int, status: str):
+        """更新发布状态"""
+        self.conn.execute('''
+            UPDATE videos SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (status, video_id))
+        self.conn.commit()
+
+    def set_status(self, video_ids: Iterable[int], status: str):
+        """批量设置发布状态"""
+        self.conn.executemany('''
+            UPDATE videos SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+        ''', [(status, video_id) for video_id in video_ids])
+        self.conn.commit()
+
+    def set_ai_status(self, video_ids: Iterable[int], ai_status: str, commit: bool = True):
+        """批量设置AI生成状态"""
+        self.conn.executemany('''
+            UPDATE videos SET ai_status = ? WHERE id = ?
+        ''', [(ai_status, video_id) for video_id in video_ids])
+        if commit:
+            self.conn.commit()
+
+    def status_counts(self) -> Dict:
+        """统计各发布状态及AI待处理数量"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT status, COUNT(*) FROM videos GROUP BY status")
+        counts = {status: count for status, count in cursor.fetchall()}
+        cursor.execute("SELECT COUNT(*) FROM videos WHERE ai_status = ?", (AI_STATUS_PENDING,))
+        ai_pending = cursor.fetchone()[0]
+        return {
+            'total': sum(counts.values()),
+            'by_status': counts,
+            'ai_pending': ai_pending
+        }